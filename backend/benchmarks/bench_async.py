@@ -0,0 +1,182 @@
+"""
+Нагрузочный тест: синхронный стек против асинхронного при параллельных запросах.
+
+Сценарии (одновременно --concurrency запросов, всего --requests):
+  product - карточка случайного товара (кеш каталога сбрасывается, чтобы
+            каждый запрос шел в базу);
+  me      - /api/users/me с проверкой токена.
+
+Варианты:
+  before - прежние обработчики: def с синхронной сессией (пул потоков
+           Starlette) и async def get_current_user с блокирующим запросом
+           к базе прямо в цикле событий;
+  after  - текущее приложение: async def с AsyncSession (asyncpg).
+
+Каждый вариант запускается в отдельном процессе.
+
+Запуск из папки backend (нужна база с товарами и пользователем):
+    python benchmarks/bench_async.py --username admin --password admin123
+    python benchmarks/bench_async.py --concurrency 50 200 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_serialization import asgi_get
+
+VARIANTS = ("before", "after")
+SCENARIOS = ("product", "me")
+
+
+def _before_app():
+    """Приложение с прежними обработчиками карточки товара и /me"""
+    from fastapi import Depends, FastAPI, HTTPException
+    from jose import jwt
+    from sqlalchemy.orm import Session
+
+    from config import get_db
+    import services.product_service as product_service
+    import services.user_service as user_service
+    from routers.users import oauth2_scheme
+    from schemas.product import Product
+    from schemas.user import User
+
+    app = FastAPI()
+
+    @app.get("/api/products/{product_id}", response_model=Product)
+    def read_product(product_id: int, db: Session = Depends(get_db)):
+        db_product = product_service.get_product_cached(db, product_id=product_id)
+        if db_product is None:
+            raise HTTPException(status_code=404)
+        return db_product
+
+    async def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+        payload = jwt.decode(token, user_service.SECRET_KEY, algorithms=[user_service.ALGORITHM])
+        return user_service.get_user_by_username(db, username=payload["sub"])
+
+    @app.get("/api/users/me", response_model=User)
+    async def read_users_me(current_user: User = Depends(get_current_user)):
+        return current_user
+
+    return app
+
+
+def run_variant(variant: str, scenario: str, concurrency: int, requests: int, token: str) -> dict:
+    """Замер одного варианта в текущем процессе"""
+    from sqlalchemy import func, select
+
+    from config import SessionLocal
+    from models.product import Product
+    import services.product_service as product_service
+
+    if variant == "before":
+        app = _before_app()
+    else:
+        from main import app
+
+    with SessionLocal() as db:
+        low, high = db.execute(select(func.min(Product.id), func.max(Product.id))).one()
+
+    headers = [(b"authorization", f"Bearer {token}".encode())]
+
+    def call():
+        if scenario == "product":
+            product_service.product_cache.clear()
+            return asgi_get(app, f"/api/products/{random.randint(low, high)}")
+        return asgi_get(app, "/api/users/me", headers=headers)
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        errors = 0
+
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    status, _ = await call()
+                except Exception:
+                    # Например, исчерпан пул соединений синхронного движка
+                    status = None
+                latencies.append(time.perf_counter() - started)
+                if status not in (200, 404):
+                    errors += 1
+
+        await asyncio.gather(*[one() for _ in range(concurrency)])
+        latencies.clear()
+        errors = 0
+        started = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(requests)])
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            "rps": round((requests - errors) / elapsed, 1),
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+            "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 1),
+            "errors": errors,
+        }
+
+    return asyncio.run(run())
+
+
+def _token(username: str, password: str) -> str:
+    from config import SessionLocal
+    import services.user_service as user_service
+
+    with SessionLocal() as db:
+        if not user_service.authenticate_user(db, username, password):
+            raise SystemExit("Неверное имя пользователя или пароль")
+    return user_service.create_access_token({"sub": username})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--timeout", type=int, default=120, help="предел времени на один вариант, с")
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    parser.add_argument("--token", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        result = run_variant(args.variant, args.scenarios[0], args.concurrency[0], args.requests, args.token)
+        print(json.dumps(result))
+        return
+
+    token = _token(args.username, args.password)
+    print(f"{'сценарий':>8} {'параллельно':>11} {'вариант':>8} {'req/s':>8} {'p50, мс':>8} {'p99, мс':>8} {'ошибок':>7}")
+    for scenario in args.scenarios:
+        for concurrency in args.concurrency:
+            for variant in VARIANTS:
+                try:
+                    output = subprocess.run(
+                        [sys.executable, "-W", "ignore", os.path.abspath(__file__),
+                         "--variant", variant, "--scenarios", scenario, "--concurrency", str(concurrency),
+                         "--requests", str(args.requests), "--token", token],
+                        check=True, capture_output=True, text=True, timeout=args.timeout
+                    ).stdout
+                except subprocess.TimeoutExpired:
+                    # Синхронный стек при параллелизме выше пула потоков может
+                    # зависнуть: потоки ждут соединений, а закрытие сессий ждет потоков
+                    print(f"{scenario:>8} {concurrency:>11} {variant:>8}   не завершился за {args.timeout} с")
+                    continue
+                result = json.loads(output.strip().splitlines()[-1])
+                print(
+                    f"{scenario:>8} {concurrency:>11} {variant:>8} {result['rps']:>8} "
+                    f"{result['p50_ms']:>8} {result['p99_ms']:>8} {result['errors']:>7}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Бенчмарк оформления заказа: прежний create_order против пакетного.
+
+Варианты:
+  before - цена каждой позиции отдельным SELECT, заказ в своей транзакции,
+           затем INSERT на каждую позицию и второй COMMIT (2N+3 запроса);
+  after  - текущий order_service.create_order: один SELECT с IN, INSERT
+           заказа с RETURNING и пакетный INSERT позиций в одной транзакции.
+
+Для каждого размера корзины выводятся число SQL-запросов и задержка
+оформления. Созданные заказы удаляются после замера.
+
+Запуск из папки backend (нужны товары и хотя бы один пользователь):
+    python benchmarks/bench_checkout.py
+    python benchmarks/bench_checkout.py --items 1 20 100 --repeat 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, event, func, select
+
+from config import SessionLocal, engine
+from models.order import Order, order_products
+from models.product import Product
+from models.user import User
+from schemas.order import OrderCreate
+import services.order_service as order_service
+
+
+def create_order_before(db, order: OrderCreate, user_id: int):
+    """Прежняя реализация create_order"""
+    total_price = 0.0
+    for item in order.items:
+        product = db.query(Product).filter(Product.id == item.product_id).first()
+        if product:
+            total_price += product.actual_price * item.quantity
+
+    db_order = Order(
+        user_id=user_id,
+        total_price=total_price,
+        shipping_address=order.shipping_address,
+        payment_details=order.payment_details,
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow()
+    )
+    db.add(db_order)
+    db.commit()
+    db.refresh(db_order)
+
+    for item in order.items:
+        db.execute(
+            order_products.insert().values(
+                order_id=db_order.id,
+                product_id=item.product_id,
+                quantity=item.quantity,
+                selected_size=item.selected_size
+            )
+        )
+    db.commit()
+    return db_order.id
+
+
+def create_order_after(db, order: OrderCreate, user_id: int):
+    return order_service.create_order(db, order, user_id)["id"]
+
+
+VARIANTS = {"before": create_order_before, "after": create_order_after}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+
+    db = SessionLocal()
+    user_id = db.scalar(select(func.min(User.id)))
+    product_ids = db.scalars(select(Product.id).order_by(Product.id).limit(max(args.items))).all()
+    if user_id is None or len(product_ids) < max(args.items):
+        raise SystemExit("Нужны пользователь и не меньше товаров, чем позиций в корзине")
+
+    print(f"{'позиций':>8} {'вариант':>8} {'запросов':>9} {'p50, мс':>8} {'p95, мс':>8}")
+    created = []
+    try:
+        for size in args.items:
+            order = OrderCreate(
+                shipping_address="bench",
+                items=[{"product_id": product_id, "quantity": 2, "selected_size": "M"} for product_id in product_ids[:size]]
+            )
+            for name, create in VARIANTS.items():
+                created.append(create(db, order, user_id))
+                timings = []
+                for _ in range(args.repeat):
+                    statements = 0
+                    started = time.perf_counter()
+                    created.append(create(db, order, user_id))
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                print(
+                    f"{size:>8} {name:>8} {statements:>9} {statistics.median(timings):>8.2f} "
+                    f"{timings[int(len(timings) * 0.95)]:>8.2f}"
+                )
+    finally:
+        db.rollback()
+        db.execute(delete(order_products).where(order_products.c.order_id.in_(created)))
+        db.execute(delete(Order).where(Order.id.in_(created)))
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Бенчмарк фасетного каталога: фильтрованные страницы и счетчики фасетов.
+
+Сравнивает подсчет всех фасетов одним запросом (facet_service.get_facets)
+с отдельным запросом на каждый фасет и замеряет страницы списка с фильтрами
+по цене, размерам и оценке.
+
+Запуск из папки backend (после python init_db.py):
+    python benchmarks/bench_facets.py --seed 100000
+    python benchmarks/bench_facets.py --repeats 20
+
+--seed добавляет тестовые товары в базу из DATABASE_URL,
+поэтому запускайте его только на отдельной базе для бенчмарков.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, text
+
+from config import SessionLocal, engine
+from models.product import Product
+import services.facet_service as facet_service
+import services.product_service as product_service
+from bench_pagination import measure, seed_products
+
+SCENARIOS = [
+    ("без фильтров", {}),
+    ("категория", {"category": "Shoes"}),
+    ("категория + цена", {"category": "Shoes", "min_price": 50, "max_price": 150}),
+    ("размеры", {"sizes": ["XL", "XXL"]}),
+    ("все фильтры", {"category": "Tops", "min_price": 20, "max_price": 200, "sizes": ["S"], "min_rating": 3}),
+]
+
+
+def facets_per_query(db, **filters):
+    """Прежний подход: отдельный запрос на каждый фасет"""
+    conditions = facet_service.filter_conditions(engine.dialect.name, **filters)
+
+    def others(name):
+        return [condition for other, condition in conditions.items() if other != name]
+
+    db.query(func.count(Product.id)).filter(*conditions.values()).scalar()
+    db.query(Product.category, func.count()).filter(*others("category")).group_by(Product.category).all()
+    db.query(Product.sizes, func.count()).filter(*others("sizes")).group_by(Product.sizes).all()
+    for low, high in zip(facet_service.PRICE_BUCKETS, facet_service.PRICE_BUCKETS[1:] + [None]):
+        query = db.query(func.count(Product.id)).filter(*others("price"), Product.actual_price >= low)
+        if high is not None:
+            query = query.filter(Product.actual_price < high)
+        query.scalar()
+    for threshold in facet_service.RATING_THRESHOLDS:
+        db.query(func.count(Product.id)).filter(*others("rating"), Product.rating >= threshold).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="сколько тестовых товаров добавить перед замером")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.seed:
+            seed_products(db, args.seed)
+        if engine.dialect.name == "postgresql":
+            db.execute(text("ANALYZE products"))
+            db.commit()
+
+        total = db.query(Product).count()
+        print(f"Товаров в базе: {total}, движок: {engine.dialect.name}")
+        print(f"{'сценарий':<20} {'страница, мс':>13} {'по цене, мс':>12} {'фасеты, мс':>11} {'по фасету, мс':>14}")
+
+        for name, filters in SCENARIOS:
+            page_ms = measure(lambda: product_service.get_products(db, limit=args.limit, **filters), args.repeats)
+            sorted_ms = measure(
+                lambda: product_service.get_products(db, limit=args.limit, sort="price_asc", **filters), args.repeats
+            )
+            facets_ms = measure(lambda: facet_service.get_facets(db, **filters), args.repeats)
+            naive_ms = measure(lambda: facets_per_query(db, **filters), args.repeats)
+            db.expunge_all()
+            print(f"{name:<20} {page_ms:>13.2f} {sorted_ms:>12.2f} {facets_ms:>11.2f} {naive_ms:>14.2f}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
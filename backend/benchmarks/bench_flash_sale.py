@@ -0,0 +1,155 @@
+"""
+Нагрузочный тест распродажи: сотни покупателей одновременно берут один SKU.
+
+Варианты:
+  naive  - проверка остатка SELECT, затем запись прочитанного значения
+           минус один (проверка и списание не атомарны);
+  after  - текущий order_service.create_order: условный UPDATE
+           stock = stock - qty WHERE stock >= qty в транзакции заказа.
+
+Для каждого варианта остаток SKU выставляется в --stock, затем --buyers
+покупателей (по --concurrency одновременно, каждый в своем потоке и своей
+сессии) оформляют заказ на одну штуку. Проверяется, что продано не больше
+остатка и остаток сошелся: продано + осталось = --stock. Созданные заказы
+и строка остатка удаляются после замера.
+
+Запуск из папки backend (нужны товары и хотя бы один пользователь):
+    python benchmarks/bench_flash_sale.py
+    python benchmarks/bench_flash_sale.py --buyers 1000 --concurrency 300 --stock 50
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, func, select, update
+
+from config import SessionLocal
+from models.inventory import InventoryItem, Reservation
+from models.order import Order, order_products
+from models.product import Product
+from models.user import User
+from schemas.order import OrderCreate
+from services.inventory_service import OutOfStockError
+import services.order_service as order_service
+
+SIZE = "M"
+
+
+def buy_naive(db, order: OrderCreate, user_id: int):
+    """Прежний подход к остатку: прочитать, проверить, записать"""
+    item = order.items[0]
+    stock = db.scalar(
+        select(InventoryItem.stock)
+        .where(InventoryItem.product_id == item.product_id, InventoryItem.size == item.selected_size)
+    )
+    if stock < item.quantity:
+        raise OutOfStockError([(item.product_id, item.selected_size)])
+    db.execute(
+        update(InventoryItem)
+        .where(InventoryItem.product_id == item.product_id, InventoryItem.size == item.selected_size)
+        .values(stock=stock - item.quantity)
+    )
+    db_order = Order(
+        user_id=user_id, total_price=0, shipping_address=order.shipping_address,
+        created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+    )
+    db.add(db_order)
+    db.flush()
+    db.execute(order_products.insert().values(
+        order_id=db_order.id, product_id=item.product_id, quantity=item.quantity, selected_size=item.selected_size
+    ))
+    db.commit()
+    return db_order.id
+
+
+def buy_after(db, order: OrderCreate, user_id: int):
+    return order_service.create_order(db, order, user_id)["id"]
+
+
+VARIANTS = {"naive": buy_naive, "after": buy_after}
+
+
+def run_variant(name: str, product_id: int, user_id: int, args) -> dict:
+    with SessionLocal() as db:
+        db.execute(delete(InventoryItem).where(InventoryItem.product_id == product_id, InventoryItem.size == SIZE))
+        db.add(InventoryItem(product_id=product_id, size=SIZE, stock=args.stock))
+        db.commit()
+
+    order = OrderCreate(
+        shipping_address="flash sale",
+        items=[{"product_id": product_id, "quantity": 1, "selected_size": SIZE}]
+    )
+    buy = VARIANTS[name]
+
+    def buyer(_):
+        started = time.perf_counter()
+        with SessionLocal() as db:
+            try:
+                return "sold", buy(db, order, user_id), time.perf_counter() - started
+            except OutOfStockError:
+                db.rollback()
+                return "sold_out", None, time.perf_counter() - started
+            except Exception:
+                db.rollback()
+                return "error", None, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(buyer, range(args.buyers)))
+    elapsed = time.perf_counter() - started
+
+    order_ids = [order_id for outcome, order_id, _ in results if outcome == "sold"]
+    latencies = sorted(latency for *_, latency in results)
+    with SessionLocal() as db:
+        left = db.scalar(
+            select(InventoryItem.stock).where(InventoryItem.product_id == product_id, InventoryItem.size == SIZE)
+        )
+        db.execute(delete(Reservation).where(Reservation.order_id.in_(order_ids)))
+        db.execute(delete(order_products).where(order_products.c.order_id.in_(order_ids)))
+        db.execute(delete(Order).where(Order.id.in_(order_ids)))
+        db.execute(delete(InventoryItem).where(InventoryItem.product_id == product_id, InventoryItem.size == SIZE))
+        db.commit()
+
+    sold = len(order_ids)
+    return {
+        "sold": sold,
+        "sold_out": sum(1 for outcome, *_ in results if outcome == "sold_out"),
+        "errors": sum(1 for outcome, *_ in results if outcome == "error"),
+        "left": left,
+        # Продано больше, чем было, или остаток не сошелся с продажами
+        "oversold": max(sold - args.stock, 0) + abs(args.stock - sold - left),
+        "rps": round(args.buyers / elapsed, 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buyers", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--stock", type=int, default=100)
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        user_id = db.scalar(select(func.min(User.id)))
+        product_id = db.scalar(select(func.min(Product.id)))
+    if user_id is None or product_id is None:
+        raise SystemExit("Нужны хотя бы один пользователь и один товар")
+
+    print(f"{'вариант':>8} {'продано':>8} {'отказов':>8} {'ошибок':>7} {'осталось':>9} {'перепродано':>12} {'заказов/с':>10} {'p99, мс':>8}")
+    for name in args.variants:
+        result = run_variant(name, product_id, user_id, args)
+        print(
+            f"{name:>8} {result['sold']:>8} {result['sold_out']:>8} {result['errors']:>7} {result['left']:>9} "
+            f"{result['oversold']:>12} {result['rps']:>10} {result['p99_ms']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Нагрузочный тест очереди фоновых задач: пропускная способность и
+отсутствие повторного выполнения при нескольких процессах обработчика.
+
+В очередь ставится --jobs задач; каждая записывает свой номер в
+служебную таблицу с первичным ключом, поэтому повторное выполнение
+одной задачи упало бы на уникальности. Доля --fail-rate задач падает при
+первой попытке и проходит при повторе (проверка повторов с задержкой).
+Для каждого числа процессов из --processes выводятся время разбора
+очереди, задач в секунду и число выполненных, повторенных и dead задач.
+
+Запуск из папки backend:
+    python benchmarks/bench_job_queue.py
+    python benchmarks/bench_job_queue.py --jobs 50000 --processes 1 4 8 --batch 50
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, func, select, text
+
+from config import SessionLocal, engine
+from models.job import Job
+import services.job_queue as job_queue
+
+KIND = "bench.record"
+
+
+@job_queue.handler(KIND)
+def record(db, payload):
+    if payload["fail"] and not db.scalar(text("SELECT 1 FROM bench_job_failed WHERE seq = :seq"), payload):
+        # Падение фиксируется отдельной транзакцией: попытка задачи откатывается
+        with SessionLocal() as log:
+            log.execute(text("INSERT INTO bench_job_failed (seq) VALUES (:seq)"), payload)
+            log.commit()
+        raise RuntimeError("падение первой попытки")
+    db.execute(text("INSERT INTO bench_job_runs (seq) VALUES (:seq)"), payload)
+
+
+def work(index: int, batch: int, stop):
+    engine.dispose(close=False)
+    job_queue.run_worker(f"bench:{os.getpid()}:{index}", stop, batch=batch, poll_interval=0.05)
+
+
+def remaining() -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).where(Job.kind == KIND, Job.status.in_(["queued", "running"])))
+
+
+def run(processes: int, args) -> dict:
+    with SessionLocal() as db:
+        for table in ("bench_job_runs", "bench_job_failed"):
+            db.execute(text(f"CREATE TABLE IF NOT EXISTS {table} (seq INTEGER PRIMARY KEY)"))
+            db.execute(text(f"DELETE FROM {table}"))
+        db.execute(delete(Job).where(Job.kind == KIND))
+        fail_every = round(1 / args.fail_rate) if args.fail_rate else 0
+        job_queue.enqueue_many(
+            db, KIND,
+            ({"seq": seq, "fail": bool(fail_every) and seq % fail_every == 0} for seq in range(args.jobs))
+        )
+        db.commit()
+
+    stop = multiprocessing.Event()
+    workers = [
+        multiprocessing.Process(target=work, args=(index, args.batch, stop)) for index in range(processes)
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    while remaining():
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    with SessionLocal() as db:
+        counts = dict(db.execute(select(Job.status, func.count()).where(Job.kind == KIND).group_by(Job.status)).all())
+        result = {
+            "seconds": round(elapsed, 2),
+            "rps": round(args.jobs / elapsed, 1),
+            "done": counts.get("done", 0),
+            "executed": db.scalar(text("SELECT count(*) FROM bench_job_runs")),
+            "retried": db.scalar(select(func.count()).where(Job.kind == KIND, Job.attempts > 1)),
+            "dead": counts.get("dead", 0),
+        }
+        db.execute(delete(Job).where(Job.kind == KIND))
+        db.execute(text("DROP TABLE bench_job_runs"))
+        db.execute(text("DROP TABLE bench_job_failed"))
+        db.commit()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch", type=int, default=20)
+    parser.add_argument("--fail-rate", type=float, default=0.01)
+    args = parser.parse_args()
+    # Повтор упавших задач без долгого ожидания
+    job_queue.JOB_RETRY_DELAY = 0.01
+
+    print(f"{'процессов':>10} {'секунд':>8} {'задач/с':>9} {'выполнено':>10} {'записей':>8} {'повторов':>9} {'dead':>5}")
+    for processes in args.processes:
+        result = run(processes, args)
+        print(
+            f"{processes:>10} {result['seconds']:>8} {result['rps']:>9} {result['done']:>10} "
+            f"{result['executed']:>8} {result['retried']:>9} {result['dead']:>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Бенчмарк проверки паролей при всплеске входов: отзывчивость цикла событий.
+
+--logins одновременных проверок пароля bcrypt в одном цикле событий;
+параллельно каждые 10 мс просыпается «пульс», как прочие запросы процесса.
+Варианты:
+  inline - pwd_context.verify прямо в корутине (как authenticate_user_async
+           до пула): цикл стоит, пока идет bcrypt;
+  pool   - password_hashing.verify_password_async: bcrypt в пуле из
+           PASSWORD_HASH_WORKERS потоков, цикл свободен.
+
+Выводятся время всплеска, входов в секунду и задержка пульса (p50, p99,
+максимум) - на столько же задерживается любой другой запрос процесса.
+
+Запуск из папки backend (база не нужна):
+    python benchmarks/bench_login.py
+    python benchmarks/bench_login.py --logins 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services.password_hashing as password_hashing
+
+HEARTBEAT = 0.01
+
+
+async def inline(password: str, hashed: str) -> bool:
+    return password_hashing.pwd_context.verify(password, hashed)
+
+
+async def pool(password: str, hashed: str) -> bool:
+    return await password_hashing.verify_password_async(password, hashed)
+
+
+async def heartbeat(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        expected = time.perf_counter() + HEARTBEAT
+        await asyncio.sleep(HEARTBEAT)
+        lags.append(max(0.0, time.perf_counter() - expected) * 1000)
+
+
+async def burst(verify, logins: int, hashed: str) -> dict:
+    stop, lags = asyncio.Event(), []
+    pulse = asyncio.create_task(heartbeat(stop, lags))
+    await asyncio.sleep(HEARTBEAT * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*(verify("password", hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await pulse
+    lags.sort()
+    return {
+        "seconds": elapsed,
+        "rps": logins / elapsed,
+        "p50": lags[len(lags) // 2],
+        "p99": lags[int(len(lags) * 0.99)],
+        "max": lags[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=50)
+    args = parser.parse_args()
+    # Очередь пула должна вместить весь всплеск
+    password_hashing._slots = threading.BoundedSemaphore(max(args.logins, 1))
+
+    hashed = password_hashing.pwd_context.hash("password")
+    print(f"Потоков bcrypt: {password_hashing.PASSWORD_HASH_WORKERS}, ядер: {os.cpu_count()}")
+    print(f"{'вариант':>8} {'секунд':>8} {'входов/с':>9} {'пульс p50':>10} {'p99':>8} {'макс, мс':>9}")
+    for name, verify in (("inline", inline), ("pool", pool)):
+        result = asyncio.run(burst(verify, args.logins, hashed))
+        print(
+            f"{name:>8} {result['seconds']:>8.2f} {result['rps']:>9.1f} "
+            f"{result['p50']:>10.1f} {result['p99']:>8.1f} {result['max']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
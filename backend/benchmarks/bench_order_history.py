@@ -0,0 +1,136 @@
+"""
+Бенчмарк истории заказов в профиле покупателя.
+
+Варианты загрузки первой страницы (20 заказов) случайного покупателя:
+  no_index - прежний список заказов с фильтром по user_id без индекса
+             (индекс истории удаляется в транзакции замера и возвращается
+             откатом): заказы всех покупателей перебираются по индексу
+             времени создания или читается вся таблица;
+  list     - прежний список по индексу и позиции заказов для картинок и
+             числа товаров (как OrderHistory до сводки в заказе): 2 запроса;
+  history  - order_service.history_statement: один проход по индексу
+             ix_orders_user_history, сводка читается из самого индекса.
+
+Выводятся число запросов, p50/p95 задержки и узел плана первого запроса.
+
+Запуск из папки backend (--seed добавляет покупателей и заказы, после
+замера они удаляются; запускайте на отдельной базе PostgreSQL):
+    python benchmarks/bench_order_history.py --seed-users 2000 --orders-per-user 100
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from config import SessionLocal
+from models.order import Order
+import services.order_service as order_service
+
+USER_PREFIX = "bench_history_"
+PAGE = 20
+
+
+def seed(db, users: int, orders_per_user: int):
+    db.execute(text(
+        "INSERT INTO users (username, email, hashed_password, is_active, version) "
+        "SELECT :prefix || g, :prefix || g || '@example.com', 'x', true, 1 FROM generate_series(1, :users) g"
+    ), {"prefix": USER_PREFIX, "users": users})
+    product_id, img = db.execute(text("SELECT id, img FROM products ORDER BY id LIMIT 1")).one()
+    # Заказы разных покупателей перемешаны по времени, как в живой таблице
+    db.execute(text(
+        "INSERT INTO orders (user_id, total_price, status, shipping_address, created_at, updated_at, item_count, thumbnail) "
+        "SELECT u.id, 100, 'paid', 'bench', now() - (random() * interval '365 days'), now(), 1, :img "
+        "FROM users u, generate_series(1, :per_user) WHERE u.username LIKE :prefix || '%'"
+    ), {"prefix": USER_PREFIX, "per_user": orders_per_user, "img": img})
+    db.execute(text(
+        "INSERT INTO order_products (order_id, product_id, quantity, selected_size) "
+        "SELECT o.id, :product_id, 1, 'M' FROM orders o JOIN users u ON u.id = o.user_id "
+        "WHERE u.username LIKE :prefix || '%'"
+    ), {"prefix": USER_PREFIX, "product_id": product_id})
+    db.commit()
+    db.execute(text("ANALYZE orders"))
+    db.execute(text("ANALYZE order_products"))
+    db.commit()
+
+
+def cleanup(db):
+    bench_orders = "SELECT o.id FROM orders o JOIN users u ON u.id = o.user_id WHERE u.username LIKE :prefix || '%'"
+    params = {"prefix": USER_PREFIX}
+    db.execute(text(f"DELETE FROM order_products WHERE order_id IN ({bench_orders})"), params)
+    db.execute(text(f"DELETE FROM orders WHERE id IN ({bench_orders})"), params)
+    db.execute(text("DELETE FROM users WHERE username LIKE :prefix || '%'"), params)
+    db.commit()
+
+
+def load_list(db, user_id):
+    orders = db.execute(order_service._orders_statement(user_id, limit=PAGE, rows=True)).all()
+    order_service.get_items(db, [order.id for order in orders])
+    return 2
+
+
+def load_history(db, user_id):
+    db.execute(order_service.history_statement(user_id, PAGE)).all()
+    return 1
+
+
+def first_plan_node(db, statement) -> str:
+    compiled = statement.compile(db.get_bind(), compile_kwargs={"literal_binds": True})
+    plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+    node = plan[0]["Plan"]
+    while node.get("Plans") and node["Node Type"] in ("Limit", "Sort", "Gather Merge", "Gather"):
+        node = node["Plans"][0]
+    return f"{node['Node Type']} {node.get('Index Name', '')}".strip()
+
+
+def measure(db, load, user_ids, repeat):
+    timings, queries = [], 0
+    for _ in range(repeat):
+        user_id = random.choice(user_ids)
+        started = time.perf_counter()
+        queries = load(db, user_id)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return queries, timings[len(timings) // 2], timings[int(len(timings) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed-users", type=int, default=2000)
+    parser.add_argument("--orders-per-user", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        seed(db, args.seed_users, args.orders_per_user)
+        user_ids = db.execute(
+            text("SELECT id FROM users WHERE username LIKE :prefix || '%'"), {"prefix": USER_PREFIX}
+        ).scalars().all()
+        sample = order_service._orders_statement(user_ids[0], limit=PAGE, rows=True)
+        history = order_service.history_statement(user_ids[0], PAGE)
+        print(f"Заказов в таблице: {db.query(Order).count()}")
+        print(f"{'вариант':>9} {'запросов':>9} {'p50, мс':>8} {'p95, мс':>8}  план")
+
+        # Без индекса: DROP INDEX откатывается вместе с транзакцией замера
+        db.execute(text("DROP INDEX ix_orders_user_history"))
+        queries, p50, p95 = measure(db, load_list, user_ids, max(args.repeat // 10, 5))
+        print(f"{'no_index':>9} {queries:>9} {p50:>8.2f} {p95:>8.2f}  {first_plan_node(db, sample)}")
+        db.rollback()
+
+        for name, load, statement in (("list", load_list, sample), ("history", load_history, history)):
+            queries, p50, p95 = measure(db, load, user_ids, args.repeat)
+            print(f"{name:>9} {queries:>9} {p50:>8.2f} {p95:>8.2f}  {first_plan_node(db, statement)}")
+            db.rollback()
+    finally:
+        db.rollback()
+        cleanup(db)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
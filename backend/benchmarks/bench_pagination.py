@@ -0,0 +1,112 @@
+"""
+Бенчмарк пагинации: offset(skip) против курсора (keyset).
+
+Запуск из папки backend:
+    python benchmarks/bench_pagination.py --seed 300000
+    python benchmarks/bench_pagination.py --pages 1 100 1000 10000
+
+--seed добавляет указанное число тестовых товаров в базу из DATABASE_URL,
+поэтому запускайте его только на отдельной базе для бенчмарков.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+
+from config import SessionLocal, engine, Base
+from models.product import Product
+import services.product_service as product_service
+from services.pagination import encode_cursor
+
+
+CATEGORIES = ["Hoodies", "Bottom", "Shoes", "Bags", "Accessories", "Jewelry", "Tops", "More"]
+ADJECTIVES = [
+    "Shadow", "Frost", "Carbon", "Storm", "Gravity", "Lunar", "Iris", "Amber", "Urban", "Ember",
+    "Velvet", "Onyx", "Silent", "Crimson", "Polar", "Neon", "Ashen", "Golden", "Midnight", "Stone",
+]
+NOUNS = [
+    "Pulse", "Veil", "Lace", "Haul", "Pin", "Link", "Crest", "Mirage", "Drift", "Echo",
+    "Rift", "Bloom", "Shard", "Wave", "Forge", "Trail", "Spire", "Glow", "Fang", "Orbit",
+]
+SIZE_SETS = [["S", "M"], ["M", "L", "XL"], ["XS", "S"], ["L", "XL", "XXL"], ["ONE SIZE"], ["36", "37", "38", "39"]]
+
+
+def seed_products(db, count: int, batch_size: int = 5000):
+    """Массовое добавление тестовых товаров"""
+    for start in range(0, count, batch_size):
+        rows = [
+            {
+                "name": f"{ADJECTIVES[i % 20]} {NOUNS[i // 20 % 20]} {i}",
+                "price": f"${10 + i % 300}",
+                "actual_price": float(10 + i % 300),
+                "img": "https://example.com/img.jpg",
+                "category": CATEGORIES[i % len(CATEGORIES)],
+                "sizes": SIZE_SETS[i % len(SIZE_SETS)],
+                "rating": (i % 50) / 10,
+            }
+            for i in range(start, min(start + batch_size, count))
+        ]
+        db.execute(insert(Product), rows)
+        db.commit()
+    print(f"Добавлено {count} товаров")
+
+
+def measure(fn, repeats: int) -> float:
+    """Медианное время вызова в миллисекундах"""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="сколько тестовых товаров добавить перед замером")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if args.seed:
+            seed_products(db, args.seed)
+
+        total = db.query(Product).count()
+        print(f"Товаров в базе: {total}, размер страницы: {args.page_size}")
+        print(f"{'страница':>10} {'offset, мс':>12} {'курсор, мс':>12}")
+
+        for page in args.pages:
+            skip = (page - 1) * args.page_size
+            if skip >= total:
+                print(f"{page:>10} {'-':>12} {'-':>12}  (за пределами каталога)")
+                continue
+
+            # Курсор страницы строится по последнему id предыдущей страницы (вне замера)
+            cursor = None
+            if skip:
+                last_id = db.query(Product.id).order_by(Product.id).offset(skip - 1).limit(1).scalar()
+                cursor = encode_cursor(last_id)
+
+            offset_ms = measure(
+                lambda: product_service.get_products(db, skip=skip, limit=args.page_size), args.repeats
+            )
+            keyset_ms = measure(
+                lambda: product_service.get_products(db, limit=args.page_size, after=cursor), args.repeats
+            )
+            db.expunge_all()
+            print(f"{page:>10} {offset_ms:>12.2f} {keyset_ms:>12.2f}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
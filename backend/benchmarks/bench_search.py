@@ -0,0 +1,63 @@
+"""
+Бенчмарк поиска товаров: задержки p50/p95 на большом каталоге.
+
+Запуск из папки backend (после python init_db.py):
+    python benchmarks/bench_search.py --seed 100000
+    python benchmarks/bench_search.py --queries 500
+
+--seed добавляет тестовые товары в базу из DATABASE_URL,
+поэтому запускайте его только на отдельной базе для бенчмарков.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import SessionLocal, engine
+from models.product import Product
+import services.product_service as product_service
+from services.search_service import install_search_schema
+from bench_pagination import seed_products
+
+QUERIES = ["shadow pulse", "frost", "carbon veil 42", "storm lace", "lunra pin", "amber crest", "echo 777", "ony"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="сколько тестовых товаров добавить перед замером")
+    parser.add_argument("--queries", type=int, default=200, help="число поисковых запросов")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    install_search_schema(engine)
+    db = SessionLocal()
+    try:
+        if args.seed:
+            seed_products(db, args.seed)
+
+        total = db.query(Product).count()
+        print(f"Товаров в базе: {total}, движок: {engine.dialect.name}")
+
+        random.seed(0)
+        timings = []
+        for _ in range(args.queries):
+            query = random.choice(QUERIES)
+            category = random.choice([None, None, "Shoes"])
+            started = time.perf_counter()
+            product_service.search_products(db, query=query, limit=args.limit, category=category)
+            timings.append((time.perf_counter() - started) * 1000)
+            db.expunge_all()
+
+        timings.sort()
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+        print(f"Запросов: {len(timings)}, p50: {statistics.median(timings):.2f} мс, p95: {p95:.2f} мс")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
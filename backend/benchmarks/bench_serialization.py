@@ -0,0 +1,152 @@
+"""
+Бенчмарк сериализации списков: прежний путь FastAPI против orjson и потока.
+
+Сравнивает на одной базе:
+  before - response_model со списком ORM-объектов: валидация каждой строки
+           pydantic, jsonable_encoder и стандартный json (как было раньше);
+  after  - текущий /api/products/: словари из строк без повторной валидации,
+           orjson, а при limit >= STREAMING_MIN_LIMIT - потоковый массив
+           из серверного курсора.
+
+Каждый вариант запускается в отдельном процессе, чтобы пиковый RSS
+(ru_maxrss) относился только к нему. Запросы идут прямо в ASGI-приложение
+без сети, тело ответа не сохраняется; кеш списков сбрасывается перед
+каждым запросом, чтобы мерить работу, а не попадания в кеш.
+
+Запуск из папки backend (нужна база с товарами, см. bench_pagination.py --seed):
+    python benchmarks/bench_serialization.py
+    python benchmarks/bench_serialization.py --limits 100 1000 5000 --requests 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+VARIANTS = ("before", "after")
+
+
+def _before_app():
+    """Приложение с прежним обработчиком списка товаров"""
+    from fastapi import Depends, FastAPI
+    from sqlalchemy.orm import Session
+
+    from config import get_db
+    import services.product_service as product_service
+    from schemas.product import ProductInDB
+
+    app = FastAPI()
+
+    @app.get("/api/products/", response_model=List[ProductInDB])
+    def read_products(limit: int = 100, db: Session = Depends(get_db)):
+        return product_service.get_products(db, limit=limit)
+
+    return app
+
+
+async def asgi_get(app, path: str, query: str = "", headers: Optional[List[tuple]] = None):
+    """Один GET напрямую в ASGI-приложение; возвращает статус и размер тела"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(b"host", b"bench")] + (headers or []),
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+    status = None
+    size = 0
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Клиент не отключается: потоковый ответ ждет http.disconnect до конца передачи
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, size
+
+
+def run_variant(variant: str, limit: int, requests: int) -> dict:
+    """Замер одного варианта в текущем процессе"""
+    import services.product_service as product_service
+
+    if variant == "before":
+        app = _before_app()
+    else:
+        from main import app
+
+    async def run():
+        # Прогрев: импорт, соединение с базой, компиляция запросов
+        await asgi_get(app, "/api/products/", f"limit={limit}")
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        for _ in range(requests):
+            product_service.listing_cache.clear()
+            status, size = await asgi_get(app, "/api/products/", f"limit={limit}")
+            if status != 200:
+                raise RuntimeError(f"{variant}: ответ {status}")
+        elapsed = time.perf_counter() - started
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {
+            "rps": round(requests / elapsed, 1),
+            "ms": round(elapsed / requests * 1000, 1),
+            "bytes": size,
+            # ru_maxrss в Linux - в килобайтах
+            "peak_rss_mb": round(rss_after / 1024, 1),
+            "rss_growth_mb": round((rss_after - rss_before) / 1024, 1),
+        }
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limits", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.limits[0], args.requests)))
+        return
+
+    print(f"{'limit':>6} {'вариант':>8} {'req/s':>8} {'мс/запрос':>10} {'байт':>10} {'пик RSS, МБ':>12} {'рост RSS, МБ':>13}")
+    for limit in args.limits:
+        for variant in VARIANTS:
+            output = subprocess.run(
+                [sys.executable, "-W", "ignore", os.path.abspath(__file__),
+                 "--variant", variant, "--limits", str(limit), "--requests", str(args.requests)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{limit:>6} {variant:>8} {result['rps']:>8} {result['ms']:>10} {result['bytes']:>10} "
+                f"{result['peak_rss_mb']:>12} {result['rss_growth_mb']:>13}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,189 +1,84 @@
 """
-Скрипт для импорта товаров из фронтенда в базу данных PostgreSQL.
+Импорт каталога товаров из CSV, JSONL или массива товаров в JSX
+(см. services/catalog_import.py).
+
+Скрипт не задает вопросов: существующие товары обновляются по id, а
+замена всего каталога включается флагом --replace. Прерванный импорт
+продолжается с контрольной точки (--resume). Записи разбираются в пуле
+из --workers процессов, пока поток записи загружает прошлые пачки;
+отклоненные записи с причиной сохраняются в --rejects.
+
+Запуск из папки backend:
+    python import_products.py data/sample_products.jsonl
+    python import_products.py catalog.csv --chunk-size 20000
+    python import_products.py catalog.csv --resume
+    python import_products.py catalog.jsonl --workers 8 --rejects rejected.jsonl
+    python import_products.py ../my-app/src/components/ProductPage.jsx --replace
 """
-import re
-import ast
-from sqlalchemy.orm import Session
+import argparse
+import os
+import sys
+
+from config import Base, SessionLocal, engine
+import services.catalog_import as catalog_import
+
+# Сколько отклоненных записей выводится подробно
+MAX_REPORTED_REJECTS = 20
 
-from config import get_db, engine, Base
-from models.product import Product
 
-# Создание таблиц в базе данных
-Base.metadata.create_all(bind=engine)
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="файл .csv, .jsonl или .jsx")
+    parser.add_argument("--format", choices=catalog_import.FORMATS, help="формат (по умолчанию - по расширению)")
+    parser.add_argument("--chunk-size", type=int, default=catalog_import.DEFAULT_CHUNK_SIZE,
+                        help="записей в одной транзакции")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="процессов разбора записей (0 - без пула)")
+    parser.add_argument("--parse-batch", type=int, default=catalog_import.DEFAULT_PARSE_BATCH,
+                        help="записей в одной задаче разбора")
+    parser.add_argument("--rejects", help="файл отклоненных записей (по умолчанию <path>.rejects.jsonl)")
+    parser.add_argument("--checkpoint", help="файл контрольной точки (по умолчанию <path>.checkpoint)")
+    restart = parser.add_mutually_exclusive_group()
+    restart.add_argument("--resume", action="store_true", help="продолжить прерванный импорт")
+    restart.add_argument("--restart", action="store_true", help="начать заново, удалив контрольную точку")
+    parser.add_argument("--replace", action="store_true", help="удалить все товары перед импортом")
+    parser.add_argument("--quiet", action="store_true", help="не выводить прогресс по пачкам")
+    args = parser.parse_args()
 
-def extract_products(file_path):
-    """
-    Извлекает данные о товарах из JS файла фронтенда.
-    """
-    with open(file_path, 'r', encoding='utf-8') as file:
-        content = file.read()
-    
-    # Находим массив товаров
-    start_index = content.find("const products = [")
-    if start_index == -1:
-        print("Не удалось найти массив товаров в файле.")
-        return []
-    
-    # Находим конец массива
-    bracket_level = 0
-    in_array = False
-    start_pos = start_index + len("const products = ")
-    for i, char in enumerate(content[start_pos:], start=start_pos):
-        if char == '[' and not in_array:
-            in_array = True
-            bracket_level += 1
-        elif char == '[':
-            bracket_level += 1
-        elif char == ']':
-            bracket_level -= 1
-            if bracket_level == 0 and in_array:
-                end_pos = i + 1
-                break
-    
-    if not in_array or bracket_level != 0:
-        print("Не удалось найти конец массива товаров.")
-        return []
-    
-    products_array_text = content[start_pos:end_pos]
-    
-    # Парсим товары вручную
-    products = []
-    current_product = {}
-    in_product = False
-    current_field = None
-    current_value = ""
-    in_string = False
-    escaped = False
-    
-    # Заменим одинарные кавычки на двойные для полей и значений
-    products_array_text = products_array_text.replace("'", '"')
-    
-    # Находим отдельные товары с помощью регулярного выражения
-    product_pattern = r'\{\s*"id":\s*(\d+),\s*"name":\s*"([^"]+)",\s*"price":\s*"([^"]+)",\s*"img":\s*"([^"]+)",\s*"category":\s*"([^"]+)"(?:,\s*"sizes":\s*(\[[^\]]+\]))?(?:,\s*"rating":\s*([^,]+))?(?:,\s*"reviews":\s*(\[[^\]]+\]))?'
-    
-    matches = re.finditer(product_pattern, products_array_text)
-    for match in matches:
-        product = {
-            'id': int(match.group(1)),
-            'name': match.group(2),
-            'price': match.group(3),
-            'img': match.group(4),
-            'category': match.group(5),
-        }
-        
-        # Попробуем извлечь размеры
-        if match.group(6):
-            try:
-                # Удаляем одинарные кавычки и заменяем на двойные для корректного JSON
-                sizes_text = match.group(6).replace("'", '"')
-                product['sizes'] = ast.literal_eval(sizes_text)
-            except:
-                product['sizes'] = []
-        else:
-            product['sizes'] = []
-        
-        # Попробуем извлечь рейтинг
-        if match.group(7):
-            try:
-                product['rating'] = float(match.group(7))
-            except:
-                product['rating'] = 0.0
-        else:
-            product['rating'] = 0.0
-        
-        # Попробуем извлечь отзывы
-        if match.group(8):
-            try:
-                # Просто сохраняем как строку, позже преобразуем в JSON
-                reviews_text = match.group(8)
-                # Преобразуем отзывы к формату JSON
-                reviews = []
-                review_pattern = r'\{\s*"user":\s*"([^"]+)",\s*"review":\s*"([^"]+)"\s*\}'
-                review_matches = re.finditer(review_pattern, reviews_text)
-                for review_match in review_matches:
-                    review = {
-                        'user': review_match.group(1),
-                        'review': review_match.group(2)
-                    }
-                    reviews.append(review)
-                product['reviews'] = reviews
-            except Exception as e:
-                print(f"Ошибка при парсинге отзывов: {e}")
-                product['reviews'] = []
-        else:
-            product['reviews'] = []
-        
-        products.append(product)
-    
-    print(f"Найдено {len(products)} товаров.")
-    return products
+    Base.metadata.create_all(bind=engine)
 
-def import_products():
-    """
-    Импортирует товары в базу данных.
-    """
-    # Путь к файлу с компонентом ProductPage.jsx, где содержатся все товары
-    file_path = "../my-app/src/components/ProductPage.jsx"
-    
-    # Извлекаем товары из файла
-    products = extract_products(file_path)
-    
-    if not products:
-        print("Не удалось найти товары или произошла ошибка при парсинге.")
-        return
-    
-    # Получаем сессию базы данных
-    db = next(get_db())
-    
-    try:
-        # Проверяем, есть ли уже товары в базе
-        existing_count = db.query(Product).count()
-        if existing_count > 0:
-            print(f"В базе данных уже есть {existing_count} товаров.")
-            decision = input("Вы хотите удалить существующие товары и импортировать новые? (y/n): ")
-            if decision.lower() == 'y':
-                # Удаляем все товары
-                db.query(Product).delete()
-                db.commit()
-                print("Существующие товары удалены.")
-            else:
-                print("Импорт отменен.")
-                return
-        
-        # Импортируем товары в базу данных
-        for product in products:
-            # Извлекаем числовое значение цены
-            price_str = product['price']
-            # Убираем символ доллара и преобразуем в число
-            actual_price = float(price_str.replace('$', ''))
-            
-            # Создаем новую запись в базе данных
-            db_product = Product(
-                id=product['id'],
-                name=product['name'],
-                price=product['price'],
-                actual_price=actual_price,
-                img=product['img'],
-                category=product['category'],
-                sizes=product['sizes'],
-                rating=product['rating'],
-                reviews=product['reviews'],
-                description=None  # Описание может быть добавлено позже
+    rejects = [0]
+
+    def on_reject(seq: int, error: str):
+        if rejects[0] < MAX_REPORTED_REJECTS:
+            print(f"Запись {seq} отклонена: {error}", file=sys.stderr)
+        rejects[0] += 1
+
+    with SessionLocal() as db:
+        try:
+            stats = catalog_import.run_import(
+                db, args.path,
+                file_format=args.format,
+                chunk_size=args.chunk_size,
+                checkpoint_path=args.checkpoint,
+                resume=args.resume,
+                restart=args.restart,
+                replace=args.replace,
+                workers=args.workers,
+                parse_batch=args.parse_batch,
+                rejects_path=args.rejects,
+                on_progress=None if args.quiet else lambda stats: print(stats.report(), flush=True),
+                on_reject=on_reject
             )
-            
-            db.add(db_product)
-            print(f"Добавлен товар: {product['name']}")
-        
-        # Сохраняем изменения
-        db.commit()
-        print(f"Импорт завершен успешно. Добавлено {len(products)} товаров.")
-    
-    except Exception as e:
-        db.rollback()
-        print(f"Ошибка при импорте данных: {e}")
-    
-    finally:
-        db.close()
+        except catalog_import.CatalogImportError as e:
+            print(f"Импорт не выполнен: {e}", file=sys.stderr)
+            sys.exit(2)
+    print(f"Импорт завершен за {stats.snapshot()['seconds']} с: {stats.report()}")
+    if stats.skipped:
+        print(f"Пропущено записей, загруженных прошлым запуском: {stats.skipped}")
+    if stats.rejected:
+        print(f"Отклоненные записи: {args.rejects or args.path + '.rejects.jsonl'}")
+
 
 if __name__ == "__main__":
-    import_products()
\ No newline at end of file
+    main()
@@ -0,0 +1,215 @@
+"""
+Импорт покупателей из выгрузки старого магазина (CSV или JSONL).
+
+Файл читается потоком, пачками по --batch строк, поэтому память не
+зависит от размера выгрузки. Строка проверяется схемой UserImport.
+Пароли хешируются bcrypt в пуле из --processes процессов: bcrypt стоит
+сотни миллисекунд на пароль, и пул занимает все ядра машины. Пока пул
+хеширует следующую пачку, текущая загружается в базу. Готовый
+bcrypt-хеш из старого магазина (колонка hashed_password) переносится
+как есть.
+
+В PostgreSQL пачка загружается командой COPY во временную таблицу и
+переносится одним INSERT ... ON CONFLICT DO NOTHING. Покупатели с уже
+занятыми email или именем пропускаются, поэтому повторный запуск после
+сбоя безопасен.
+
+Колонки: username, email, password или hashed_password, first_name,
+last_name, phone_number, address, city.
+
+Запуск из папки backend:
+    python import_users.py customers.csv
+    python import_users.py customers.jsonl --processes 8 --batch 5000
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from config import SessionLocal, engine
+from models.user import User
+from schemas.user import UserImport
+from services.dialects import dialect_insert
+from services.password_hashing import pwd_context
+
+# Колонки users, которые заполняет импорт
+COLUMNS = ("username", "email", "hashed_password", "first_name", "last_name", "phone_number", "address", "city")
+# Префиксы bcrypt-хешей, которые проверяет passlib
+BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+# Сколько ошибочных строк выводится подробно
+MAX_REPORTED_ERRORS = 20
+
+
+class ImportStats:
+    """Счетчики импорта"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.read = 0
+        self.invalid = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.hashed = 0
+
+    def report(self) -> str:
+        elapsed = time.monotonic() - self.started
+        return (
+            f"прочитано {self.read}, добавлено {self.inserted}, пропущено (заняты) {self.skipped}, "
+            f"с ошибками {self.invalid}, захешировано {self.hashed}, "
+            f"{self.read / elapsed if elapsed else 0:.0f} строк/с"
+        )
+
+
+def read_rows(path: str, file_format: str) -> Iterator[Tuple[int, dict]]:
+    """Строки файла с номерами (для CSV - номер строки после заголовка)"""
+    with open(path, newline="", encoding="utf-8") as file:
+        if file_format == "csv":
+            for number, row in enumerate(csv.DictReader(file), start=2):
+                # Пустые ячейки CSV - отсутствующие значения
+                yield number, {key: value or None for key, value in row.items()}
+        else:
+            for number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield number, json.loads(line)
+                except ValueError as e:
+                    yield number, {"__error__": f"неверный JSON: {e}"}
+
+
+def validate(row: dict) -> Tuple[Optional[UserImport], Optional[str]]:
+    """Проверенный покупатель или текст ошибки"""
+    if "__error__" in row:
+        return None, row["__error__"]
+    try:
+        user = UserImport.model_validate(row)
+    except ValidationError as e:
+        return None, "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+    if not user.password:
+        if not user.hashed_password:
+            return None, "нет ни password, ни hashed_password"
+        if not user.hashed_password.startswith(BCRYPT_PREFIXES):
+            return None, "hashed_password не является bcrypt-хешем"
+    return user, None
+
+
+def valid_users(rows: Iterator[Tuple[int, dict]], stats: ImportStats) -> Iterator[UserImport]:
+    for number, row in rows:
+        stats.read += 1
+        user, error = validate(row)
+        if error:
+            stats.invalid += 1
+            if stats.invalid <= MAX_REPORTED_ERRORS:
+                print(f"Строка {number}: {error}")
+            continue
+        yield user
+
+
+def _hash(password: str) -> str:
+    # Выполняется в процессе пула
+    return pwd_context.hash(password)
+
+
+def _row(user: UserImport, hashed_password: str) -> tuple:
+    return (user.username, user.email, hashed_password, user.first_name, user.last_name,
+            user.phone_number, user.address, user.city)
+
+
+def hashed_batches(users: Iterator[UserImport], executor: ProcessPoolExecutor, batch: int,
+                   processes: int, stats: ImportStats) -> Iterator[List[tuple]]:
+    """
+    Пачки строк для загрузки.
+
+    Хеширование пачки отправляется в пул сразу после чтения, а ее строки
+    выдаются после отправки следующей: пул работает, пока вызывающий код
+    загружает предыдущую пачку. В памяти не больше двух пачек.
+    """
+    pending = None
+    while True:
+        chunk = list(islice(users, batch))
+        if chunk:
+            passwords = [user.password for user in chunk if user.password]
+            stats.hashed += len(passwords)
+            hashes = executor.map(_hash, passwords, chunksize=max(1, len(passwords) // (processes * 4)))
+            current = (chunk, hashes)
+        else:
+            current = None
+        if pending:
+            chunk_users, chunk_hashes = pending
+            yield [_row(user, next(chunk_hashes) if user.password else user.hashed_password) for user in chunk_users]
+        if current is None:
+            return
+        pending = current
+
+
+def load_copy(rows: List[tuple]) -> int:
+    """Загрузка пачки через COPY во временную таблицу; возвращает число добавленных"""
+    buffer = io.StringIO()
+    # Пустое поле без кавычек COPY читает как NULL
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    columns = ", ".join(COLUMNS)
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            # Таблица живет одну транзакцию: так работает и за PgBouncer
+            cursor.execute(
+                f"CREATE TEMP TABLE users_import ({', '.join(f'{column} text' for column in COLUMNS)}) ON COMMIT DROP"
+            )
+            cursor.copy_expert(f"COPY users_import ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.execute(
+                f"INSERT INTO users ({columns}, is_active, version) "
+                f"SELECT {columns}, true, 1 FROM users_import ON CONFLICT DO NOTHING"
+            )
+            inserted = cursor.rowcount
+        connection.commit()
+        return inserted
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+
+def load_insert(db: Session, rows: List[tuple]) -> int:
+    """Загрузка пачки INSERT ... ON CONFLICT DO NOTHING (SQLite для разработки)"""
+    insert = dialect_insert(db)
+    values = [{**dict(zip(COLUMNS, row)), "is_active": True, "version": 1} for row in rows]
+    inserted = db.execute(insert(User).values(values).on_conflict_do_nothing()).rowcount
+    db.commit()
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="файл выгрузки .csv или .jsonl")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="формат файла (по умолчанию - по расширению)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="процессов для bcrypt")
+    parser.add_argument("--batch", type=int, default=2000, help="строк в одной загрузке")
+    args = parser.parse_args()
+
+    file_format = args.format or ("csv" if args.path.lower().endswith(".csv") else "jsonl")
+    stats = ImportStats()
+    users = valid_users(read_rows(args.path, file_format), stats)
+    with ProcessPoolExecutor(max_workers=args.processes) as executor, SessionLocal() as db:
+        for rows in hashed_batches(users, executor, args.batch, args.processes, stats):
+            if engine.dialect.name == "postgresql":
+                inserted = load_copy(rows)
+            else:
+                inserted = load_insert(db, rows)
+            stats.inserted += inserted
+            stats.skipped += len(rows) - inserted
+            print(stats.report(), flush=True)
+    print(f"Готово: {stats.report()}")
+
+
+if __name__ == "__main__":
+    main()
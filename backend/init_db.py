@@ -3,6 +3,7 @@
 Этот скрипт создает все необходимые таблицы в базе данных и 
 добавляет тестового пользователя с правами администратора.
 """
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 
@@ -10,10 +11,91 @@ from config import get_db, engine, Base
 from models.user import User
 from models.product import Product
 from models.order import Order, order_products
+from models.revision import Revision
+from models.review import Review
+from services.search_service import install_search_schema
+import services.rating_service as rating_service
 
 # Инициализация контекста для хеширования паролей
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Колонки и индексы, добавленные после создания таблиц: create_all не изменяет существующие таблицы
+SCHEMA_UPGRADES = [
+    "ALTER TABLE products ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1",
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1",
+    "ALTER TABLE reviews ADD COLUMN IF NOT EXISTS rating SMALLINT",
+] + [
+    f"ALTER TABLE products ADD COLUMN IF NOT EXISTS {column} INTEGER NOT NULL DEFAULT 0"
+    for column in (
+        "review_count", "rating_count", "rating_sum",
+        "stars_1", "stars_2", "stars_3", "stars_4", "stars_5",
+    )
+] + [
+    "CREATE INDEX IF NOT EXISTS ix_products_category_id ON products (category, id)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_created_at_id ON orders (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_products_category_actual_price ON products (category, actual_price, id)",
+    "CREATE INDEX IF NOT EXISTS ix_products_actual_price_id ON products (actual_price, id)",
+    "CREATE INDEX IF NOT EXISTS ix_products_sizes ON products USING gin (sizes)",
+    "ALTER TABLE orders ADD COLUMN IF NOT EXISTS item_count INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE orders ADD COLUMN IF NOT EXISTS thumbnail VARCHAR",
+    "CREATE INDEX IF NOT EXISTS ix_orders_user_history ON orders (user_id, created_at DESC, id DESC) "
+    "INCLUDE (status, total_price, item_count, thumbnail)",
+]
+
+def upgrade_schema():
+    """
+    Добавление новых колонок в уже существующие таблицы PostgreSQL.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as connection:
+        for statement in SCHEMA_UPGRADES:
+            connection.execute(text(statement))
+
+def migrate_reviews():
+    """
+    Перенос отзывов из JSONB-колонки products.reviews в таблицу reviews.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as connection:
+        has_column = connection.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'products' AND column_name = 'reviews')"
+        )).scalar()
+        if not has_column:
+            return
+        connection.execute(text(
+            "INSERT INTO reviews (product_id, \"user\", review, created_at) "
+            "SELECT p.id, r ->> 'user', r ->> 'review', now() AT TIME ZONE 'utc' "
+            "FROM products p, jsonb_array_elements(p.reviews) WITH ORDINALITY AS t(r, n) "
+            "ORDER BY p.id, t.n"
+        ))
+        # Триггер поискового вектора зависит от колонки и пересоздается в install_search_schema
+        connection.execute(text("DROP TRIGGER IF EXISTS products_search_vector_trigger ON products"))
+        connection.execute(text("ALTER TABLE products DROP COLUMN reviews"))
+        # Поисковый вектор товара пересчитается без текста отзывов
+        connection.execute(text("UPDATE products SET search_vector = NULL"))
+    print("Отзывы перенесены в таблицу reviews")
+
+def backfill_order_summaries():
+    """
+    Сводка (число товаров и картинка) для заказов, созданных до появления колонок.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as connection:
+        updated = connection.execute(text(
+            "UPDATE orders o SET item_count = s.item_count, thumbnail = s.thumbnail "
+            "FROM (SELECT op.order_id, SUM(op.quantity) AS item_count, "
+            "(array_agg(p.img ORDER BY op.product_id))[1] AS thumbnail "
+            "FROM order_products op JOIN products p ON p.id = op.product_id "
+            "GROUP BY op.order_id) s "
+            "WHERE o.id = s.order_id AND o.item_count = 0"
+        )).rowcount
+    if updated:
+        print(f"Сводка заполнена для заказов: {updated}")
+
 def init_db():
     """
     Инициализация базы данных: создание таблиц и тестового пользователя.
@@ -21,8 +103,15 @@ def init_db():
     try:
         # Создание всех таблиц
         Base.metadata.create_all(bind=engine)
+        upgrade_schema()
+        migrate_reviews()
+        backfill_order_summaries()
         print("Таблицы успешно созданы")
         
+        # Колонка, триггер и индексы полнотекстового поиска
+        install_search_schema(engine)
+        print("Поисковые индексы созданы")
+        
         # Получение сессии базы данных
         db = next(get_db())
         
@@ -45,6 +134,15 @@ def init_db():
         else:
             print("Тестовый пользователь уже существует")
         
+        # Счетчик ревизии каталога для ETag (см. product_service.bump_catalog_revision)
+        if not db.query(Revision).filter(Revision.name == "catalog").first():
+            db.add(Revision(name="catalog", value=0))
+            db.commit()
+        
+        # Агрегаты оценок и рейтинги товаров по существующим отзывам
+        rating_service.rebuild(db)
+        print("Рейтинги товаров пересчитаны")
+        
         # Добавьте здесь код для создания тестовых товаров, если нужно
         # Например:
         # create_test_products(db)
@@ -76,8 +174,9 @@ def create_test_products(db: Session):
             sizes=["S", "M", "L", "XL"],
             rating=4.5,
             reviews=[
-                {"user": "Тестовый пользователь", "review": "Отличный товар!"}
+                Review(user="Тестовый пользователь", review="Отличный товар!")
             ],
+            review_count=1,
             description="Тестовый худи для демонстрации функциональности"
         ),
         Product(
@@ -89,8 +188,9 @@ def create_test_products(db: Session):
             sizes=["S", "M", "L"],
             rating=4.2,
             reviews=[
-                {"user": "Тестовый пользователь", "review": "Хорошие штаны!"}
+                Review(user="Тестовый пользователь", review="Хорошие штаны!")
             ],
+            review_count=1,
             description="Тестовые штаны для демонстрации функциональности"
         )
     ]
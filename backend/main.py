@@ -1,11 +1,24 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 from routers import products, users, orders
-from config import get_db
+import services.events as events
+import services.idempotency_service as idempotency_service
+import services.inventory_service as inventory_service
+import services.job_queue as job_queue
+import services.login_admission as login_admission
+import services.password_hashing as password_hashing
+import services.product_service as product_service
+import services.user_service as user_service
+from pool_metrics import pool_stats
+from config import async_engine, get_async_read_db, get_db, replica_set
+from services.pagination import NEXT_CURSOR_HEADER
 
-app = FastAPI(title="Fashion Store API", version="1.0.0")
+# Ответы кодируются orjson: заметно быстрее стандартного модуля json
+app = FastAPI(title="Fashion Store API", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Настройка CORS для работы с фронтендом
 app.add_middleware(
@@ -14,6 +27,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Подключение роутеров
@@ -21,9 +35,51 @@ app.include_router(products.router, prefix="/api/products", tags=["products"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(orders.router, prefix="/api/orders", tags=["orders"])
 
+@app.exception_handler(password_hashing.PasswordHashingBusyError)
+async def password_hashing_busy(request: Request, exc: password_hashing.PasswordHashingBusyError):
+    # Очередь bcrypt заполнена (вход, регистрация, смена пароля): клиенту быстрее повторить
+    return ORJSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # Подписка на изменения из других процессов для сброса локальных кешей
+    events.start_listener()
+    # Возврат на остаток товара из просроченных резервов
+    inventory_service.start_sweeper()
+    # Удаление просроченных ключей идемпотентности
+    idempotency_service.start_purger()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await events.stop_listener()
+    await inventory_service.stop_sweeper()
+    await idempotency_service.stop_purger()
+    # Соединения асинхронного пула закрываются внутри цикла событий
+    await async_engine.dispose()
+    for replica in replica_set.replicas:
+        await replica.async_engine.dispose()
+
 @app.get("/")
 async def root():
     return {"message": "Добро пожаловать в API интернет-магазина одежды MØRK!"}
 
+@app.get("/api/metrics")
+async def read_metrics():
+    """Внутренние метрики процесса: кеши, пулы и т.п."""
+    # async def: метрики отдаются, даже когда пул потоков занят ожиданием соединений
+    return {
+        "catalog_cache": product_service.cache_stats(),
+        "db_pools": pool_stats(),
+        "db_replicas": replica_set.stats(),
+        "principal_cache": user_service.principal_cache_stats(),
+        "password_hashing": password_hashing.stats(),
+        "login_admission": login_admission.stats(),
+    }
+
+@app.get("/api/metrics/jobs")
+async def read_job_metrics(db: AsyncSession = Depends(get_async_read_db)):
+    """Состояние очереди фоновых задач (отдельно от /api/metrics: требует запроса к базе)"""
+    return await job_queue.stats(db)
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
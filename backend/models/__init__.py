@@ -1,3 +1,9 @@
 from models.product import Product
+from models.review import Review
 from models.user import User
-from models.order import Order, order_products
\ No newline at end of file
+from models.order import Order, order_products
+from models.revision import Revision
+from models.leaderboard import LeaderboardEntry
+from models.inventory import InventoryItem, Reservation
+from models.idempotency import IdempotencyKey
+from models.job import Job
\ No newline at end of file
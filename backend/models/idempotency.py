@@ -0,0 +1,20 @@
+from sqlalchemy import Column, DateTime, LargeBinary, String
+
+from config import Base
+
+class IdempotencyKey(Base):
+    """
+    Ключ идемпотентности запроса записи и сохраненный ответ на него.
+
+    Строка вставляется в транзакции самого запроса, поэтому ответ
+    фиксируется вместе с изменениями, которые он описывает.
+    """
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    # sha256 операции и параметров запроса: повтор ключа с другим запросом - ошибка клиента
+    fingerprint = Column(LargeBinary(32), nullable=False)
+    # Ответ в JSON; записывается перед COMMIT той же транзакции
+    response = Column(LargeBinary)
+    # Просроченные ключи удаляет фоновая задача
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,32 @@
+from sqlalchemy import CheckConstraint, Column, DateTime, ForeignKey, Integer, String
+
+from config import Base
+
+class InventoryItem(Base):
+    """
+    Остаток товара в размере (SKU), доступный для заказа.
+
+    Учет ведется только для SKU, у которых есть строка: остальные товары
+    продаются без ограничения остатка.
+    """
+    __tablename__ = "inventory"
+    __table_args__ = (
+        # Последний рубеж против перепродажи: списание проверяется и в самом UPDATE
+        CheckConstraint("stock >= 0", name="ck_inventory_stock_nonnegative"),
+    )
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    size = Column(String, primary_key=True)
+    stock = Column(Integer, nullable=False, default=0)
+
+class Reservation(Base):
+    """Товар, списанный с остатка под неоплаченный заказ до expires_at"""
+    __tablename__ = "reservations"
+
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    product_id = Column(Integer, nullable=False)
+    size = Column(String, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    # Просроченные резервы выбирает фоновая очистка
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, DateTime, Index, Integer, JSON, String, Text, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from config import Base
+
+class Job(Base):
+    """
+    Фоновая задача очереди (см. services/job_queue.py).
+
+    Статусы: queued - ждет run_at, running - выполняется обработчиком,
+    done - выполнена, dead - исчерпала попытки и ждет разбора.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Выборка готовых задач: только ожидающие строки, по времени запуска
+        Index(
+            "ix_jobs_ready", "run_at",
+            postgresql_where=text("status = 'queued'"),
+            sqlite_where=text("status = 'queued'")
+        ),
+        Index("ix_jobs_status_finished_at", "status", "finished_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSONB().with_variant(JSON, "sqlite"), nullable=False)
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime, nullable=False)
+    # Какой обработчик взял задачу и когда: зависшие задачи возвращаются в очередь
+    locked_by = Column(String)
+    locked_at = Column(DateTime)
+    last_error = Column(Text)
+    created_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime)
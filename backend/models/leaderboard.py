@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index
+
+from config import Base
+
+class LeaderboardEntry(Base):
+    """Строка предрасчитанного рейтинга товаров (лучшие оценки, больше всего отзывов)"""
+    __tablename__ = "leaderboard_entries"
+    __table_args__ = (
+        # Рейтинг категории читается одним диапазоном индекса от лучших к худшим
+        Index("ix_leaderboard_entries_board_score", "board", "category", "score", "product_id"),
+    )
+
+    board = Column(String, primary_key=True)  # top_rated, most_reviewed
+    category = Column(String, primary_key=True)  # Пустая строка - весь каталог
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True, index=True)
+    score = Column(Float, nullable=False)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Table, Index, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSONB
 import datetime
@@ -17,15 +17,32 @@ order_products = Table(
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Ключ курсорной пагинации списка заказов
+        Index("ix_orders_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     total_price = Column(Float, nullable=False)
     status = Column(String, default="pending")  # pending, paid, shipped, delivered, cancelled
     shipping_address = Column(String, nullable=False)
-    payment_details = Column(JSONB, nullable=True)
+    payment_details = Column(JSONB().with_variant(JSON, "sqlite"), nullable=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    # Сводка для истории заказов: число товаров и картинка первого из них,
+    # записываются при создании заказа, чтобы история не читала позиции
+    item_count = Column(Integer, nullable=False, default=0, server_default="0")
+    thumbnail = Column(String, nullable=True)
     
     user = relationship("User", back_populates="orders")
-    products = relationship("Product", secondary=order_products)
\ No newline at end of file
+    products = relationship("Product", secondary=order_products)
+
+# История заказов покупателя: новые первыми, одним проходом по диапазону
+# индекса. Поля сводки включены в индекс (PostgreSQL 11+), поэтому
+# страница истории читается из индекса без обращения к строкам таблицы
+Index(
+    "ix_orders_user_history",
+    Order.user_id, Order.created_at.desc(), Order.id.desc(),
+    postgresql_include=["status", "total_price", "item_count", "thumbnail"]
+)
\ No newline at end of file
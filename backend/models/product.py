@@ -1,11 +1,19 @@
-from sqlalchemy import Column, Integer, String, Float, Text, ARRAY
+from sqlalchemy import Column, Integer, String, Float, Text, ARRAY, Index, JSON
 from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import JSONB
 
 from config import Base
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Ключ курсорной пагинации внутри категории
+        Index("ix_products_category_id", "category", "id"),
+        # Фильтр и сортировка по цене внутри категории и по всему каталогу
+        Index("ix_products_category_actual_price", "category", "actual_price", "id"),
+        Index("ix_products_actual_price_id", "actual_price", "id"),
+        # Фильтр по размерам (оператор &&)
+        Index("ix_products_sizes", "sizes", postgresql_using="gin"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True, nullable=False)
@@ -13,7 +21,28 @@ class Product(Base):
     actual_price = Column(Float, nullable=False)  # Числовое значение цены для фильтрации
     img = Column(String, nullable=False)
     category = Column(String, index=True, nullable=False)
-    sizes = Column(ARRAY(String), nullable=False)  # PostgreSQL поддерживает массивы
+    sizes = Column(ARRAY(String).with_variant(JSON, "sqlite"), nullable=False)  # PostgreSQL поддерживает массивы
     rating = Column(Float, nullable=False, default=0)
-    reviews = Column(JSONB, nullable=False, default=[])  # Используем JSONB для хранения отзывов
-    description = Column(Text, nullable=True)
\ No newline at end of file
+    description = Column(Text, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Версия строки, растет при каждом изменении
+
+    # Агрегаты отзывов, обновляются в одной транзакции с добавлением отзыва
+    # (см. rating_service.record_review), чтобы не пересчитывать их по таблице reviews
+    review_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")  # Отзывы с оценкой
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    stars_1 = Column(Integer, nullable=False, default=0, server_default="0")
+    stars_2 = Column(Integer, nullable=False, default=0, server_default="0")
+    stars_3 = Column(Integer, nullable=False, default=0, server_default="0")
+    stars_4 = Column(Integer, nullable=False, default=0, server_default="0")
+    stars_5 = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # Отзывы хранятся в отдельной таблице и никогда не загружаются неявно:
+    # страница отзывов читается запросом (см. product_service.get_reviews)
+    reviews = relationship(
+        "Review",
+        back_populates="product",
+        lazy="raise",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
\ No newline at end of file
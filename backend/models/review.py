@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, SmallInteger, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+import datetime
+
+from config import Base
+
+class Review(Base):
+    __tablename__ = "reviews"
+    __table_args__ = (
+        # Отзывы товара от новых к старым читаются одним диапазоном индекса
+        Index("ix_reviews_product_id_created_at", "product_id", "created_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    user = Column(String, nullable=False)
+    review = Column(Text, nullable=False)
+    rating = Column(SmallInteger, nullable=True)  # Оценка от 1 до 5, отзыв может быть без оценки
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+    product = relationship("Product", back_populates="reviews")
\ No newline at end of file
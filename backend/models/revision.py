@@ -0,0 +1,10 @@
+from sqlalchemy import BigInteger, Column, String
+
+from config import Base
+
+class Revision(Base):
+    """Счетчик ревизии набора данных, меняется в одной транзакции с данными"""
+    __tablename__ = "revisions"
+
+    name = Column(String, primary_key=True)  # Например, "catalog"
+    value = Column(BigInteger, nullable=False, default=0)
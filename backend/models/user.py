@@ -16,5 +16,6 @@ class User(Base):
     address = Column(String, nullable=True)
     city = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Версия строки, растет при каждом изменении
     
     orders = relationship("Order", back_populates="user")
\ No newline at end of file
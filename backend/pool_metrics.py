@@ -0,0 +1,133 @@
+"""
+Метрики пулов соединений с базой.
+
+Без них очередь к пулу не видна: при всплеске запросов обработчики ждут
+свободного соединения, а потом падают по таймауту пула. Для каждого
+пула считаются подключения, выдачи и возвраты соединений, таймауты и
+гистограмма времени ожидания соединения; текущая занятость пула
+(выдано, overflow) читается из самого пула при запросе метрик.
+
+Счетчики событий собираются обработчиками событий пула SQLAlchemy.
+Время ожидания событием не измерить (checkout приходит уже после
+получения соединения), поэтому Pool.connect() оборачивается в
+подклассе пула.
+"""
+import threading
+import time
+from typing import Dict, Tuple, Type
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import Pool, QueuePool
+
+# Верхние границы корзин гистограммы ожидания соединения, мс
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class PoolMetrics:
+    """Счетчики одного пула соединений"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        # Последняя корзина - ожидания дольше WAIT_BUCKETS_MS[-1]
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def _increment(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def observe_wait(self, wait_ms: float, timed_out: bool = False):
+        """Учет одного ожидания соединения"""
+        index = next((i for i, edge in enumerate(WAIT_BUCKETS_MS) if wait_ms <= edge), len(WAIT_BUCKETS_MS))
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+            self.wait_buckets[index] += 1
+            if timed_out:
+                self.timeouts += 1
+
+    def attach(self, target):
+        """Подписка на события пула движка (или самого пула)"""
+        event.listen(target, "connect", lambda *args: self._increment("connects"))
+        event.listen(target, "checkout", lambda *args: self._increment("checkouts"))
+        event.listen(target, "checkin", lambda *args: self._increment("checkins"))
+        event.listen(target, "invalidate", lambda *args: self._increment("invalidations"))
+
+    def snapshot(self, pool: Pool) -> dict:
+        """Счетчики и текущее состояние пула"""
+        state = {"status": pool.status()}
+        if isinstance(pool, QueuePool):
+            state.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                # Отрицательное значение - сколько соединений еще можно открыть до pool_size
+                "overflow": pool.overflow(),
+                "timeout": pool.timeout(),
+            })
+        with self._lock:
+            # Гистограмма накопительная, как в Prometheus: число ожиданий не дольше границы
+            cumulative, total = {}, 0
+            for edge, count in zip([*WAIT_BUCKETS_MS, "+Inf"], self.wait_buckets):
+                total += count
+                cumulative[str(edge)] = total
+            state.update({
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait": {
+                    "count": self.wait_count,
+                    "avg_ms": round(self.wait_total_ms / self.wait_count, 3) if self.wait_count else 0.0,
+                    "max_ms": round(self.wait_max_ms, 3),
+                    "buckets_ms": cumulative,
+                },
+            })
+        return state
+
+
+def timed_pool_class(base: Type[QueuePool], metrics: PoolMetrics) -> Type[QueuePool]:
+    """
+    Подкласс пула, который замеряет ожидание соединения в connect().
+
+    Метрики хранятся в атрибуте класса, поэтому переживают recreate()
+    пула (например, после dispose движка).
+    """
+    class TimedPool(base):
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                connection = super().connect()
+            except exc.TimeoutError:
+                metrics.observe_wait((time.perf_counter() - started) * 1000, timed_out=True)
+                raise
+            metrics.observe_wait((time.perf_counter() - started) * 1000)
+            return connection
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+# имя пула -> (движок, метрики)
+_pools: Dict[str, Tuple[object, PoolMetrics]] = {}
+
+
+def register(name: str, engine, metrics: PoolMetrics):
+    """Регистрация пула движка для выдачи в /api/metrics"""
+    metrics.attach(engine)
+    _pools[name] = (engine, metrics)
+
+
+def pool_stats() -> dict:
+    """Метрики всех зарегистрированных пулов"""
+    return {name: metrics.snapshot(engine.pool) for name, (engine, metrics) in _pools.items()}
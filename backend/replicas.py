@@ -0,0 +1,103 @@
+"""
+Маршрутизация чтения на реплики базы.
+
+Обработчики, которые только читают (список и поиск товаров, история
+заказов), получают сессию реплики по кругу. Реплика, к которой не удалось
+подключиться, на REPLICA_RETRY секунд исключается из круга, а запрос
+уходит на следующую реплику или на основную базу.
+
+Реплики отстают от основной базы, поэтому клиент, который только что
+записал данные, читает с основной базы: после COMMIT ответ ставит cookie
+с моментом, до которого клиент закреплен за основной базой, и пока
+cookie действует, запросы чтения клиента идут туда же, куда и запись.
+Cookie работает для любого процесса API и без общего хранилища.
+
+Сессия чтения помечает в Session.info, откуда она читает (READ_SOURCE):
+кеши каталога не выдают закрепленному клиенту общие записи и не
+сохраняют прочитанное с отстающей реплики.
+"""
+import threading
+import time
+from typing import List, Optional
+
+from fastapi import Request, Response
+
+PIN_COOKIE = "db_primary_until"
+# Ключ Session.info сессии чтения и его значения
+READ_SOURCE = "read_source"
+# Реплика: данные могут отставать от основной базы
+SOURCE_REPLICA = "replica"
+# Основная база для клиента, который недавно писал
+SOURCE_PINNED = "pinned"
+
+
+class Replica:
+    """Реплика: синхронный и асинхронный движки одного URL"""
+
+    def __init__(self, name: str, engine, async_engine):
+        self.name = name
+        self.engine = engine
+        self.async_engine = async_engine
+        # До этого момента (time.monotonic) реплика считается недоступной
+        self.down_until = 0.0
+        self.failures = 0
+        self.reads = 0
+
+
+class ReplicaSet:
+    """Круговой выбор доступных реплик"""
+
+    def __init__(self, replicas: List[Replica], retry_after: float):
+        self.replicas = replicas
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._next = 0
+
+    def candidates(self) -> List[Replica]:
+        """Доступные реплики в порядке попыток для очередного запроса"""
+        if not self.replicas:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.replicas)
+        ordered = self.replicas[start:] + self.replicas[:start]
+        return [replica for replica in ordered if replica.down_until <= now]
+
+    def mark_down(self, replica: Replica):
+        with self._lock:
+            replica.failures += 1
+            replica.down_until = time.monotonic() + self.retry_after
+
+    def mark_read(self, replica: Replica):
+        with self._lock:
+            replica.reads += 1
+
+    def stats(self) -> list:
+        now = time.monotonic()
+        return [
+            {
+                "name": replica.name,
+                "available": replica.down_until <= now,
+                "reads": replica.reads,
+                "failures": replica.failures,
+            }
+            for replica in self.replicas
+        ]
+
+
+def pinned_to_primary(request: Optional[Request]) -> bool:
+    """Клиент недавно писал и должен читать с основной базы"""
+    if request is None:
+        return False
+    try:
+        return float(request.cookies.get(PIN_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+
+def pin_to_primary(response: Response, seconds: int):
+    """Закрепление клиента за основной базой на seconds секунд"""
+    response.set_cookie(
+        PIN_COOKIE, f"{time.time() + seconds:.3f}", max_age=seconds, httponly=True, samesite="lax"
+    )
@@ -0,0 +1,49 @@
+"""
+Условные GET-запросы: ETag и ответ 304 Not Modified.
+
+ETag всегда строится из версии, прочитанной до загрузки данных (или из
+версии, сохраненной вместе с данными в кеше), поэтому тег никогда не
+оказывается новее отданных данных и 304 не закрепляет у клиента
+устаревший ответ. Last-Modified не используется: время изменения одной
+записи не учитывает связанные данные в ответе (товары в заказе), и 304 по
+If-Modified-Since закрепил бы у клиента устаревшие данные.
+"""
+from fastapi import Request, Response
+
+from config import CATALOG_HTTP_MAX_AGE
+
+# Каталог общий для всех: браузер и CDN могут переиспользовать ответ,
+# а после max-age перепроверяют его по ETag
+CATALOG_CACHE_CONTROL = f"public, max-age={CATALOG_HTTP_MAX_AGE}, stale-while-revalidate={CATALOG_HTTP_MAX_AGE * 2}"
+# Заказы персональные: только кеш браузера и перепроверка при каждом запросе
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Сильный ETag из частей версии"""
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Совпадает ли ETag с одним из значений If-None-Match"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Для If-None-Match используется слабое сравнение: префикс W/ игнорируется
+    candidates = {value.strip().removeprefix("W/") for value in header.split(",")}
+    return etag in candidates
+
+
+def set_cache_headers(response: Response, etag: str, cache_control: str):
+    """Заголовки валидатора и политики кеширования"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    """Ответ 304 без тела"""
+    response = Response(status_code=304)
+    set_cache_headers(response, etag, cache_control)
+    return response
@@ -1,48 +1,150 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from config import get_db
+from config import STREAMING_MIN_LIMIT, get_async_read_db, get_db, get_read_db
 import services.order_service as order_service
-from schemas.order import Order, OrderCreate, OrderUpdate
+from services.idempotency_service import IdempotencyKeyReusedError
+from services.inventory_service import OutOfStockError
+from schemas.order import Order, OrderCreate, OrderInDB, OrderSummary, OrderUpdate
+from schemas.user import User
+from services.pagination import InvalidCursorError
+from routers.http_cache import (
+    PRIVATE_CACHE_CONTROL, etag_matches, make_etag, not_modified, set_cache_headers
+)
+from routers.serialization import list_response, snapshot_stream, streaming_list_response
+from routers.users import get_optional_user
 
 router = APIRouter()
 
-@router.get("/", response_model=List[Order])
-def read_orders(
+# Сколько заказов можно запросить в /details за раз
+MAX_DETAILS_IDS = 100
+# Наибольшая страница истории заказов
+MAX_HISTORY_LIMIT = 100
+# Длина заголовка Idempotency-Key (колонка idempotency_keys.key)
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+@router.get("/", response_model=List[OrderInDB])
+async def read_orders(
     user_id: int = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    after: Optional[str] = None,
+    items: bool = False,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Получение списка заказов (страницы с limit от STREAMING_MIN_LIMIT отдаются потоком).
+
+    items=true - каждый заказ с позициями и товарами, как в /details.
+    """
+    # Здесь должна быть проверка прав доступа
+    page = dict(user_id=user_id, skip=skip, limit=limit, after=after)
+    try:
+        if limit >= STREAMING_MIN_LIMIT:
+            cursor, batches = await snapshot_stream(
+                lambda stream_db: order_service.orders_page_cursor_async(stream_db, **page),
+                lambda stream_db: order_service.iter_order_batches_async(stream_db, items=items, **page),
+                bind=db.bind
+            )
+            return streaming_list_response(batches, cursor)
+        orders = await order_service.get_order_rows_async(db, **page)
+        result = [order_service.row_item(order) for order in orders]
+        if items:
+            order_service.with_items(result, await order_service.get_items_async(db, [order.id for order in orders]))
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return list_response(result, order_service.orders_next_cursor(orders, limit))
+
+# Объявлены до /{order_id}, иначе "history" и "details" разбираются как id заказа
+@router.get("/history", response_model=List[OrderSummary])
+async def read_order_history(
+    user_id: int,
+    limit: int = Query(20, ge=1, le=MAX_HISTORY_LIMIT),
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """История заказов покупателя для профиля: новые первыми, курсор в X-Next-Cursor"""
+    # Здесь должно быть получение user_id из токена
+    try:
+        orders = await order_service.get_order_history_async(db, user_id=user_id, limit=limit, after=after)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return list_response(
+        [order_service.history_item(order) for order in orders],
+        order_service.orders_next_cursor(orders, limit)
+    )
+
+@router.get("/details")
+async def read_orders_with_items(
+    ids: Optional[List[int]] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    """Получение списка заказов"""
+    """Несколько заказов вместе с товарами одним запросом (для истории заказов)"""
     # Здесь должна быть проверка прав доступа
-    orders = order_service.get_orders(db, user_id=user_id, skip=skip, limit=limit)
-    return orders
+    if not ids:
+        raise HTTPException(status_code=400, detail="Не указаны заказы")
+    if len(ids) > MAX_DETAILS_IDS:
+        raise HTTPException(status_code=400, detail=f"Не больше {MAX_DETAILS_IDS} заказов за запрос")
+    return list_response(await order_service.get_orders_with_items_async(db, ids))
 
 @router.get("/{order_id}", response_model=Order)
-def read_order(order_id: int, db: Session = Depends(get_db)):
+async def read_order(order_id: int, db: AsyncSession = Depends(get_async_read_db)):
     """Получение заказа по ID"""
     # Здесь должна быть проверка прав доступа
-    db_order = order_service.get_order(db, order_id=order_id)
-    if db_order is None:
+    details = await order_service.get_order_with_items_async(db, order_id=order_id)
+    if details is None:
         raise HTTPException(status_code=404, detail="Заказ не найден")
-    return db_order
+    return order_service.order_response(details)
 
 @router.post("/", response_model=Order)
-def create_order(order: OrderCreate, user_id: int, db: Session = Depends(get_db)):
-    """Создание нового заказа"""
+def create_order(
+    order: OrderCreate,
+    user_id: int,
+    idempotency_key: Optional[str] = Header(None, max_length=MAX_IDEMPOTENCY_KEY_LENGTH),
+    db: Session = Depends(get_db)
+):
+    """Создание нового заказа (повтор с тем же Idempotency-Key возвращает тот же заказ)"""
     # Здесь должна быть получение user_id из токена
-    return order_service.create_order(db=db, order=order, user_id=user_id)
+    try:
+        return order_service.create_order(db=db, order=order, user_id=user_id, idempotency_key=idempotency_key)
+    except order_service.InvalidOrderError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OutOfStockError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except IdempotencyKeyReusedError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 @router.put("/{order_id}", response_model=Order)
-def update_order(order_id: int, order: OrderUpdate, db: Session = Depends(get_db)):
-    """Обновление заказа по ID"""
+def update_order(
+    order_id: int,
+    order: OrderUpdate,
+    idempotency_key: Optional[str] = Header(None, max_length=MAX_IDEMPOTENCY_KEY_LENGTH),
+    current_user: Optional[User] = Depends(get_optional_user),
+    db: Session = Depends(get_db)
+):
+    """Обновление заказа по ID (повтор с тем же Idempotency-Key не меняет заказ еще раз)"""
     # Здесь должна быть проверка прав доступа
-    db_order = order_service.update_order(db, order_id=order_id, order=order)
-    if db_order is None:
+    if idempotency_key and current_user is None:
+        # Ключи общие для всех клиентов: сохраненный ответ выдается только тому, кто его получил
+        raise HTTPException(
+            status_code=401,
+            detail="Запрос с Idempotency-Key требует авторизации",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    try:
+        details = order_service.update_order(
+            db, order_id=order_id, order=order, idempotency_key=idempotency_key,
+            user_id=current_user.id if current_user else None
+        )
+    except order_service.InvalidOrderError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except IdempotencyKeyReusedError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if details is None:
         raise HTTPException(status_code=404, detail="Заказ не найден")
-    return db_order
+    return details
 
 @router.delete("/{order_id}")
 def delete_order(order_id: int, db: Session = Depends(get_db)):
@@ -54,10 +156,27 @@ def delete_order(order_id: int, db: Session = Depends(get_db)):
     return {"message": "Заказ успешно удален"}
 
 @router.get("/{order_id}/details")
-def read_order_with_items(order_id: int, db: Session = Depends(get_db)):
+def read_order_with_items(
+    order_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db)
+):
     """Получение заказа вместе с товарами"""
     # Здесь должна быть проверка прав доступа
+    revision = order_service.get_order_revision(db, order_id=order_id)
+    if revision is None:
+        raise HTTPException(status_code=404, detail="Заказ не найден")
+
+    # Тег учитывает и заказ, и ревизию каталога, т.к. в ответе есть данные товаров
+    # (поэтому только ETag, без Last-Modified)
+    updated_at, catalog_revision = revision
+    etag = make_etag("o", order_id, int(updated_at.timestamp() * 1000000), "c", catalog_revision)
+    if etag_matches(request, etag):
+        return not_modified(etag, PRIVATE_CACHE_CONTROL)
+
     result = order_service.get_order_with_items(db, order_id=order_id)
     if result is None:
         raise HTTPException(status_code=404, detail="Заказ не найден")
+    set_cache_headers(response, etag, PRIVATE_CACHE_CONTROL)
     return result
\ No newline at end of file
@@ -1,50 +1,236 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
-from config import get_db
+from config import STREAMING_MIN_LIMIT, get_async_read_db, get_db, get_read_db
+import services.inventory_service as inventory_service
 import services.product_service as product_service
-from schemas.product import Product, ProductCreate, ProductUpdate, Review
+from schemas.product import (
+    BulkResult, LeaderboardProduct, Product, ProductBulkUpdate, ProductBulkUpsert, ProductCreate,
+    ProductFacets, ProductFields, ProductInDB, ProductInventory, ProductUpdate, Review, ReviewInDB
+)
+from services.facet_service import DEFAULT_SORT, SORT_OPTIONS
+from services.rating_service import LEADERBOARD_SIZE, LEADERBOARDS
+from services.pagination import NEXT_CURSOR_HEADER, InvalidCursorError
+from routers.http_cache import CATALOG_CACHE_CONTROL, etag_matches, make_etag, not_modified, set_cache_headers
+from routers.serialization import list_response, snapshot_stream, streaming_list_response
 
 router = APIRouter()
 
-@router.get("/", response_model=List[Product])
-def read_products(
+def _parse_fields(fields: Optional[str]):
+    try:
+        return product_service.parse_fields(fields)
+    except product_service.InvalidFieldsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _stream_headers(db: AsyncSession, filters: dict):
+    """Ревизия каталога и курсор следующей страницы для потокового ответа"""
+    revision = await product_service.get_catalog_revision_async(db)
+    return revision, await product_service.products_page_cursor_async(db, **filters)
+
+@router.get("/", response_model=List[ProductFields], response_model_exclude_unset=True)
+async def read_products(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
     category: Optional[str] = None,
-    db: Session = Depends(get_db)
+    after: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sizes: Optional[List[str]] = Query(None),
+    min_rating: Optional[float] = None,
+    sort: str = DEFAULT_SORT,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    """Получение списка всех товаров с возможностью фильтрации по категории"""
-    products = product_service.get_products(db, skip=skip, limit=limit, category=category)
-    return products
+    """
+    Получение списка товаров с фильтрами по категории, цене, размерам и оценке.
+
+    fields=summary или fields=name,price,... - только нужные поля: остальные
+    колонки не читаются из базы и не попадают в ответ. Страницы с limit от
+    STREAMING_MIN_LIMIT отдаются потоком.
+    """
+    if sort not in SORT_OPTIONS:
+        raise HTTPException(status_code=400, detail="Неизвестная сортировка")
+    selected = _parse_fields(fields)
+    # Ревизия каталога не менялась - отвечаем 304, не загружая товары
+    if request.headers.get("if-none-match"):
+        etag = make_etag("c", await product_service.get_catalog_revision_async(db))
+        if etag_matches(request, etag):
+            return not_modified(etag, CATALOG_CACHE_CONTROL)
+
+    filters = dict(
+        skip=skip,
+        limit=limit,
+        category=category,
+        after=after,
+        min_price=min_price,
+        max_price=max_price,
+        sizes=sizes,
+        min_rating=min_rating,
+        sort=sort
+    )
+    try:
+        if limit >= STREAMING_MIN_LIMIT:
+            # Большие страницы не кешируются и не собираются в памяти:
+            # строки кодируются по мере чтения из базы. Ревизия и курсор
+            # читаются в снимке потока, чтобы соответствовать отданным строкам
+            (revision, cursor), batches = await snapshot_stream(
+                lambda stream_db: _stream_headers(stream_db, filters),
+                lambda stream_db: product_service.iter_product_batches_async(stream_db, fields=selected, **filters),
+                bind=db.bind
+            )
+            response = streaming_list_response(batches, cursor)
+        else:
+            products, cursor, revision = await product_service.get_products_cached_async(
+                db, fields=selected, **filters
+            )
+            response = list_response(products, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_cache_headers(response, make_etag("c", revision), CATALOG_CACHE_CONTROL)
+    return response
+
+@router.get("/facets", response_model=ProductFacets)
+def read_facets(
+    request: Request,
+    response: Response,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sizes: Optional[List[str]] = Query(None),
+    min_rating: Optional[float] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Количество товаров по категориям, размерам, ценам и оценкам при текущих фильтрах"""
+    if request.headers.get("if-none-match"):
+        etag = make_etag("c", product_service.get_catalog_revision(db))
+        if etag_matches(request, etag):
+            return not_modified(etag, CATALOG_CACHE_CONTROL)
 
-@router.get("/search", response_model=List[Product])
+    facets, revision = product_service.get_facets_cached(
+        db,
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        sizes=sizes,
+        min_rating=min_rating
+    )
+    set_cache_headers(response, make_etag("c", revision), CATALOG_CACHE_CONTROL)
+    return facets
+
+@router.get("/search", response_model=List[ProductFields], response_model_exclude_unset=True)
 def search_products(
+    request: Request,
     query: str,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    after: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_read_db)
 ):
-    """Поиск товаров по названию"""
-    products = product_service.search_products(db, query=query, skip=skip, limit=limit)
+    """Поиск товаров с ранжированием по релевантности; fields - как в списке товаров"""
+    selected = _parse_fields(fields)
+    if request.headers.get("if-none-match"):
+        etag = make_etag("c", product_service.get_catalog_revision(db))
+        if etag_matches(request, etag):
+            return not_modified(etag, CATALOG_CACHE_CONTROL)
+
+    try:
+        products, cursor, revision = product_service.search_products_cached(
+            db,
+            query=query,
+            skip=skip,
+            limit=limit,
+            after=after,
+            category=category,
+            min_price=min_price,
+            max_price=max_price,
+            fields=selected
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response = list_response(products, cursor)
+    set_cache_headers(response, make_etag("c", revision), CATALOG_CACHE_CONTROL)
+    return response
+
+@router.get("/leaderboards/{board}", response_model=List[LeaderboardProduct])
+def read_leaderboard(
+    board: str,
+    request: Request,
+    response: Response,
+    category: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=LEADERBOARD_SIZE),
+    db: Session = Depends(get_read_db)
+):
+    """Предрасчитанный рейтинг товаров: top_rated или most_reviewed"""
+    if board not in LEADERBOARDS:
+        raise HTTPException(status_code=404, detail="Рейтинг не найден")
+    if request.headers.get("if-none-match"):
+        etag = make_etag("c", product_service.get_catalog_revision(db))
+        if etag_matches(request, etag):
+            return not_modified(etag, CATALOG_CACHE_CONTROL)
+
+    products, revision = product_service.get_leaderboard_cached(db, board, category=category, limit=limit)
+    set_cache_headers(response, make_etag("c", revision), CATALOG_CACHE_CONTROL)
     return products
 
 @router.get("/{product_id}", response_model=Product)
-def read_product(product_id: int, db: Session = Depends(get_db)):
+async def read_product(
+    product_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db)
+):
     """Получение товара по ID"""
-    db_product = product_service.get_product(db, product_id=product_id)
+    # Версия строки не менялась - отвечаем 304, не загружая товар
+    if request.headers.get("if-none-match"):
+        version = await product_service.get_product_version_async(db, product_id=product_id)
+        if version is not None:
+            etag = make_etag("p", product_id, version)
+            if etag_matches(request, etag):
+                return not_modified(etag, CATALOG_CACHE_CONTROL)
+
+    db_product = await product_service.get_product_cached_async(db, product_id=product_id)
     if db_product is None:
         raise HTTPException(status_code=404, detail="Товар не найден")
+    # ETag из версии закешированных данных, а не из только что прочитанной
+    set_cache_headers(response, make_etag("p", product_id, db_product.version), CATALOG_CACHE_CONTROL)
     return db_product
 
-@router.post("/", response_model=Product)
+@router.post("/", response_model=ProductInDB)
 def create_product(product: ProductCreate, db: Session = Depends(get_db)):
     """Создание нового товара"""
     # Здесь можно добавить проверку прав доступа (только для админа)
     return product_service.create_product(db=db, product=product)
 
-@router.put("/{product_id}", response_model=Product)
+@router.post("/bulk", response_model=BulkResult)
+def bulk_upsert_products(payload: ProductBulkUpsert, db: Session = Depends(get_db)):
+    """Массовая загрузка товаров (вставка или обновление по id) одним пакетом"""
+    # Здесь можно добавить проверку прав доступа (только для админа)
+    if len(payload.items) > product_service.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"За один запрос можно загрузить не больше {product_service.BULK_MAX_ITEMS} товаров"
+        )
+    return product_service.bulk_upsert_products(db, payload.items)
+
+@router.patch("/bulk", response_model=BulkResult)
+def bulk_update_products(payload: ProductBulkUpdate, db: Session = Depends(get_db)):
+    """Изменение цены и атрибутов всех товаров, подходящих под фильтр, одним UPDATE"""
+    # Здесь можно добавить проверку прав доступа (только для админа)
+    if not payload.changes.model_dump(exclude_none=True):
+        raise HTTPException(status_code=400, detail="Не указаны изменения")
+    try:
+        return product_service.bulk_update_products(db, payload.filter, payload.changes)
+    except product_service.EmptyBulkFilterError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.put("/{product_id}", response_model=ProductInDB)
 def update_product(product_id: int, product: ProductUpdate, db: Session = Depends(get_db)):
     """Обновление товара по ID"""
     # Здесь можно добавить проверку прав доступа (только для админа)
@@ -62,10 +248,47 @@ def delete_product(product_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Товар не найден")
     return {"message": "Товар успешно удален"}
 
-@router.post("/{product_id}/reviews", response_model=Product)
+@router.get("/{product_id}/reviews", response_model=List[ReviewInDB])
+def read_reviews(
+    product_id: int,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    after: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Страница отзывов товара от новых к старым"""
+    try:
+        reviews = product_service.get_reviews(db, product_id=product_id, limit=limit, after=after)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not reviews and product_service.get_product_version(db, product_id=product_id) is None:
+        raise HTTPException(status_code=404, detail="Товар не найден")
+    cursor = product_service.reviews_next_cursor(reviews, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return reviews
+
+@router.post("/{product_id}/reviews", response_model=ReviewInDB)
 def add_review(product_id: int, review: Review, db: Session = Depends(get_db)):
     """Добавление отзыва к товару"""
-    db_product = product_service.add_review(db, product_id=product_id, user=review.user, review_text=review.review)
-    if db_product is None:
+    db_review = product_service.add_review(
+        db, product_id=product_id, user=review.user, review_text=review.review, rating=review.rating
+    )
+    if db_review is None:
+        raise HTTPException(status_code=404, detail="Товар не найден")
+    return db_review
+
+@router.get("/{product_id}/inventory", response_model=ProductInventory)
+def read_inventory(product_id: int, db: Session = Depends(get_db)):
+    """Остатки товара по размерам (размеры без учета остатка не перечисляются)"""
+    # Читается с основной базы: остаток меняется каждым заказом
+    if product_service.get_product_version(db, product_id=product_id) is None:
+        raise HTTPException(status_code=404, detail="Товар не найден")
+    return {"stock": inventory_service.get_stock(db, product_id)}
+
+@router.put("/{product_id}/inventory", response_model=ProductInventory)
+def update_inventory(product_id: int, inventory: ProductInventory, db: Session = Depends(get_db)):
+    """Установка остатков товара по размерам"""
+    if product_service.get_product_version(db, product_id=product_id) is None:
         raise HTTPException(status_code=404, detail="Товар не найден")
-    return db_product
\ No newline at end of file
+    return {"stock": inventory_service.set_stock(db, product_id, inventory.stock)}
\ No newline at end of file
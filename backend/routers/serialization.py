@@ -0,0 +1,109 @@
+"""
+Быстрая выдача списков: orjson и потоковый JSON-массив.
+
+По умолчанию FastAPI проверяет каждый элемент списка схемой ответа и
+кодирует результат через jsonable_encoder и json. На странице из сотен
+строк это основная работа процессора на запрос. Сервисы отдают элементы
+списков готовыми словарями из строк базы, а здесь они кодируются orjson
+сразу в байты ответа.
+
+Большие страницы не собираются в памяти: строки читаются из серверного
+курсора пачками, каждая пачка кодируется и сразу уходит клиенту.
+"""
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+import orjson
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from config import AsyncSessionLocal
+from services.dialects import dialect_name
+from services.pagination import NEXT_CURSOR_HEADER
+
+T = TypeVar("T")
+
+
+def list_response(items: List[dict], cursor: Optional[str] = None) -> ORJSONResponse:
+    """JSON-список без повторной валидации элементов"""
+    response = ORJSONResponse(items)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return response
+
+
+class SessionBatches:
+    """
+    Пачки строк потока вместе с сессией, из которой они читаются.
+
+    aclose закрывает итерацию и сессию; повторный вызов ничего не делает.
+    """
+
+    def __init__(self, db: AsyncSession, iterate: Callable[[AsyncSession], AsyncIterator[list]]):
+        self._db = db
+        self._batches = iterate(db)
+
+    def __aiter__(self) -> AsyncIterator[list]:
+        return self._batches.__aiter__()
+
+    async def aclose(self):
+        try:
+            await self._batches.aclose()
+        finally:
+            await self._db.close()
+
+
+async def _json_array(batches: SessionBatches) -> AsyncIterator[bytes]:
+    # Обрыв потока (отключение клиента, ошибка) закрывает сессию сразу, не дожидаясь сборщика мусора
+    async with aclosing(batches):
+        yield b"["
+        separator = b""
+        async for batch in batches:
+            if batch:
+                # Пачка кодируется одним вызовом orjson, скобки массива отрезаются
+                yield separator + orjson.dumps(batch)[1:-1]
+                separator = b","
+        yield b"]"
+
+
+async def snapshot_stream(
+    prepare: Callable[[AsyncSession], Awaitable[T]],
+    iterate: Callable[[AsyncSession], AsyncIterator[list]],
+    bind: Optional[AsyncEngine] = None
+) -> Tuple[T, SessionBatches]:
+    """
+    Отдельная сессия потока с одним снимком базы для заголовков и строк.
+
+    prepare выполняется сразу (курсор следующей страницы, ревизия для ETag),
+    iterate - по мере отправки ответа; оба читают в одной транзакции, поэтому
+    X-Next-Cursor соответствует отданным строкам, даже если между ними прошла
+    запись. Сессию закрывает streaming_list_response. bind - движок сессии
+    обработчика, чтобы поток читал ту же базу (реплику).
+    """
+    db = AsyncSessionLocal(bind=bind) if bind else AsyncSessionLocal()
+    try:
+        if dialect_name(db) == "postgresql":
+            # В READ COMMITTED каждый запрос видит свой снимок
+            await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        prepared = await prepare(db)
+    except BaseException:
+        await db.close()
+        raise
+    return prepared, SessionBatches(db, iterate)
+
+
+def streaming_list_response(batches: SessionBatches, cursor: Optional[str] = None) -> StreamingResponse:
+    """
+    JSON-массив, который кодируется по мере получения пачек строк.
+
+    Поток читается уже после выхода из обработчика запроса, поэтому
+    batches владеет своей сессией (см. snapshot_stream). Сессия
+    закрывается по завершении или обрыву потока, а фоновая задача ответа
+    закрывает ее, даже если поток не успел начаться (клиент отключился).
+    """
+    headers = {NEXT_CURSOR_HEADER: cursor} if cursor else None
+    return StreamingResponse(
+        _json_array(batches), media_type="application/json", headers=headers,
+        background=BackgroundTask(batches.aclose)
+    )
@@ -1,16 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import math
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import timedelta
-from typing import List
+from typing import List, Optional
 from jose import JWTError, jwt
 
-from config import get_db
+from config import get_async_db, get_db
+import services.login_admission as login_admission
 import services.user_service as user_service
 from schemas.user import User, UserCreate, UserUpdate, Token, TokenData
+from services.pagination import NEXT_CURSOR_HEADER, InvalidCursorError
 
 # Настройка OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/users/token")
+# Для обработчиков, где токен не обязателен
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/users/token", auto_error=False)
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 # Настройки безопасности - должны совпадать с user_service.py
@@ -20,7 +26,7 @@ ALGORITHM = "HS256"
 router = APIRouter()
 
 # Добавляем функцию получения текущего пользователя по токену
-async def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+async def get_current_user(db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)):
     """
     Функция для получения текущего пользователя из токена
     """
@@ -37,59 +43,93 @@ async def get_current_user(db: Session = Depends(get_db), token: str = Depends(o
         if username is None:
             raise credentials_exception
         
-        token_data = TokenData(username=username)
-    except JWTError:
+        token_data = TokenData(username=username, user_id=payload.get("uid"))
+    except (JWTError, ValueError):
         raise credentials_exception
     
-    # Получаем пользователя из базы данных
-    user = user_service.get_user_by_username(db, username=token_data.username)
-    if user is None:
+    if token_data.user_id is None:
+        # Токен выдан до появления uid: пользователь ищется по имени
+        user = await user_service.get_user_by_username_async(db, username=token_data.username)
+    else:
+        # Обычный путь: пользователь из кеша процесса, без запроса к базе
+        user = await user_service.get_principal_async(db, token_data.user_id)
+    # После смены имени пользователя старые токены недействительны
+    if user is None or user.username != token_data.username:
         raise credentials_exception
     
     return user
 
+async def get_optional_user(
+    db: AsyncSession = Depends(get_async_db),
+    token: Optional[str] = Depends(optional_oauth2_scheme)
+):
+    """Пользователь из токена или None без токена (неверный токен - 401)"""
+    if token is None:
+        return None
+    return await get_current_user(db=db, token=token)
+
 @router.post("/token", response_model=Token)
 async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Аутентификация и получение токена доступа"""
-    user = user_service.authenticate_user(db, form_data.username, form_data.password)
+    # Лишние попытки отсекаются до проверки пароля (bcrypt)
+    ip = request.client.host if request.client else None
+    retry_after = login_admission.admit(ip, form_data.username)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Слишком много попыток входа, попробуйте позже",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    try:
+        user = await user_service.authenticate_user_async(db, form_data.username, form_data.password)
+    except Exception:
+        # Пароль не проверен (например, очередь bcrypt заполнена): попытка не засчитывается
+        login_admission.release(ip, form_data.username)
+        raise
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверное имя пользователя или пароль",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    # Успешный вход не расходует предел неудачных попыток
+    login_admission.release(ip, form_data.username)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = user_service.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "uid": user.id}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/", response_model=User)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Регистрация нового пользователя"""
-    db_user = user_service.get_user_by_email(db, email=user.email)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email уже зарегистрирован")
-    
-    db_user = user_service.get_user_by_username(db, username=user.username)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Имя пользователя уже занято")
-    
-    return user_service.create_user(db=db, user=user)
+    try:
+        return await user_service.create_user_async(db=db, user=user)
+    except user_service.UserConflictError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/", response_model=List[User])
 def read_users(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
+    after: Optional[str] = None,
     db: Session = Depends(get_db), 
     current_user: User = Depends(get_current_user)
 ):
     """Получение списка всех пользователей (только для админа)"""
     # Здесь должна быть проверка прав доступа
-    users = user_service.get_users(db, skip=skip, limit=limit)
+    try:
+        users = user_service.get_users(db, skip=skip, limit=limit, after=after)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    cursor = user_service.users_next_cursor(users, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
     return users
 
 @router.get("/me", response_model=User)
@@ -1,3 +1,3 @@
-from schemas.product import Product, ProductCreate, ProductUpdate, ProductInDB, Review
-from schemas.user import User, UserCreate, UserUpdate, UserInDB, Token, TokenData
-from schemas.order import Order, OrderCreate, OrderUpdate, OrderInDB, OrderItem
\ No newline at end of file
+from schemas.product import Product, ProductCreate, ProductUpdate, ProductInDB, Review, ReviewInDB, LeaderboardProduct, ProductFacets, ProductFields, ProductUpsert, ProductImport, ProductBulkUpsert, ProductBulkUpdate, BulkResult, ProductInventory
+from schemas.user import User, UserCreate, UserImport, UserUpdate, UserInDB, Token, TokenData
+from schemas.order import Order, OrderCreate, OrderUpdate, OrderInDB, OrderItem, OrderSummary
\ No newline at end of file
@@ -1,10 +1,10 @@
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 class OrderItemBase(BaseModel):
     product_id: int
-    quantity: int = 1
+    quantity: int = Field(1, ge=1)
     selected_size: str
 
 class OrderItem(OrderItemBase):
@@ -34,4 +34,18 @@ class OrderInDB(OrderBase):
         orm_mode = True
 
 class Order(OrderInDB):
-    items: List[Dict[str, Any]]
\ No newline at end of file
+    items: List[Dict[str, Any]]
+    # До какого времени товар заказа зарезервирован (в ответе на создание заказа)
+    reserved_until: Optional[datetime] = None
+
+class OrderSummary(BaseModel):
+    """Строка истории заказов: без позиций, сводка хранится в самом заказе"""
+    id: int
+    status: str
+    total_price: float
+    created_at: datetime
+    item_count: int
+    thumbnail: Optional[str] = None
+
+    class Config:
+        orm_mode = True
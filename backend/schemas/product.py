@@ -1,13 +1,23 @@
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel
+from typing import Annotated, List, Optional, Dict, Any
+from datetime import datetime
+from pydantic import BaseModel, Field
 
 class ReviewBase(BaseModel):
     user: str
     review: str
+    rating: Optional[int] = Field(None, ge=1, le=5)
 
 class Review(ReviewBase):
     pass
 
+class ReviewInDB(ReviewBase):
+    id: int
+    product_id: int
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
 class ProductBase(BaseModel):
     name: str
     price: str
@@ -28,17 +38,110 @@ class ProductUpdate(BaseModel):
     img: Optional[str] = None
     category: Optional[str] = None
     sizes: Optional[List[str]] = None
-    rating: Optional[float] = None
-    reviews: Optional[List[Review]] = None
     description: Optional[str] = None
+    # rating не меняется напрямую: это средняя по оценкам отзывов (rating_service)
+
+class ProductUpsert(ProductBase):
+    """Строка массовой загрузки: с id - обновление или вставка с этим id, без id - новый товар"""
+    id: Optional[int] = None
+    rating: Optional[float] = None  # Используется только при вставке
+
+class ProductImport(ProductCreate):
+    """Запись импорта каталога: новый товар, с id - обновление или вставка с этим id"""
+    id: Optional[int] = None
+
+class ProductBulkUpsert(BaseModel):
+    # Строки проверяются по одной, чтобы ошибка в одной не отклоняла весь пакет
+    items: List[Dict[str, Any]]
+
+class ProductFilter(BaseModel):
+    """Отбор товаров для массового изменения"""
+    ids: Optional[List[int]] = None
+    category: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    sizes: Optional[List[str]] = None
+    min_rating: Optional[float] = None
+
+class ProductBulkChanges(BaseModel):
+    """Изменения, применяемые ко всем отобранным товарам"""
+    price_multiplier: Optional[float] = Field(None, gt=0)  # 0.8 - скидка 20%
+    category: Optional[str] = None
+    sizes: Optional[List[str]] = None
+    description: Optional[str] = None
+
+class ProductBulkUpdate(BaseModel):
+    filter: ProductFilter
+    changes: ProductBulkChanges
+
+class BulkRowError(BaseModel):
+    index: int  # Номер строки в запросе
+    errors: List[Dict[str, Any]]
+
+class BulkResult(BaseModel):
+    """Итог массовой операции"""
+    affected: int
+    inserted: int = 0
+    updated: int = 0
+    errors: List[BulkRowError] = []
+    elapsed_ms: float
 
 class ProductInDB(ProductBase):
+    """Товар без отзывов - для списков и ответов на запись"""
     id: int
     rating: float
-    reviews: List[Dict[str, Any]]
+    review_count: int = 0
+    rating_count: int = 0
+    version: int = 1
 
     class Config:
         orm_mode = True
 
+class ProductFields(BaseModel):
+    """Товар в списке с выборкой полей (?fields=...): заполнены только запрошенные поля"""
+    id: int
+    name: Optional[str] = None
+    price: Optional[str] = None
+    actual_price: Optional[float] = None
+    img: Optional[str] = None
+    category: Optional[str] = None
+    sizes: Optional[List[str]] = None
+    description: Optional[str] = None
+    rating: Optional[float] = None
+    review_count: Optional[int] = None
+    rating_count: Optional[int] = None
+    version: Optional[int] = None
+
 class Product(ProductInDB):
-    pass
\ No newline at end of file
+    """Карточка товара с последними отзывами; остальные - через /reviews"""
+    rating_distribution: Dict[int, int] = {}
+    reviews: List[ReviewInDB] = []
+
+class LeaderboardProduct(ProductInDB):
+    """Товар в рейтинге со значением, по которому он отсортирован"""
+    score: float
+
+class FacetValue(BaseModel):
+    value: str
+    count: int
+
+class PriceRangeFacet(BaseModel):
+    min: float
+    max: Optional[float] = None  # None - диапазон открыт сверху
+    count: int
+
+class RatingFacet(BaseModel):
+    min_rating: int
+    count: int
+
+class ProductFacets(BaseModel):
+    """Счетчики для боковой панели фильтров каталога"""
+    total: int
+    categories: List[FacetValue]
+    sizes: List[FacetValue]
+    price_ranges: List[PriceRangeFacet]
+    ratings: List[RatingFacet]
+
+class ProductInventory(BaseModel):
+    """Остатки товара по размерам; null снимает размер с учета остатка"""
+    stock: Dict[str, Optional[Annotated[int, Field(ge=0)]]]
\ No newline at end of file
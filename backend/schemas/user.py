@@ -13,6 +13,16 @@ class UserCreate(UserBase):
     address: Optional[str] = None
     city: Optional[str] = None
 
+class UserImport(UserBase):
+    """Покупатель из выгрузки старого магазина: пароль или готовый bcrypt-хеш"""
+    password: Optional[str] = None
+    hashed_password: Optional[str] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    phone_number: Optional[str] = None
+    address: Optional[str] = None
+    city: Optional[str] = None
+
 class UserUpdate(BaseModel):
     username: Optional[str] = None
     email: Optional[EmailStr] = None
@@ -43,4 +53,5 @@ class Token(BaseModel):
     token_type: str
 
 class TokenData(BaseModel):
-    username: Optional[str] = None
\ No newline at end of file
+    username: Optional[str] = None
+    user_id: Optional[int] = None
\ No newline at end of file
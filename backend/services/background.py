@@ -0,0 +1,48 @@
+"""
+Периодические фоновые задачи процесса API.
+
+Задача - синхронная функция, которая работает со своей сессией базы и
+возвращает число обработанных записей. Она выполняется в пуле потоков,
+чтобы не блокировать цикл событий, раз в interval секунд; ошибка одного
+запуска не останавливает задачу.
+"""
+import asyncio
+from typing import Callable, Optional
+
+
+class PeriodicTask:
+    """Повторяющийся запуск функции в фоне (start при старте приложения, stop при остановке)"""
+
+    def __init__(self, name: str, func: Callable[[], int], interval: float):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run_forever(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                processed = await loop.run_in_executor(None, self.func)
+                if processed:
+                    print(f"{self.name}: обработано записей: {processed}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"{self.name}: ошибка: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run_forever())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
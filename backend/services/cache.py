@@ -0,0 +1,144 @@
+"""
+Кеш в памяти процесса для редко меняющихся данных.
+
+Каждая запись хранит версию данных, при которой была прочитана. Запись
+выдается только если версия совпадает с текущей, поэтому после записи в
+базу (bump версии) устаревшие данные никогда не отдаются, даже до
+истечения TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional, Tuple
+
+
+class VersionCounter:
+    """Монотонный счетчик версии набора данных"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = 0
+
+    @property
+    def current(self) -> int:
+        return self._value
+
+    def bump(self) -> int:
+        """Увеличение версии после записи"""
+        with self._lock:
+            self._value += 1
+            return self._value
+
+    def advance_to(self, value: int) -> int:
+        """Перевод версии вперед до известного значения (назад не откатывается)"""
+        with self._lock:
+            if value > self._value:
+                self._value = value
+            return self._value
+
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Ограниченный по размеру LRU-кеш с TTL и счетчиками для мониторинга"""
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 300.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # ключ -> (версия, время истечения, значение)
+        self._entries: "OrderedDict[Hashable, Tuple[int, float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, version: int) -> Any:
+        """Значение по ключу или _MISSING, если записи нет или она устарела"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+
+            entry_version, expires_at, value = entry
+            if entry_version != version:
+                del self._entries[key]
+                self.stale += 1
+                self.misses += 1
+                return _MISSING
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return _MISSING
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, version: int):
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(
+        self, key: Hashable, version: int, loader: Callable[[], Any], keep: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """
+        Значение из кеша или результат loader(), сохраненный с версией version.
+
+        keep(значение) решает, сохранять ли загруженное значение (по умолчанию - всегда).
+        """
+        value = self.get(key, version)
+        if value is _MISSING:
+            value = loader()
+            if keep is None or keep(value):
+                self.set(key, value, version)
+        return value
+
+    async def get_or_load_async(
+        self, key: Hashable, version: int, loader: Callable[[], Awaitable[Any]],
+        keep: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """Асинхронный вариант get_or_load: loader() возвращает корутину"""
+        value = self.get(key, version)
+        if value is _MISSING:
+            value = await loader()
+            if keep is None or keep(value):
+                self.set(key, value, version)
+        return value
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if self._entries.pop(key, _MISSING) is not _MISSING:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Счетчики кеша для подбора размера и TTL"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "stale": self.stale,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,738 @@
+"""
+Потоковый импорт каталога товаров из CSV, JSONL или массива товаров в JSX.
+
+Конвейер из трех стадий, память не зависит от размера источника:
+  - чтение: записи источника читаются без разбора и собираются в пачки
+    по parse_batch записей;
+  - разбор: пачки разбираются и проверяются схемой ProductImport
+    (ProductCreate с id) в пуле из workers процессов, результаты
+    собираются в порядке источника; отклоненные записи с причиной
+    пишутся в файл отклоненных (JSONL);
+  - загрузка: проверенные строки копятся в пачки по chunk_size и через
+    очередь на WRITER_QUEUE_CHUNKS пачек уходят в поток записи, поэтому
+    разбор и загрузка идут одновременно. Каждая пачка загружается своей
+    транзакцией. В PostgreSQL пачка идет через COPY во временную таблицу
+    и сливается с products одним INSERT ... ON CONFLICT (id) DO UPDATE.
+    В SQLite (разработка) работает тот же upsert через SQLAlchemy.
+
+Правила слияния:
+  - товар с id обновляется (колонки UPSERT_COLUMNS) или вставляется с
+    этим id, товар без id добавляется как новый. Перед выдачей id товарам
+    без id последовательность сдвигается за id в products и в пачке, чтобы
+    новый товар не получил id существующего или явного id пачки;
+  - при повторе id в пачке побеждает последняя запись;
+  - отзывы из источника добавляются только новым товарам, поэтому
+    повторная загрузка пачки их не дублирует.
+
+После каждой пачки номер последней загруженной записи пишется в файл
+контрольной точки. Прерванный импорт продолжается с нее (resume). Пачка,
+загруженная перед сбоем, но не отмеченная, загрузится еще раз без
+изменений: слияние идемпотентно.
+"""
+import ast
+import csv
+import io
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select, text, update
+from sqlalchemy.orm import Session
+
+from models.product import Product
+from models.review import Review
+from schemas.product import ProductImport
+from services.dialects import dialect_insert, dialect_name
+import services.events as events
+import services.product_service as product_service
+import services.rating_service as rating_service
+
+FORMATS = ("csv", "jsonl", "jsx")
+# Записей в одной пачке (одна транзакция и одна отметка контрольной точки)
+DEFAULT_CHUNK_SIZE = 10000
+# Записей в одной пачке разбора (одна задача пула процессов)
+DEFAULT_PARSE_BATCH = 1000
+# Сколько пачек разбора на процесс может быть в работе одновременно
+PARSE_AHEAD = 2
+# Сколько символов файла JSX читается за раз
+JSX_READ_SIZE = 1 << 16
+# Сколько пачек загрузки может ждать поток записи
+WRITER_QUEUE_CHUNKS = 2
+# Временная таблица пачки в PostgreSQL
+STAGING_TABLE = "products_import"
+# Колонки строки пачки; seq - номер записи в источнике
+ROW_COLUMNS = (
+    "seq", "id", "name", "price", "actual_price", "img", "category", "sizes", "rating", "description", "reviews"
+)
+PRODUCT_COLUMNS = ROW_COLUMNS[1:-1]
+
+
+class CatalogImportError(RuntimeError):
+    """Импорт нельзя начать или продолжить"""
+
+
+class ImportStats:
+    """Счетчики импорта"""
+
+    def __init__(self, skipped: int = 0):
+        self.started = time.monotonic()
+        # Записи, загруженные прошлым запуском (до контрольной точки)
+        self.skipped = skipped
+        self.read = 0
+        self.rejected = 0
+        self.inserted = 0
+        self.updated = 0
+        self.duplicates = 0
+        self.reviews = 0
+        self.position = skipped
+
+    def snapshot(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        return {
+            "position": self.position,
+            "read": self.read,
+            "rejected": self.rejected,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "duplicates": self.duplicates,
+            "reviews": self.reviews,
+            "seconds": round(elapsed, 2),
+            "records_per_second": round(self.read / elapsed, 1) if elapsed else 0.0,
+        }
+
+    def report(self) -> str:
+        snapshot = self.snapshot()
+        return (
+            f"запись {snapshot['position']}: добавлено {snapshot['inserted']}, обновлено {snapshot['updated']}, "
+            f"отклонено {snapshot['rejected']}, повторов id {snapshot['duplicates']}, отзывов {snapshot['reviews']}, "
+            f"{snapshot['records_per_second']:.0f} записей/с"
+        )
+
+
+def detect_format(path: str) -> str:
+    """Формат источника по расширению файла"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if extension in (".jsx", ".js"):
+        return "jsx"
+    raise CatalogImportError(f"Не удалось определить формат файла {path}: укажите его явно")
+
+
+# Товар в массиве const products = [...] компонента фронтенда
+_JSX_PRODUCT = re.compile(
+    r'\{\s*"id":\s*(\d+),\s*"name":\s*"([^"]+)",\s*"price":\s*"([^"]+)",\s*"img":\s*"([^"]+)",'
+    r'\s*"category":\s*"([^"]+)"(?:,\s*"sizes":\s*(\[[^\]]+\]))?(?:,\s*"rating":\s*([^,]+))?'
+    r'(?:,\s*"reviews":\s*(\[[^\]]+\]))?'
+)
+_JSX_REVIEW = re.compile(r'\{\s*"user":\s*"([^"]+)",\s*"review":\s*"([^"]+)"\s*\}')
+
+
+_JSX_ARRAY = "const products = ["
+
+
+def _jsx_records(path: str) -> Iterator[str]:
+    """
+    Текст объектов товаров из массива const products = [...] в файле компонента.
+
+    Файл читается блоками по JSX_READ_SIZE, а массив проходится посимвольно
+    с учетом вложенных скобок и строк: в памяти только текущий товар.
+    Незавершенный в конце файла товар отдается как есть и отклоняется при разборе.
+    """
+    with open(path, encoding="utf-8") as file:
+        tail = ""
+        while True:
+            block = file.read(JSX_READ_SIZE)
+            if not block:
+                raise CatalogImportError(f"В файле {path} нет массива {_JSX_ARRAY}...]")
+            tail += block
+            found = tail.find(_JSX_ARRAY)
+            if found != -1:
+                block = tail[found + len(_JSX_ARRAY):]
+                break
+            # Начало массива может прийтись на границу блоков
+            tail = tail[-len(_JSX_ARRAY):]
+
+        record: List[str] = []
+        depth, quote, escaped = 0, None, False
+        while block:
+            start = 0 if depth else None
+            for index, char in enumerate(block):
+                if quote:
+                    if escaped:
+                        escaped = False
+                    elif char == "\\":
+                        escaped = True
+                    elif char == quote:
+                        quote = None
+                elif char in "\"'`":
+                    quote = char
+                elif char in "{[":
+                    if depth == 0:
+                        start = index
+                    depth += 1
+                elif char in "}]":
+                    if depth == 0:
+                        # Конец массива товаров
+                        return
+                    depth -= 1
+                    if depth == 0:
+                        record.append(block[start:index + 1])
+                        yield "".join(record)
+                        record, start = [], None
+            if start is not None:
+                record.append(block[start:])
+            block = file.read(JSX_READ_SIZE)
+        if record:
+            yield "".join(record)
+
+
+def read_records(path: str, file_format: str) -> Iterator[Any]:
+    """
+    Записи источника без разбора: строка JSONL, словарь ячеек CSV или
+    текст товара JSX. Разбор - parse_record (в пуле процессов), чтобы
+    пропуск записей до контрольной точки ничего не стоил.
+    """
+    if file_format == "jsx":
+        yield from _jsx_records(path)
+        return
+    with open(path, newline="", encoding="utf-8") as file:
+        if file_format == "csv":
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield line
+
+
+def _csv_list(value: Optional[str]) -> list:
+    """Список из ячейки CSV: JSON-массив или значения через | или запятую"""
+    if not value:
+        return []
+    if value.lstrip().startswith("["):
+        return json.loads(value)
+    return [item.strip() for item in re.split(r"[|,]", value) if item.strip()]
+
+
+def _parse_jsx(record: str) -> dict:
+    """Поля товара из текста объекта JSX; ValueError - объект не разбирается"""
+    # Одинарные кавычки заменяются двойными, как в исходном парсере
+    match = _JSX_PRODUCT.match(record.replace("'", '"'))
+    if match is None:
+        raise ValueError("объект товара JSX не соответствует формату")
+    item = {
+        "id": int(match.group(1)),
+        "name": match.group(2),
+        "price": match.group(3),
+        "img": match.group(4),
+        "category": match.group(5),
+        "sizes": [],
+        "reviews": [],
+    }
+    if match.group(6):
+        try:
+            item["sizes"] = ast.literal_eval(match.group(6))
+        except (ValueError, SyntaxError) as e:
+            raise ValueError(f"sizes: {match.group(6)} не разбирается") from e
+    if match.group(7):
+        item["rating"] = match.group(7).strip()
+    if match.group(8):
+        item["reviews"] = [
+            {"user": review.group(1), "review": review.group(2)} for review in _JSX_REVIEW.finditer(match.group(8))
+        ]
+    return item
+
+
+def parse_record(file_format: str, record: Any) -> dict:
+    """Словарь полей товара из записи источника; ValueError - запись не разбирается"""
+    if file_format == "jsonl":
+        item = json.loads(record)
+        if not isinstance(item, dict):
+            raise ValueError("строка JSONL должна быть объектом")
+    elif file_format == "csv":
+        # Пустые ячейки CSV - отсутствующие значения
+        item = {key: value for key, value in record.items() if key and value not in (None, "")}
+        item["sizes"] = _csv_list(item.get("sizes"))
+        if item.get("reviews"):
+            item["reviews"] = json.loads(item["reviews"])
+    else:
+        item = _parse_jsx(record)
+    # Числовая цена из строковой ($190), как в прежних скриптах импорта
+    if item.get("actual_price") in (None, "") and isinstance(item.get("price"), str):
+        try:
+            item["actual_price"] = float(item["price"].replace("$", "").replace(",", "").strip())
+        except ValueError:
+            pass
+    return item
+
+
+def _errors_text(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, item['loc']))}: {item['msg']}" for item in error.errors())
+
+
+def prepare(file_format: str, seq: int, record: Any) -> Tuple[Optional[tuple], Optional[str]]:
+    """Строка пачки (ROW_COLUMNS) или текст ошибки записи"""
+    try:
+        product = ProductImport.model_validate(parse_record(file_format, record))
+    except ValidationError as e:
+        return None, _errors_text(e)
+    except ValueError as e:
+        return None, f"не удалось разобрать запись: {e}"
+    reviews = [review.model_dump() for review in product.reviews]
+    return (
+        seq, product.id, product.name, product.price, product.actual_price, product.img, product.category,
+        product.sizes, product.rating, product.description, reviews or None
+    ), None
+
+
+def prepare_batch(file_format: str, first_seq: int, records: List[Any]) -> Tuple[List[tuple], List[tuple]]:
+    """
+    Разбор и проверка пачки записей (выполняется в процессе пула).
+
+    Возвращает строки для загрузки и отклоненные записи (номер, ошибка, запись).
+    """
+    rows, rejects = [], []
+    for seq, record in enumerate(records, start=first_seq):
+        row, error = prepare(file_format, seq, record)
+        if error:
+            rejects.append((seq, error, record))
+        else:
+            rows.append(row)
+    return rows, rejects
+
+
+def record_batches(path: str, file_format: str, start: int, size: int) -> Iterator[Tuple[int, List[Any]]]:
+    """Записи источника после записи start пачками по size: (номер первой записи, записи)"""
+    batch, first_seq = [], start + 1
+    for seq, record in enumerate(read_records(path, file_format), start=1):
+        if seq <= start:
+            continue
+        batch.append(record)
+        if len(batch) >= size:
+            yield first_seq, batch
+            batch, first_seq = [], seq + 1
+    if batch:
+        yield first_seq, batch
+
+
+def parsed_batches(
+    batches: Iterator[Tuple[int, List[Any]]], file_format: str, pool: Optional[ProcessPoolExecutor], workers: int
+) -> Iterator[Tuple[int, int, List[tuple], List[tuple]]]:
+    """
+    Разобранные пачки в порядке источника: (номер последней записи, записей, строки, отклоненные).
+
+    Без пула пачки разбираются в текущем процессе. С пулом в работе не
+    больше PARSE_AHEAD пачек на процесс: чтение не убегает вперед разбора.
+    """
+    if pool is None:
+        for first_seq, records in batches:
+            yield (first_seq + len(records) - 1, len(records), *prepare_batch(file_format, first_seq, records))
+        return
+    pending = deque()
+    for first_seq, records in batches:
+        future = pool.submit(prepare_batch, file_format, first_seq, records)
+        pending.append((first_seq + len(records) - 1, len(records), future))
+        if len(pending) >= workers * PARSE_AHEAD:
+            last_seq, count, future = pending.popleft()
+            yield (last_seq, count, *future.result())
+    while pending:
+        last_seq, count, future = pending.popleft()
+        yield (last_seq, count, *future.result())
+
+
+class Checkpoint:
+    """Номер последней загруженной записи источника в JSON-файле"""
+
+    def __init__(self, path: str, source: str):
+        self.path = path
+        stat = os.stat(source)
+        # Контрольная точка действительна только для того же файла источника
+        self.source = {"path": os.path.abspath(source), "size": stat.st_size, "mtime": stat.st_mtime}
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> int:
+        """Номер записи, с которой продолжать (0 - контрольной точки нет)"""
+        if not self.exists():
+            return 0
+        with open(self.path, encoding="utf-8") as file:
+            state = json.load(file)
+        if state.get("source") != self.source:
+            raise CatalogImportError(
+                f"Контрольная точка {self.path} записана для другого источника или файл изменился"
+            )
+        return state["position"]
+
+    def save(self, position: int, stats: ImportStats):
+        # Запись через временный файл: при сбое остается прежняя отметка
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump({"source": self.source, "position": position, "stats": stats.snapshot()}, file)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        if self.exists():
+            os.remove(self.path)
+
+
+def _pg_array(values: List[str]) -> str:
+    """Литерал массива PostgreSQL"""
+    return "{" + ",".join('"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"' for value in values) + "}"
+
+
+# Спецсимволы текстового формата COPY
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def _copy_buffer(rows: List[tuple]) -> io.StringIO:
+    """Пачка в текстовом формате COPY: поля через табуляцию, NULL - \\N"""
+    buffer = io.StringIO()
+    for row in rows:
+        values = list(row)
+        values[7] = _pg_array(row[7])
+        values[10] = json.dumps(row[10], ensure_ascii=False) if row[10] else None
+        buffer.write("\t".join(map(_copy_value, values)))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+_STAGING_DDL = f"""
+    CREATE TEMP TABLE {STAGING_TABLE} (
+        seq bigint, id integer, name text, price text, actual_price double precision, img text,
+        category text, sizes text[], rating double precision, description text, reviews jsonb,
+        is_new boolean
+    ) ON COMMIT DROP
+"""
+
+
+def _merge_statements() -> List[str]:
+    columns = ", ".join(PRODUCT_COLUMNS)
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in product_service.UPSERT_COLUMNS)
+    stars = [f"stars_{star}" for star in rating_service.STAR_COLUMNS]
+    stars_set = ", ".join(f"{column} = a.{column}" for column in stars)
+    stars_count = ", ".join(
+        f"count(*) FILTER (WHERE r.rating = {star}) AS stars_{star}" for star in rating_service.STAR_COLUMNS
+    )
+    return [
+        # Товарам без id id выдаются заранее: по ним к товару привязываются отзывы
+        f"UPDATE {STAGING_TABLE} SET id = nextval(pg_get_serial_sequence('products', 'id')) WHERE id IS NULL",
+        f"DELETE FROM {STAGING_TABLE} a USING {STAGING_TABLE} b WHERE a.id = b.id AND a.seq < b.seq",
+        f"UPDATE {STAGING_TABLE} s SET is_new = NOT EXISTS (SELECT 1 FROM products p WHERE p.id = s.id)",
+        f"INSERT INTO products ({columns}) SELECT {columns} FROM {STAGING_TABLE} "
+        f"ON CONFLICT (id) DO UPDATE SET {updates}, version = products.version + 1",
+        f"INSERT INTO reviews (product_id, \"user\", review, rating, created_at) "
+        f"SELECT s.id, r.\"user\", r.review, r.rating, now() AT TIME ZONE 'utc' FROM {STAGING_TABLE} s "
+        f"CROSS JOIN LATERAL jsonb_to_recordset(s.reviews) AS r(\"user\" text, review text, rating smallint) "
+        f"WHERE s.is_new AND s.reviews IS NOT NULL",
+        # Агрегаты отзывов новых товаров (см. rating_service.aggregate_values)
+        f"UPDATE products p SET review_count = a.review_count, rating_count = a.rating_count, "
+        f"rating_sum = a.rating_sum, {stars_set}, "
+        f"rating = CASE WHEN a.rating_count > 0 THEN round(a.rating_sum::numeric / a.rating_count, 2) ELSE p.rating END "
+        f"FROM (SELECT s.id, count(*) AS review_count, count(r.rating) AS rating_count, "
+        f"coalesce(sum(r.rating), 0) AS rating_sum, {stars_count} FROM {STAGING_TABLE} s "
+        f"CROSS JOIN LATERAL jsonb_to_recordset(s.reviews) AS r(rating smallint) "
+        f"WHERE s.is_new AND s.reviews IS NOT NULL GROUP BY s.id) a WHERE p.id = a.id",
+    ]
+
+
+def _load_postgres(db: Session, rows: List[tuple], stats: ImportStats):
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.execute(_STAGING_DDL)
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} ({', '.join(ROW_COLUMNS)}) FROM STDIN", _copy_buffer(rows)
+        )
+        assign_ids, deduplicate, mark_new, merge, add_reviews, aggregate = _merge_statements()
+        # Явные id прошлых пачек и этой пачки еще не учтены последовательностью
+        cursor.execute(f"SELECT COALESCE(MAX(id), 1) FROM {STAGING_TABLE}")
+        product_service.sync_id_sequence(db, at_least=cursor.fetchone()[0])
+        cursor.execute(assign_ids)
+        cursor.execute(deduplicate)
+        stats.duplicates += cursor.rowcount
+        cursor.execute(mark_new)
+        cursor.execute(merge)
+        merged = cursor.rowcount
+        cursor.execute(add_reviews)
+        stats.reviews += cursor.rowcount
+        cursor.execute(aggregate)
+        cursor.execute(f"SELECT count(*) FROM {STAGING_TABLE} WHERE is_new")
+        inserted = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    stats.inserted += inserted
+    stats.updated += merged - inserted
+
+
+def _load_generic(db: Session, rows: List[tuple], stats: ImportStats):
+    """Тот же upsert через SQLAlchemy для баз без COPY (SQLite)"""
+    keyed, new = {}, []
+    for row in rows:
+        values = dict(zip(ROW_COLUMNS[1:], row[1:]))
+        if values["id"] is None:
+            new.append(values)
+        else:
+            if values["id"] in keyed:
+                stats.duplicates += 1
+            keyed[values["id"]] = values
+    existing = set(db.scalars(select(Product.id).where(Product.id.in_(list(keyed))))) if keyed else set()
+
+    insert = dialect_insert(db)
+    reviews = []
+    if keyed:
+        statement = insert(Product)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Product.id],
+            set_={
+                **{column: statement.excluded[column] for column in product_service.UPSERT_COLUMNS},
+                "version": Product.version + 1,
+            }
+        )
+        db.execute(statement, [{column: values[column] for column in PRODUCT_COLUMNS} for values in keyed.values()])
+        reviews += [(values["id"], values["reviews"]) for values in keyed.values() if values["id"] not in existing]
+    if new:
+        ids = db.scalars(
+            insert(Product).returning(Product.id, sort_by_parameter_order=True),
+            [{column: values[column] for column in PRODUCT_COLUMNS[1:]} for values in new]
+        ).all()
+        reviews += [(product_id, values["reviews"]) for product_id, values in zip(ids, new)]
+
+    review_rows = [
+        {"product_id": product_id, **review} for product_id, items in reviews if items for review in items
+    ]
+    if review_rows:
+        db.execute(insert(Review), review_rows)
+        db.execute(update(Product), [
+            {"id": product_id, **rating_service.aggregate_values(review["rating"] for review in items)}
+            for product_id, items in reviews if items
+        ])
+    inserted = len(keyed) - len(existing) + len(new)
+    stats.inserted += inserted
+    stats.updated += len(existing)
+    stats.reviews += len(review_rows)
+
+
+def load_chunk(db: Session, rows: List[tuple], stats: ImportStats):
+    """Загрузка пачки строк одной транзакцией (с commit)"""
+    try:
+        if dialect_name(db) == "postgresql":
+            _load_postgres(db, rows, stats)
+        else:
+            _load_generic(db, rows, stats)
+        # Ревизия каталога и событие: процессы API сбрасывают кеши каталога
+        product_service.bump_catalog_revision(db)
+        events.publish(db, "product", None)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+class RejectsFile:
+    """Отклоненные записи с причиной в JSONL; файл создается при первой записи"""
+
+    def __init__(self, path: str, append: bool):
+        self.path = path
+        self._file = None
+        if not append and os.path.exists(path):
+            # Отклоненные записи прошлого импорта к новому не относятся
+            os.remove(path)
+
+    def write(self, seq: int, error: str, record: Any):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        if isinstance(record, str):
+            record = record.rstrip("\r\n")
+        self._file.write(json.dumps({"seq": seq, "error": error, "record": record}, ensure_ascii=False, default=str))
+        self._file.write("\n")
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class ChunkWriter(threading.Thread):
+    """
+    Поток загрузки пачек в базу.
+
+    Пачки приходят через очередь на WRITER_QUEUE_CHUNKS пачек: следующие
+    пачки разбираются, пока загружается текущая, а если база не успевает,
+    put() ждет и разобранные строки не копятся в памяти. После загрузки
+    пачки пишутся ее отклоненные записи и контрольная точка.
+    """
+
+    def __init__(self, db: Session, stats: ImportStats, checkpoint: Checkpoint, rejects: RejectsFile,
+                 on_progress: Optional[Callable[[ImportStats], None]] = None,
+                 on_reject: Optional[Callable[[int, str], None]] = None):
+        super().__init__(name="catalog-import-writer", daemon=True)
+        self.db = db
+        self.stats = stats
+        self.checkpoint = checkpoint
+        self.rejects = rejects
+        self.on_progress = on_progress
+        self.on_reject = on_reject
+        self.queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=WRITER_QUEUE_CHUNKS)
+        self.error: Optional[BaseException] = None
+
+    def put(self, position: int, rows: List[tuple], rejects: List[tuple]):
+        """Пачка строк и отклоненных записей до записи position включительно"""
+        if self.error:
+            raise self.error
+        self.queue.put((position, rows, rejects))
+
+    def close(self):
+        """Загрузка оставшихся пачек и остановка потока"""
+        self.queue.put(None)
+        self.join()
+        self.rejects.close()
+        if self.error:
+            raise self.error
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error:
+                # После ошибки очередь только освобождается, чтобы put() не ждал вечно
+                continue
+            try:
+                self._write(*item)
+            except BaseException as e:
+                self.error = e
+
+    def _write(self, position: int, rows: List[tuple], rejects: List[tuple]):
+        if rows:
+            load_chunk(self.db, rows, self.stats)
+        for seq, error, record in rejects:
+            self.rejects.write(seq, error, record)
+            if self.on_reject:
+                self.on_reject(seq, error)
+        self.rejects.flush()
+        self.stats.rejected += len(rejects)
+        self.stats.position = position
+        self.checkpoint.save(position, self.stats)
+        if self.on_progress:
+            self.on_progress(self.stats)
+
+
+def _start_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    if workers <= 0:
+        return None
+    pool = ProcessPoolExecutor(max_workers=workers)
+    # Процессы пула запускаются (fork) до потока записи: fork процесса с
+    # работающими потоками может унаследовать захваченные ими блокировки
+    pool.submit(int).result()
+    return pool
+
+
+def finish(db: Session, stats: ImportStats):
+    """Действия после загрузки всех пачек: рейтинги, статистика планировщика"""
+    # Последовательность id сдвигается при загрузке каждой пачки.
+    # Агрегаты новых товаров посчитаны при загрузке пачек; рейтинги меняют
+    # их отзывы и смена категорий обновленных товаров
+    if stats.reviews or stats.updated:
+        rating_service.rebuild_leaderboards(db)
+    db.commit()
+    if dialect_name(db) == "postgresql" and stats.inserted:
+        db.execute(text("ANALYZE products"))
+        db.commit()
+
+
+def replace_catalog(db: Session) -> int:
+    """Удаление всех товаров (с отзывами) перед импортом"""
+    deleted = db.query(Product).delete(synchronize_session=False)
+    product_service.bump_catalog_revision(db)
+    events.publish(db, "product", None)
+    db.commit()
+    return deleted
+
+
+def run_import(
+    db: Session,
+    path: str,
+    file_format: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    checkpoint_path: Optional[str] = None,
+    resume: bool = False,
+    restart: bool = False,
+    replace: bool = False,
+    workers: int = 0,
+    parse_batch: int = DEFAULT_PARSE_BATCH,
+    rejects_path: Optional[str] = None,
+    on_progress: Optional[Callable[[ImportStats], None]] = None,
+    on_reject: Optional[Callable[[int, str], None]] = None
+) -> ImportStats:
+    """
+    Импорт файла path (см. описание модуля).
+
+    resume - продолжить с контрольной точки, restart - начать заново,
+    удалив ее; без флагов существующая контрольная точка - ошибка, чтобы
+    случайный повторный запуск не загрузил файл с начала. replace -
+    удалить все товары перед импортом (только при старте с начала).
+    workers - процессов разбора (0 - разбор в текущем процессе),
+    rejects_path - файл отклоненных записей (по умолчанию <path>.rejects.jsonl).
+    """
+    file_format = file_format or detect_format(path)
+    if file_format not in FORMATS:
+        raise CatalogImportError(f"Неизвестный формат {file_format}")
+    checkpoint = Checkpoint(checkpoint_path or f"{path}.checkpoint", path)
+    if restart:
+        checkpoint.clear()
+    elif checkpoint.exists() and not resume:
+        raise CatalogImportError(
+            f"Найдена контрольная точка {checkpoint.path} прерванного импорта: "
+            f"продолжите его (--resume) или начните заново (--restart)"
+        )
+    start = checkpoint.load()
+    if replace and start:
+        raise CatalogImportError("Замену каталога можно выполнить только при импорте с начала")
+
+    stats = ImportStats(skipped=start)
+    if replace:
+        replace_catalog(db)
+
+    rejects = RejectsFile(rejects_path or f"{path}.rejects.jsonl", append=bool(start))
+    pool = _start_pool(workers)
+    with pool or nullcontext():
+        writer = ChunkWriter(db, stats, checkpoint, rejects, on_progress=on_progress, on_reject=on_reject)
+        writer.start()
+        try:
+            rows: List[tuple] = []
+            rejected: List[tuple] = []
+            batches = record_batches(path, file_format, start, parse_batch)
+            for last_seq, count, batch_rows, batch_rejects in parsed_batches(batches, file_format, pool, workers):
+                stats.read += count
+                rows += batch_rows
+                rejected += batch_rejects
+                if len(rows) >= chunk_size:
+                    writer.put(last_seq, rows, rejected)
+                    rows, rejected = [], []
+            if rows or rejected:
+                writer.put(last_seq, rows, rejected)
+        finally:
+            writer.close()
+    finish(db, stats)
+    checkpoint.clear()
+    return stats
@@ -0,0 +1,18 @@
+"""
+Конструкции SQL, которые различаются между PostgreSQL и SQLite.
+"""
+from sqlalchemy.orm import Session
+
+
+def dialect_name(db) -> str:
+    """Имя диалекта базы сессии (синхронной или асинхронной)"""
+    return db.get_bind().dialect.name
+
+
+def dialect_insert(db: Session):
+    """insert() диалекта текущей базы: с поддержкой ON CONFLICT"""
+    if dialect_name(db) == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
@@ -0,0 +1,140 @@
+"""
+События изменения данных между процессами через PostgreSQL LISTEN/NOTIFY.
+
+Сервисы публикуют событие (тип сущности, id, версия) в той же транзакции,
+что и запись: NOTIFY доставляется только после COMMIT и пропадает при
+откате. Каждый процесс API слушает канал в фоновой задаче и сбрасывает
+соответствующие записи своих локальных кешей.
+"""
+import asyncio
+import json
+import os
+import socket
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from config import DATABASE_LISTEN_URL, engine
+
+CHANNEL = "cache_events"
+# Идентификатор процесса: свои события уже применены локально и пропускаются
+ORIGIN = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+# тип сущности -> обработчики (entity_id, version); entity_id=None означает "все"
+_handlers: Dict[str, List[Callable[[Optional[int], Optional[int]], None]]] = defaultdict(list)
+_listener_task: Optional[asyncio.Task] = None
+
+
+def subscribe(entity: str, handler: Callable[[Optional[int], Optional[int]], None]):
+    """Регистрация обработчика событий об изменении сущности"""
+    _handlers[entity].append(handler)
+
+
+def publish(db: Session, entity: str, entity_id: Optional[int], version: Optional[int] = None):
+    """Публикация события в текущей транзакции (вызывать до commit)"""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    payload = json.dumps({"entity": entity, "id": entity_id, "version": version, "origin": ORIGIN})
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+
+
+def _dispatch(entity: str, entity_id: Optional[int], version: Optional[int]):
+    for handler in _handlers.get(entity, []):
+        try:
+            handler(entity_id, version)
+        except Exception as e:
+            print(f"Ошибка обработчика события {entity}: {e}")
+
+
+def _dispatch_reset():
+    """Сброс всех кешей: события за время без подписки могли быть потеряны"""
+    for entity in list(_handlers):
+        _dispatch(entity, None, None)
+
+
+def _handle_notification(payload: str):
+    try:
+        event = json.loads(payload)
+    except ValueError:
+        return
+    if event.get("origin") == ORIGIN:
+        return
+    _dispatch(event.get("entity"), event.get("id"), event.get("version"))
+
+
+def _connect():
+    import psycopg2
+
+    # Не через пул движка: за PgBouncer (transaction pooling) LISTEN не работает
+    dsn = make_url(DATABASE_LISTEN_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+    connection = psycopg2.connect(dsn)
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute(f"LISTEN {CHANNEL}")
+    return connection
+
+
+async def _listen_forever():
+    loop = asyncio.get_running_loop()
+    delay = RECONNECT_DELAY
+    while True:
+        connection = None
+        try:
+            connection = await loop.run_in_executor(None, _connect)
+            _dispatch_reset()
+            delay = RECONNECT_DELAY
+
+            broken = loop.create_future()
+
+            def on_readable():
+                try:
+                    connection.poll()
+                except Exception as e:
+                    if not broken.done():
+                        broken.set_exception(e)
+                    return
+                while connection.notifies:
+                    _handle_notification(connection.notifies.pop(0).payload)
+
+            loop.add_reader(connection.fileno(), on_readable)
+            try:
+                await broken
+            finally:
+                loop.remove_reader(connection.fileno())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Подписка на события {CHANNEL} прервана: {e}")
+        finally:
+            if connection is not None:
+                connection.close()
+
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+
+def start_listener():
+    """Запуск фоновой подписки на события (вызывается при старте приложения)"""
+    global _listener_task
+    if engine.dialect.name != "postgresql" or _listener_task is not None:
+        return
+    _listener_task = asyncio.get_running_loop().create_task(_listen_forever())
+
+
+async def stop_listener():
+    """Остановка фоновой подписки"""
+    global _listener_task
+    if _listener_task is None:
+        return
+    _listener_task.cancel()
+    try:
+        await _listener_task
+    except asyncio.CancelledError:
+        pass
+    _listener_task = None
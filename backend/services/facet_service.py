@@ -0,0 +1,208 @@
+"""
+Фильтры каталога и счетчики фасетов для боковой панели.
+
+Одни и те же условия используются для списка товаров и для фасетов.
+Счетчики фасета учитывают все фильтры, кроме фильтра самого фасета, чтобы
+при выбранной категории в панели оставались видны остальные категории.
+
+Все счетчики считаются за один запрос к базе. Без фильтров это одна
+группировка таблицы по всем фасетам сразу. С фильтрами - UNION ALL из
+ветки на каждый фасет: условия веток разные, и каждая использует свои
+индексы (категория и цена, GIN по размерам) вместо полного чтения таблицы.
+"""
+from collections import Counter
+from typing import Dict, List, Optional
+
+from sqlalchemy import ARRAY, Integer, String, and_, case, cast, func, literal, null, select, union_all
+from sqlalchemy.orm import Session
+
+from models.product import Product
+
+# Сортировки списка товаров: название -> (колонка, по убыванию)
+SORT_OPTIONS = {
+    "id": (Product.id, False),
+    "newest": (Product.id, True),
+    "price_asc": (Product.actual_price, False),
+    "price_desc": (Product.actual_price, True),
+    "rating": (Product.rating, True),
+}
+DEFAULT_SORT = "id"
+
+# Границы диапазонов цен в фасете; последний диапазон открыт сверху
+PRICE_BUCKETS = [0, 50, 100, 200, 500]
+# Пороги фасета "оценка от"
+RATING_THRESHOLDS = [4, 3, 2, 1]
+
+
+def _sizes_condition(dialect: str, sizes: List[str]):
+    """Товар есть хотя бы в одном из размеров"""
+    if dialect == "postgresql":
+        # Оператор && использует GIN-индекс ix_products_sizes
+        return Product.sizes.op("&&", is_comparison=True)(cast(sizes, ARRAY(String)))
+    # В SQLite размеры хранятся как JSON-массив
+    values = func.json_each(Product.sizes).table_valued("value")
+    return select(values.c.value).where(values.c.value.in_(sizes)).exists()
+
+
+def filter_conditions(
+    dialect: str,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sizes: Optional[List[str]] = None,
+    min_rating: Optional[float] = None
+) -> Dict[str, object]:
+    """Условия фильтров по фасетам: имя фасета -> условие"""
+    conditions = {}
+    if category and category != "All":
+        conditions["category"] = Product.category == category
+    price = []
+    if min_price is not None:
+        price.append(Product.actual_price >= min_price)
+    if max_price is not None:
+        price.append(Product.actual_price <= max_price)
+    if price:
+        conditions["price"] = and_(*price)
+    if sizes:
+        conditions["sizes"] = _sizes_condition(dialect, sizes)
+    if min_rating is not None:
+        conditions["rating"] = Product.rating >= min_rating
+    return conditions
+
+
+def _price_bucket(column):
+    """Номер диапазона цены из PRICE_BUCKETS"""
+    return case(
+        *[(column < edge, index - 1) for index, edge in enumerate(PRICE_BUCKETS) if index],
+        else_=len(PRICE_BUCKETS) - 1
+    )
+
+
+def _rating_bucket(column):
+    """Наибольший порог из RATING_THRESHOLDS, не превышающий оценку (0 - ниже всех)"""
+    return case(
+        *[(column >= threshold, threshold) for threshold in sorted(RATING_THRESHOLDS, reverse=True)],
+        else_=0
+    )
+
+
+def _price_ranges(counts: Counter) -> List[dict]:
+    ranges = []
+    for index, low in enumerate(PRICE_BUCKETS):
+        high = PRICE_BUCKETS[index + 1] if index + 1 < len(PRICE_BUCKETS) else None
+        ranges.append({"min": low, "max": high, "count": counts.get(index, 0)})
+    return ranges
+
+
+def _ratings(counts: Counter) -> List[dict]:
+    # counts - число товаров по порогам оценки; порог "от N" - сумма по N и выше
+    return [
+        {
+            "min_rating": threshold,
+            "count": sum(count for value, count in counts.items() if value >= threshold),
+        }
+        for threshold in RATING_THRESHOLDS
+    ]
+
+
+def _sorted_values(counts: Counter) -> List[dict]:
+    return [
+        {"value": value, "count": count}
+        for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    ]
+
+
+FACETS = ("category", "price", "sizes", "rating")
+
+
+def _empty_counts() -> Dict[str, Counter]:
+    return {name: Counter() for name in ("total", *FACETS)}
+
+
+def _add_sizes(counts: Counter, sizes: Optional[List[str]], count: int):
+    # Группировка идет по набору размеров товара, счетчик нужен по каждому размеру
+    for size in set(sizes or []):
+        counts[size] += count
+
+
+def _catalog_counts(db: Session) -> Dict[str, Counter]:
+    """Счетчики без фильтров: одна группировка по всем фасетам сразу"""
+    price_bucket = _price_bucket(Product.actual_price)
+    rating_bucket = _rating_bucket(Product.rating)
+    keys = [Product.category, Product.sizes, price_bucket, rating_bucket]
+    groups = db.query(*keys, func.count()).group_by(*keys).all()
+
+    counts = _empty_counts()
+    for category, sizes, bucket, rating, count in groups:
+        counts["total"][None] += count
+        counts["category"][category] += count
+        _add_sizes(counts["sizes"], sizes, count)
+        counts["price"][bucket] += count
+        counts["rating"][rating] += count
+    return counts
+
+
+def _filtered_counts(db: Session, conditions: Dict[str, object]) -> Dict[str, Counter]:
+    """Счетчики с фильтрами: ветка UNION ALL на фасет, каждая со своими индексами"""
+    def others(name):
+        """Все фильтры, кроме фильтра самого фасета"""
+        return [condition for other, condition in conditions.items() if other != name]
+
+    # Таблица указывается явно: у ветки "total" с одним фильтром по размерам
+    # products встречается только в подзапросе EXISTS.
+    # Типизированные NULL: PostgreSQL сводит типы колонок UNION по порядку веток
+    no_category = cast(null(), Product.category.type)
+    no_sizes = cast(null(), Product.sizes.type)
+    no_bucket = cast(null(), Integer)
+    price_bucket = _price_bucket(Product.actual_price)
+    rating_bucket = _rating_bucket(Product.rating)
+    branches = [
+        select(literal("total"), no_category, no_sizes, no_bucket, func.count())
+        .select_from(Product).where(*conditions.values()),
+        select(literal("category"), Product.category, no_sizes, no_bucket, func.count())
+        .select_from(Product).where(*others("category")).group_by(Product.category),
+        select(literal("sizes"), no_category, Product.sizes, no_bucket, func.count())
+        .select_from(Product).where(*others("sizes")).group_by(Product.sizes),
+        select(literal("price"), no_category, no_sizes, price_bucket, func.count())
+        .select_from(Product).where(*others("price")).group_by(price_bucket),
+        select(literal("rating"), no_category, no_sizes, rating_bucket, func.count())
+        .select_from(Product).where(*others("rating")).group_by(rating_bucket),
+    ]
+
+    counts = _empty_counts()
+    for facet, category, sizes, bucket, count in db.execute(union_all(*branches)):
+        if facet == "total":
+            counts["total"][None] = count
+        elif facet == "category":
+            counts["category"][category] = count
+        elif facet == "sizes":
+            _add_sizes(counts["sizes"], sizes, count)
+        else:
+            counts[facet][bucket] = count
+    return counts
+
+
+def get_facets(
+    db: Session,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sizes: Optional[List[str]] = None,
+    min_rating: Optional[float] = None
+) -> dict:
+    """Количество товаров по значениям фасетов при заданных фильтрах"""
+    conditions = filter_conditions(
+        db.get_bind().dialect.name, category=category, min_price=min_price, max_price=max_price,
+        sizes=sizes, min_rating=min_rating
+    )
+    if conditions:
+        counts = _filtered_counts(db, conditions)
+    else:
+        counts = _catalog_counts(db)
+    return {
+        "total": counts["total"].get(None, 0),
+        "categories": _sorted_values(counts["category"]),
+        "sizes": _sorted_values(counts["sizes"]),
+        "price_ranges": _price_ranges(counts["price"]),
+        "ratings": _ratings(counts["rating"]),
+    }
@@ -0,0 +1,130 @@
+"""
+Ключи идемпотентности (заголовок Idempotency-Key) для записи заказов.
+
+Клиент, повторяющий запрос после таймаута, передает тот же ключ. Ключ
+занимается первым запросом транзакции записи, а ответ сохраняется в той
+же транзакции перед COMMIT: заказ и ответ на его создание фиксируются
+вместе или не фиксируются вовсе.
+
+Параллельный повтор с тем же ключом ждет на уникальном индексе, пока
+транзакция первого запроса не завершится: после COMMIT он получает
+сохраненный ответ, после отката выполняет запрос сам. Поздний повтор
+читает ответ одним запросом по ключу, не трогая таблицы заказов. Ответы
+с ошибкой не сохраняются (транзакция откатывается), такой запрос можно
+повторить с тем же ключом.
+
+Ключ действует IDEMPOTENCY_KEY_TTL секунд: просроченный ключ занимается
+заново, а фоновая задача (start_purger) удаляет такие ключи.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from typing import Optional
+
+import orjson
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from config import IDEMPOTENCY_KEY_TTL, IDEMPOTENCY_PURGE_INTERVAL, SessionLocal
+from models.idempotency import IdempotencyKey
+from services.background import PeriodicTask
+from services.dialects import dialect_insert
+
+# Сколько просроченных ключей удаляется за одну транзакцию очистки
+PURGE_BATCH = 1000
+
+
+class IdempotencyKeyReusedError(ValueError):
+    """Ключ уже использован для запроса с другими параметрами"""
+
+
+def fingerprint(operation: str, *params) -> bytes:
+    """Отпечаток запроса: операция и ее параметры (словари - без учета порядка ключей)"""
+    return hashlib.sha256(orjson.dumps([operation, *params], option=orjson.OPT_SORT_KEYS)).digest()
+
+
+def claim(db: Session, key: str, request_fingerprint: bytes) -> Optional[dict]:
+    """
+    Занятие ключа в текущей транзакции (без commit).
+
+    None - ключ свободен и занят этим запросом: нужно выполнить запрос и
+    до commit вызвать save. Иначе возвращается сохраненный ответ, а
+    транзакцию можно откатить. Ключ с другим отпечатком -
+    IdempotencyKeyReusedError.
+    """
+    now = datetime.utcnow()
+    insert = dialect_insert(db)
+    statement = insert(IdempotencyKey).values(
+        key=key,
+        fingerprint=request_fingerprint,
+        response=None,
+        expires_at=now + timedelta(seconds=IDEMPOTENCY_KEY_TTL)
+    )
+    # Если ключ вставлен незавершенной транзакцией, INSERT ждет ее COMMIT или отката
+    taken = db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[IdempotencyKey.key],
+            set_={
+                "fingerprint": statement.excluded.fingerprint,
+                "response": None,
+                "expires_at": statement.excluded.expires_at,
+            },
+            # Просроченный ключ занимается заново
+            where=IdempotencyKey.expires_at <= now
+        ).returning(IdempotencyKey.key)
+    ).first()
+    if taken is not None:
+        return None
+
+    stored = db.execute(
+        select(IdempotencyKey.fingerprint, IdempotencyKey.response).where(IdempotencyKey.key == key)
+    ).one()
+    if stored.fingerprint != request_fingerprint:
+        raise IdempotencyKeyReusedError("Ключ идемпотентности уже использован для другого запроса")
+    return orjson.loads(stored.response)
+
+
+def save(db: Session, key: str, response: dict):
+    """Сохранение ответа на запрос с занятым ключом (в текущей транзакции, до commit)"""
+    db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.key == key)
+        .values(response=orjson.dumps(response))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def purge_expired(db: Session, now: Optional[datetime] = None) -> int:
+    """Удаление до PURGE_BATCH просроченных ключей; возвращает их число"""
+    is_expired = IdempotencyKey.expires_at <= (now or datetime.utcnow())
+    expired = select(IdempotencyKey.key).where(is_expired).limit(PURGE_BATCH)
+    deleted = db.execute(
+        delete(IdempotencyKey)
+        # Условие повторяется: ключ, занятый заново после выборки, не удаляется
+        .where(IdempotencyKey.key.in_(expired.scalar_subquery()), is_expired)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return deleted
+
+
+def _purge_once() -> int:
+    with SessionLocal() as db:
+        total = 0
+        while True:
+            deleted = purge_expired(db)
+            total += deleted
+            if deleted < PURGE_BATCH:
+                return total
+
+
+_purger = PeriodicTask("Удаление просроченных ключей идемпотентности", _purge_once, IDEMPOTENCY_PURGE_INTERVAL)
+
+
+def start_purger():
+    """Запуск фонового удаления просроченных ключей (вызывается при старте приложения)"""
+    _purger.start()
+
+
+async def stop_purger():
+    """Остановка фонового удаления"""
+    await _purger.stop()
@@ -0,0 +1,237 @@
+"""
+Остатки товаров по размерам и резервы под неоплаченные заказы.
+
+Списание с остатка - один условный UPDATE на все позиции заказа:
+stock = stock - qty WHERE stock >= qty. Конкурирующие покупатели одного
+SKU ждут только блокировку его строки и до COMMIT соседнего заказа; при
+повторной проверке условия после ожидания PostgreSQL видит уже
+уменьшенный остаток, поэтому продать больше, чем есть, нельзя. Заказы
+разных SKU друг друга не ждут.
+
+Списанное под заказ хранится резервом до оплаты. Оплата удаляет резерв
+(товар продан), отмена и истечение срока возвращают товар на остаток.
+Просроченные резервы возвращает фоновая задача (start_sweeper).
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from config import RESERVATION_SWEEP_INTERVAL, RESERVATION_TTL_SECONDS, SessionLocal
+from models.inventory import InventoryItem, Reservation
+from models.order import Order
+from services.background import PeriodicTask
+import services.job_queue as job_queue
+
+# Сколько просроченных резервов возвращается за одну транзакцию очистки
+SWEEP_BATCH = 500
+# Задача уведомления о смене статуса заказа; обработчик - в order_service,
+# который сам импортирует этот модуль
+STATUS_CHANGED_JOB = "order.status_changed"
+
+# (товар, размер) -> количество
+Quantities = Dict[Tuple[int, str], int]
+
+
+class OutOfStockError(ValueError):
+    """Остатка не хватает для части позиций заказа"""
+
+    def __init__(self, skus: List[Tuple[int, str]]):
+        self.skus = skus
+        super().__init__(
+            "Недостаточно товара: " + ", ".join(f"{product_id} ({size})" for product_id, size in skus)
+        )
+
+
+def _sku_key():
+    return tuple_(InventoryItem.product_id, InventoryItem.size)
+
+
+def _per_sku(quantities: Quantities):
+    """Количество для строки остатка: CASE по (товар, размер)"""
+    return case(
+        *[
+            ((InventoryItem.product_id == product_id) & (InventoryItem.size == size), quantity)
+            for (product_id, size), quantity in quantities.items()
+        ],
+        else_=0
+    )
+
+
+def _restock(db: Session, quantities: Quantities):
+    """Возврат товара на остаток одним UPDATE"""
+    if not quantities:
+        return
+    db.execute(
+        update(InventoryItem)
+        .where(_sku_key().in_(list(quantities)))
+        .values(stock=InventoryItem.stock + _per_sku(quantities))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reserve(db: Session, order_id: int, quantities: Quantities) -> Optional[datetime]:
+    """
+    Списание с остатка и резерв под заказ (в текущей транзакции, без commit).
+
+    Позиции без строки остатка не ограничены и не резервируются. Если
+    хоть одной позиции не хватает, ничего не списывается: OutOfStockError,
+    транзакцию нужно откатить. Возвращает срок резерва или None, если
+    учитываемых позиций нет.
+    """
+    delta = _per_sku(quantities)
+    reserved = set(db.execute(
+        update(InventoryItem)
+        .where(_sku_key().in_(list(quantities)), InventoryItem.stock >= delta)
+        .values(stock=InventoryItem.stock - delta)
+        .returning(InventoryItem.product_id, InventoryItem.size)
+        .execution_options(synchronize_session=False)
+    ).all())
+
+    missing = [sku for sku in quantities if sku not in reserved]
+    if missing:
+        # Не списались либо позиции без учета остатка, либо те, которых не хватило
+        short = db.execute(select(InventoryItem.product_id, InventoryItem.size).where(_sku_key().in_(missing))).all()
+        if short:
+            raise OutOfStockError(sorted(tuple(sku) for sku in short))
+    if not reserved:
+        return None
+
+    expires_at = datetime.utcnow() + timedelta(seconds=RESERVATION_TTL_SECONDS)
+    db.execute(
+        Reservation.__table__.insert(),
+        [
+            {
+                "order_id": order_id,
+                "product_id": product_id,
+                "size": size,
+                "quantity": quantities[(product_id, size)],
+                "expires_at": expires_at,
+            }
+            for product_id, size in reserved
+        ]
+    )
+    return expires_at
+
+
+def _take_reservations(db: Session, condition) -> List[tuple]:
+    """Удаление резервов по условию: строки (заказ, товар, размер, количество)"""
+    return db.execute(
+        delete(Reservation)
+        .where(condition)
+        .returning(Reservation.order_id, Reservation.product_id, Reservation.size, Reservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+
+def _quantities(rows: Iterable[tuple]) -> Quantities:
+    totals = Counter()
+    for _, product_id, size, quantity in rows:
+        totals[(product_id, size)] += quantity
+    return dict(totals)
+
+
+def confirm(db: Session, order_id: int):
+    """Оплата заказа: резерв снимается, товар остается списанным (без commit)"""
+    _take_reservations(db, Reservation.order_id == order_id)
+
+
+def release(db: Session, order_id: int):
+    """
+    Отмена заказа: зарезервированный товар возвращается на остаток (без commit).
+
+    Резервы удаляются тем же запросом, которым читаются, поэтому повторный
+    вызов для заказа (повтор задачи очереди) ничего не возвращает.
+    """
+    _restock(db, _quantities(_take_reservations(db, Reservation.order_id == order_id)))
+
+
+def release_expired(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Возврат на остаток просроченных резервов и отмена их неоплаченных заказов.
+
+    Резервы удаляются тем же запросом, что и выбираются, поэтому параллельные
+    очистки в разных процессах не вернут один резерв дважды. Для каждого
+    отмененного заказа ставится задача уведомления (STATUS_CHANGED_JOB). За вызов
+    обрабатывается до SWEEP_BATCH резервов; возвращает их число.
+    """
+    expired = (
+        select(Reservation.id)
+        .where(Reservation.expires_at <= (now or datetime.utcnow()))
+        .order_by(Reservation.expires_at)
+        .limit(SWEEP_BATCH)
+        # Строки, которые уже разбирает другой процесс, пропускаются, а не ждут его
+        .with_for_update(skip_locked=True)
+    )
+    rows = _take_reservations(db, Reservation.id.in_(expired.scalar_subquery()))
+    if not rows:
+        db.rollback()
+        return 0
+    _restock(db, _quantities(rows))
+    cancelled = db.scalars(
+        update(Order)
+        .where(Order.id.in_({order_id for order_id, *_ in rows}), Order.status == "pending")
+        .values(status="cancelled", updated_at=datetime.utcnow())
+        .returning(Order.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    # Уведомления только об отмененных здесь заказах, в той же транзакции
+    job_queue.enqueue_many(
+        db, STATUS_CHANGED_JOB, [{"order_id": order_id, "status": "cancelled"} for order_id in sorted(cancelled)]
+    )
+    db.commit()
+    return len(rows)
+
+
+def get_stock(db: Session, product_id: int) -> Dict[str, int]:
+    """Остатки товара по размерам (только учитываемые размеры)"""
+    return dict(db.execute(
+        select(InventoryItem.size, InventoryItem.stock)
+        .where(InventoryItem.product_id == product_id)
+        .order_by(InventoryItem.size)
+    ).all())
+
+
+def set_stock(db: Session, product_id: int, stock: Dict[str, Optional[int]]) -> Dict[str, int]:
+    """
+    Установка остатков товара по размерам; None - снять размер с учета.
+
+    Остаток задается как доступный к заказу, резервы его не меняют.
+    """
+    for size, value in stock.items():
+        item = db.get(InventoryItem, (product_id, size))
+        if value is None:
+            if item is not None:
+                db.delete(item)
+        elif item is None:
+            db.add(InventoryItem(product_id=product_id, size=size, stock=value))
+        else:
+            item.stock = value
+    db.commit()
+    return get_stock(db, product_id)
+
+
+def _sweep_once() -> int:
+    with SessionLocal() as db:
+        total = 0
+        while True:
+            released = release_expired(db)
+            total += released
+            # Неполная пачка - просроченных резервов больше нет
+            if released < SWEEP_BATCH:
+                return total
+
+
+_sweeper = PeriodicTask("Возврат просроченных резервов", _sweep_once, RESERVATION_SWEEP_INTERVAL)
+
+
+def start_sweeper():
+    """Запуск фоновой очистки просроченных резервов (вызывается при старте приложения)"""
+    _sweeper.start()
+
+
+async def stop_sweeper():
+    """Остановка фоновой очистки"""
+    await _sweeper.stop()
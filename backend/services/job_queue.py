@@ -0,0 +1,278 @@
+"""
+Очередь фоновых задач в таблице jobs.
+
+Сервис ставит задачу (enqueue) в своей транзакции: задача появляется в
+очереди только вместе с изменением, которое ее породило, и пропадает при
+откате. Обработчики (worker.py, любое число процессов) забирают готовые
+задачи пачкой: SELECT ... FOR UPDATE SKIP LOCKED пропускает строки,
+которые уже забирает другой обработчик, поэтому обработчики не ждут друг
+друга и не берут одну задачу дважды.
+
+Задача выполняется в одной транзакции с отметкой о выполнении, поэтому
+ее изменения в базе применяются ровно один раз; внешние действия
+(письма и т.п.) - не меньше одного раза. Упавшая задача повторяется с
+экспоненциальной задержкой, а после max_attempts попыток получает статус
+dead и ждет разбора (requeue_dead). Задачи обработчика, который упал,
+через JOB_LOCK_TIMEOUT возвращаются в очередь (requeue_stale).
+"""
+import random
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config import (
+    JOB_LOCK_TIMEOUT, JOB_MAX_ATTEMPTS, JOB_RETENTION_SECONDS, JOB_RETRY_DELAY, JOB_RETRY_MAX_DELAY, SessionLocal
+)
+from models.job import Job
+
+# Сколько выполненных задач удаляется за одну транзакцию очистки
+PURGE_BATCH = 1000
+# Как часто (секунд) обработчик возвращает брошенные задачи и удаляет старые выполненные
+MAINTENANCE_INTERVAL = 30.0
+# Сколько символов ошибки сохраняется в last_error
+MAX_ERROR_LENGTH = 4000
+
+# тип задачи -> обработчик (сессия, payload); обработчик не делает commit
+_handlers: Dict[str, Callable[[Session, dict], None]] = {}
+
+
+def handler(kind: str):
+    """Декоратор обработчика задач типа kind"""
+    def register(func: Callable[[Session, dict], None]):
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def enqueue_many(db: Session, kind: str, payloads: Iterable[dict], delay: float = 0,
+                 max_attempts: int = JOB_MAX_ATTEMPTS):
+    """Постановка задач в текущей транзакции (без commit)"""
+    now = datetime.utcnow()
+    rows = [
+        {
+            "kind": kind,
+            "payload": payload,
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": max_attempts,
+            "run_at": now + timedelta(seconds=delay),
+            "created_at": now,
+        }
+        for payload in payloads
+    ]
+    if rows:
+        db.execute(insert(Job), rows)
+
+
+def enqueue(db: Session, kind: str, payload: dict, delay: float = 0, max_attempts: int = JOB_MAX_ATTEMPTS):
+    """Постановка одной задачи в текущей транзакции (без commit)"""
+    enqueue_many(db, kind, [payload], delay=delay, max_attempts=max_attempts)
+
+
+def fetch(db: Session, worker: str, limit: int) -> List[tuple]:
+    """
+    Взять до limit готовых задач: статус running, попытка засчитана.
+
+    Возвращает строки (id, kind, payload, attempts, max_attempts).
+    """
+    now = datetime.utcnow()
+    ready = (
+        select(Job.id)
+        .where(Job.status == "queued", Job.run_at <= now)
+        .order_by(Job.run_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    jobs = db.execute(
+        update(Job)
+        .where(Job.id.in_(ready.scalar_subquery()), Job.status == "queued")
+        .values(status="running", attempts=Job.attempts + 1, locked_by=worker, locked_at=now)
+        .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return jobs
+
+
+def _owned(job) -> tuple:
+    # Номер попытки служит меткой владельца: задачу, которую вернули в
+    # очередь и взяли снова, прежний обработчик уже не отметит
+    return Job.id == job.id, Job.status == "running", Job.attempts == job.attempts
+
+
+def retry_delay(attempt: int) -> float:
+    """Задержка перед следующей попыткой: удваивается, со случайной половиной против волн повторов"""
+    delay = min(JOB_RETRY_DELAY * 2 ** (attempt - 1), JOB_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def run(db: Session, job) -> bool:
+    """Выполнение взятой задачи; False - задача упала и отложена или стала dead"""
+    try:
+        job_handler = _handlers.get(job.kind)
+        if job_handler is None:
+            raise LookupError(f"Нет обработчика задач типа {job.kind}")
+        job_handler(db, job.payload)
+        marked = db.execute(
+            update(Job)
+            .where(*_owned(job))
+            .values(status="done", finished_at=datetime.utcnow(), last_error=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if marked:
+            db.commit()
+        else:
+            # Задачу уже вернули в очередь как брошенную: ее выполнит другой обработчик
+            db.rollback()
+        return True
+    except Exception:
+        db.rollback()
+        _fail(db, job, traceback.format_exc())
+        return False
+
+
+def _fail(db: Session, job, error: str):
+    now = datetime.utcnow()
+    dead = job.attempts >= job.max_attempts
+    db.execute(
+        update(Job)
+        .where(*_owned(job))
+        .values(
+            status="dead" if dead else "queued",
+            run_at=now if dead else now + timedelta(seconds=retry_delay(job.attempts)),
+            finished_at=now if dead else None,
+            locked_by=None,
+            locked_at=None,
+            last_error=error[-MAX_ERROR_LENGTH:]
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def requeue_stale(db: Session) -> int:
+    """Возврат в очередь задач, которые выполняются дольше JOB_LOCK_TIMEOUT"""
+    now = datetime.utcnow()
+    exhausted = Job.attempts >= Job.max_attempts
+    requeued = db.execute(
+        update(Job)
+        .where(Job.status == "running", Job.locked_at < now - timedelta(seconds=JOB_LOCK_TIMEOUT))
+        .values(
+            status=case((exhausted, "dead"), else_="queued"),
+            finished_at=case((exhausted, now), else_=None),
+            run_at=now,
+            locked_by=None,
+            locked_at=None,
+            last_error="Превышено время выполнения: обработчик не ответил"
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return requeued
+
+
+def requeue_dead(db: Session, ids: Optional[List[int]] = None) -> int:
+    """Возврат задач dead (всех или с указанными id) в очередь с новыми попытками"""
+    condition = [Job.status == "dead"]
+    if ids:
+        condition.append(Job.id.in_(ids))
+    requeued = db.execute(
+        update(Job)
+        .where(*condition)
+        .values(status="queued", attempts=0, run_at=datetime.utcnow(), finished_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return requeued
+
+
+def purge_done(db: Session) -> int:
+    """Удаление до PURGE_BATCH выполненных задач старше JOB_RETENTION_SECONDS"""
+    is_old = (Job.status == "done") & (
+        Job.finished_at < datetime.utcnow() - timedelta(seconds=JOB_RETENTION_SECONDS)
+    )
+    old = select(Job.id).where(is_old).limit(PURGE_BATCH)
+    deleted = db.execute(
+        delete(Job).where(Job.id.in_(old.scalar_subquery())).execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return deleted
+
+
+class WorkerStats:
+    """Счетчики обработчика за время работы процесса"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.done = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    def snapshot(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        return {
+            "done": self.done,
+            "failed": self.failed,
+            "jobs_per_second": round(self.done / elapsed, 1) if elapsed else 0.0,
+            # Доля времени, занятая задачами, а не ожиданием очереди
+            "utilization": round(self.busy_seconds / elapsed, 3) if elapsed else 0.0,
+        }
+
+
+def run_worker(name: str, stop: threading.Event, batch: int = 10, poll_interval: float = 1.0,
+               on_report: Optional[Callable[[WorkerStats], None]] = None, report_interval: float = 10.0):
+    """
+    Цикл обработчика: брать задачи пачками по batch, пока не выставлен stop.
+
+    Пустая очередь опрашивается раз в poll_interval секунд.
+    """
+    stats = WorkerStats()
+    last_maintenance = last_report = 0.0
+    with SessionLocal() as db:
+        while not stop.is_set():
+            now = time.monotonic()
+            if now - last_maintenance >= MAINTENANCE_INTERVAL:
+                requeue_stale(db)
+                purge_done(db)
+                last_maintenance = now
+            if on_report and now - last_report >= report_interval:
+                if last_report:
+                    on_report(stats)
+                last_report = now
+
+            jobs = fetch(db, name, batch)
+            if not jobs:
+                stop.wait(poll_interval)
+                continue
+            started = time.monotonic()
+            for job in jobs:
+                if run(db, job):
+                    stats.done += 1
+                else:
+                    stats.failed += 1
+            stats.busy_seconds += time.monotonic() - started
+    if on_report:
+        on_report(stats)
+    return stats
+
+
+async def stats(db: AsyncSession) -> dict:
+    """Состояние очереди: задачи по статусам, отставание и выполнено за минуту"""
+    now = datetime.utcnow()
+    counts = dict((await db.execute(select(Job.status, func.count()).group_by(Job.status))).all())
+    oldest_ready = await db.scalar(select(func.min(Job.run_at)).where(Job.status == "queued", Job.run_at <= now))
+    done_last_minute = await db.scalar(
+        select(func.count()).where(Job.status == "done", Job.finished_at >= now - timedelta(minutes=1))
+    )
+    return {
+        **{status: counts.get(status, 0) for status in ("queued", "running", "done", "dead")},
+        # Сколько секунд ждет самая старая готовая задача
+        "lag_seconds": round((now - oldest_ready).total_seconds(), 3) if oldest_ready else 0.0,
+        "done_last_minute": done_last_minute,
+    }
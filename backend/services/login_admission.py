@@ -0,0 +1,132 @@
+"""
+Допуск попыток входа до проверки пароля.
+
+Проверка пароля стоит сотни миллисекунд процессора (bcrypt), поэтому
+лишние попытки отсекаются заранее и дешево, в памяти процесса:
+  - с одного IP - не чаще LOGIN_IP_RATE в минуту (с запасом LOGIN_IP_BURST),
+    считается каждая попытка;
+  - для одного имени пользователя с одного IP - не больше
+    LOGIN_USERNAME_RATE неудачных попыток в минуту (запас
+    LOGIN_USERNAME_BURST). Ключ включает IP: подбор чужого пароля с одного
+    адреса не блокирует вход владельцу учетной записи с его адреса;
+  - для одного имени пользователя со всех IP вместе - не больше
+    LOGIN_ACCOUNT_RATE неудачных попыток в минуту (запас
+    LOGIN_ACCOUNT_BURST). Предел выше, чем для одного IP: он ограничивает
+    подбор к одной учетной записи с многих адресов.
+
+Попытка для имени резервируется до проверки пароля и возвращается
+(release), если вход успешен или пароль не проверялся. Поэтому
+параллельные попытки не проходят мимо предела, пока первые еще
+проверяются: проверка и резерв выполняются одним шагом под блокировкой.
+
+Ограничения действуют в пределах процесса; ключи хранятся в LRU
+ограниченного размера, поэтому поток разных IP не расходует память.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from config import (
+    LOGIN_ACCOUNT_BURST, LOGIN_ACCOUNT_RATE, LOGIN_IP_BURST, LOGIN_IP_RATE, LOGIN_USERNAME_BURST,
+    LOGIN_USERNAME_RATE
+)
+
+# Сколько ключей (IP, имен пользователей) помнит каждый ограничитель
+MAX_KEYS = 100_000
+
+
+class TokenBucketLimiter:
+    """Token bucket по ключу: rate_per_minute токенов в минуту, не больше burst"""
+
+    def __init__(self, name: str, rate_per_minute: float, burst: int, max_keys: int = MAX_KEYS):
+        self.name = name
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # ключ -> (токенов, время последнего пополнения)
+        self._buckets: "OrderedDict[Hashable, Tuple[float, float]]" = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+
+    def _tokens(self, key: Hashable, now: float) -> float:
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def acquire(self, key: Hashable) -> float:
+        """Взять токен: 0 - попытка допущена, иначе через сколько секунд повторить"""
+        with self._lock:
+            now = time.monotonic()
+            tokens = self._tokens(key, now)
+            if tokens < 1:
+                self.rejected += 1
+                return (1 - tokens) / self.rate
+            self._buckets[key] = (tokens - 1, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            self.allowed += 1
+            return 0.0
+
+    def refund(self, key: Hashable):
+        """Возврат токена, взятого acquire (не больше burst)"""
+        with self._lock:
+            if key in self._buckets:
+                now = time.monotonic()
+                self._buckets[key] = (min(self.burst, self._tokens(key, now) + 1), now)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "keys": len(self._buckets),
+                "rate_per_minute": round(self.rate * 60, 3),
+                "burst": self.burst,
+                "allowed": self.allowed,
+                "rejected": self.rejected,
+            }
+
+
+ip_limiter = TokenBucketLimiter("ip", LOGIN_IP_RATE, LOGIN_IP_BURST)
+username_limiter = TokenBucketLimiter("username", LOGIN_USERNAME_RATE, LOGIN_USERNAME_BURST)
+account_limiter = TokenBucketLimiter("account", LOGIN_ACCOUNT_RATE, LOGIN_ACCOUNT_BURST)
+
+
+def _username_key(ip: Optional[str], username: str) -> tuple:
+    return ip or "unknown", username.lower()
+
+
+def admit(ip: Optional[str], username: str) -> float:
+    """
+    Допуск попытки входа: 0 - можно проверять пароль, иначе Retry-After в секундах.
+
+    Допущенная попытка расходует пределы имени (с этого IP и со всех IP);
+    после успешного входа их возвращает release.
+    """
+    key = _username_key(ip, username)
+    account = username.lower()
+    # Имя проверяется первым: отказ по нему не расходует лимит IP.
+    # Пределы, взятые до отказа следующего, возвращаются
+    wait = username_limiter.acquire(key)
+    if wait:
+        return wait
+    wait = account_limiter.acquire(account)
+    if wait:
+        username_limiter.refund(key)
+        return wait
+    wait = ip_limiter.acquire(ip or "unknown")
+    if wait:
+        account_limiter.refund(account)
+        username_limiter.refund(key)
+    return wait
+
+
+def release(ip: Optional[str], username: str):
+    """Возврат попытки имени: вход успешен или пароль не проверялся"""
+    username_limiter.refund(_username_key(ip, username))
+    account_limiter.refund(username.lower())
+
+
+def stats() -> dict:
+    """Метрики допуска для /api/metrics"""
+    return {"ip": ip_limiter.stats(), "username": username_limiter.stats(), "account": account_limiter.stats()}
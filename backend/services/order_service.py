@@ -1,69 +1,308 @@
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime
 
 from models.order import Order, order_products
 from models.product import Product
-from schemas.order import OrderCreate, OrderUpdate
+from models.revision import Revision
+from services.product_service import CATALOG_REVISION, LIST_FIELDS as PRODUCT_FIELDS
+from schemas.order import OrderCreate, OrderInDB, OrderSummary, OrderUpdate
+from services.pagination import decode_cursor, encode_cursor, next_cursor
+import services.idempotency_service as idempotency_service
+import services.inventory_service as inventory_service
+import services.job_queue as job_queue
 
-def get_orders(db: Session, user_id: int = None, skip: int = 0, limit: int = 100):
-    """Получение списка заказов с возможностью фильтрации по пользователю"""
-    query = db.query(Order)
+# Поля заказа в списке заказов
+LIST_FIELDS = tuple(OrderInDB.model_fields)
+# Поля строки истории заказов (все есть в индексе ix_orders_user_history)
+HISTORY_FIELDS = tuple(OrderSummary.model_fields)
+# Сколько строк за раз читается из серверного курсора при потоковой выдаче
+STREAM_BATCH_ROWS = 500
+# Типы фоновых задач заказа (см. job_queue)
+RELEASE_STOCK_JOB = "order.release_stock"
+STATUS_CHANGED_JOB = inventory_service.STATUS_CHANGED_JOB
+# Допустимые смены статуса заказа; из отмененного и доставленного - никаких.
+# Отмена возможна только до оплаты: после оплаты резерва нет, возвращать нечего
+ALLOWED_TRANSITIONS = {
+    "pending": {"paid", "cancelled"},
+    "paid": {"shipped"},
+    "shipped": {"delivered"},
+    "delivered": set(),
+    "cancelled": set(),
+}
+
+def _orders_statement(
+    user_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    rows: bool = False
+):
+    """
+    SELECT страницы заказов с условием курсора.
+
+    rows=True - кортежи колонок LIST_FIELDS вместо ORM-объектов.
+    """
+    if rows:
+        statement = select(*[getattr(Order, name) for name in LIST_FIELDS])
+    else:
+        statement = select(Order)
     if user_id:
-        query = query.filter(Order.user_id == user_id)
-    return query.offset(skip).limit(limit).all()
+        statement = statement.where(Order.user_id == user_id)
+    # Новые заказы первыми; id разрешает совпадения по времени создания
+    statement = statement.order_by(Order.created_at.desc(), Order.id.desc())
+    if after:
+        last_created_at, last_id = decode_cursor(after, (datetime, int))
+        statement = statement.where(tuple_(Order.created_at, Order.id) < tuple_(last_created_at, last_id))
+    else:
+        statement = statement.offset(skip)
+    return statement.limit(limit)
+
+def get_orders(
+    db: Session,
+    user_id: int = None,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None
+):
+    """Получение списка заказов с возможностью фильтрации по пользователю"""
+    return db.scalars(_orders_statement(user_id, skip, limit, after)).all()
+
+async def get_order_rows_async(
+    db: AsyncSession,
+    user_id: int = None,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None
+):
+    """Страница заказов кортежами колонок LIST_FIELDS, без создания ORM-объектов"""
+    return (await db.execute(_orders_statement(user_id, skip, limit, after, rows=True))).all()
+
+def history_statement(user_id: int, limit: int = 20, after: Optional[str] = None):
+    """SELECT страницы истории заказов: только поля HISTORY_FIELDS"""
+    return _orders_statement(user_id, limit=limit, after=after).with_only_columns(
+        *[getattr(Order, name) for name in HISTORY_FIELDS]
+    )
+
+async def get_order_history_async(
+    db: AsyncSession,
+    user_id: int,
+    limit: int = 20,
+    after: Optional[str] = None
+):
+    """
+    История заказов покупателя: новые первыми, сводка без позиций.
+
+    Страница - один проход по диапазону индекса ix_orders_user_history;
+    следующая страница - по курсору orders_next_cursor.
+    """
+    return (await db.execute(history_statement(user_id, limit, after))).all()
+
+def history_item(row) -> dict:
+    """Строка истории заказов (OrderSummary) из строки базы"""
+    return dict(zip(HISTORY_FIELDS, row))
+
+def row_item(row) -> dict:
+    """Элемент ответа списка заказов напрямую из строки базы, без повторной валидации"""
+    return dict(zip(LIST_FIELDS, row))
+
+def with_items(orders: List[dict], items: Dict[int, List[dict]]) -> List[dict]:
+    """Добавление позиций (см. get_items) к элементам списка заказов"""
+    for order in orders:
+        order["items"] = items.get(order["id"], [])
+    return orders
+
+async def iter_order_batches_async(
+    db: AsyncSession,
+    user_id: int = None,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    items: bool = False
+) -> AsyncIterator[List[dict]]:
+    """
+    Страница заказов пачками словарей по мере чтения из серверного курсора.
+
+    items=True - с позициями и товарами: один запрос позиций на пачку.
+    """
+    statement = _orders_statement(user_id, skip, limit, after, rows=True)
+    result = await db.stream(statement.execution_options(yield_per=STREAM_BATCH_ROWS))
+    async for rows in result.partitions(STREAM_BATCH_ROWS):
+        batch = [row_item(row) for row in rows]
+        if items:
+            with_items(batch, await get_items_async(db, [order["id"] for order in batch]))
+        yield batch
+
+def orders_next_cursor(orders: List[Order], limit: int) -> Optional[str]:
+    """Курсор следующей страницы списка заказов"""
+    return next_cursor(orders, limit, key=lambda order: (order.created_at, order.id))
+
+async def orders_page_cursor_async(
+    db: AsyncSession,
+    user_id: int = None,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None
+) -> Optional[str]:
+    """Курсор следующей страницы без загрузки самой страницы (для потокового ответа)"""
+    statement = (
+        _orders_statement(user_id, after=after)
+        .with_only_columns(Order.created_at, Order.id)
+        .offset((0 if after else skip) + limit - 1)
+        .limit(1)
+    )
+    last = (await db.execute(statement)).first()
+    if last is None:
+        return None
+    return encode_cursor(last.created_at, last.id)
 
 def get_order(db: Session, order_id: int):
     """Получение заказа по ID"""
     return db.query(Order).filter(Order.id == order_id).first()
 
-def create_order(db: Session, order: OrderCreate, user_id: int):
-    """Создание нового заказа"""
-    # Создаем заказ
-    total_price = 0.0
-    
-    # Вычисляем общую стоимость заказа
-    for item in order.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if product:
-            # Предполагаем, что actual_price - это числовое значение цены
-            total_price += product.actual_price * item.quantity
-    
-    db_order = Order(
-        user_id=user_id,
-        total_price=total_price,
-        shipping_address=order.shipping_address,
-        payment_details=order.payment_details,
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
+def get_order_revision(db: Session, order_id: int) -> Optional[Tuple[datetime, int]]:
+    """Время изменения заказа и ревизия каталога одним запросом, без загрузки заказа"""
+    catalog_revision = (
+        select(Revision.value).where(Revision.name == CATALOG_REVISION).scalar_subquery()
     )
-    
-    db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
-    
-    # Добавляем товары к заказу
+    row = db.query(Order.updated_at, catalog_revision).filter(Order.id == order_id).first()
+    if row is None:
+        return None
+    return row[0], row[1] or 0
+
+class InvalidOrderError(ValueError):
+    """Заказ нельзя оформить (неизвестные или повторяющиеся товары) или перевести в статус"""
+
+def _order_lines(order: OrderCreate) -> List[dict]:
+    """Позиции заказа для order_products; товар может встречаться только один раз"""
+    lines = {}
     for item in order.items:
-        db.execute(
-            order_products.insert().values(
-                order_id=db_order.id,
-                product_id=item.product_id,
-                quantity=item.quantity,
-                selected_size=item.selected_size
+        if item.product_id in lines:
+            # Ключ order_products - (order_id, product_id): две позиции одного товара не сохранить
+            raise InvalidOrderError(f"Товар {item.product_id} указан в заказе несколько раз")
+        lines[item.product_id] = {
+            "product_id": item.product_id,
+            "quantity": item.quantity,
+            "selected_size": item.selected_size,
+        }
+    if not lines:
+        raise InvalidOrderError("Заказ не содержит товаров")
+    return list(lines.values())
+
+def create_order(db: Session, order: OrderCreate, user_id: int, idempotency_key: Optional[str] = None) -> dict:
+    """
+    Создание нового заказа в одной транзакции.
+
+    Цены всех товаров читаются одним запросом с IN, заказ вставляется с
+    RETURNING, позиции - одним пакетным INSERT, остаток списывается одним
+    условным UPDATE (см. inventory_service.reserve). Число запросов не
+    зависит от размера корзины, а сбой между шагами не оставляет заказ без
+    товаров. Неизвестные товары - InvalidOrderError, нехватка остатка -
+    OutOfStockError.
+
+    С idempotency_key повтор запроса возвращает ответ первого, не создавая
+    второй заказ (см. idempotency_service).
+    """
+    lines = _order_lines(order)
+    try:
+        if idempotency_key:
+            stored = idempotency_service.claim(
+                db, idempotency_key, idempotency_service.fingerprint("create_order", user_id, order.dict())
             )
+            if stored is not None:
+                db.rollback()
+                return stored
+
+        products = {
+            product.id: product
+            for product in db.execute(
+                select(*_product_columns()).where(Product.id.in_([line["product_id"] for line in lines]))
+            )
+        }
+        unknown = [line["product_id"] for line in lines if line["product_id"] not in products]
+        if unknown:
+            raise InvalidOrderError(f"Неизвестные товары: {', '.join(map(str, unknown))}")
+
+        now = datetime.utcnow()
+        row = db.execute(
+            insert(Order)
+            .values(
+                user_id=user_id,
+                total_price=sum(products[line["product_id"]].actual_price * line["quantity"] for line in lines),
+                item_count=sum(line["quantity"] for line in lines),
+                thumbnail=products[lines[0]["product_id"]].img,
+                status="pending",
+                shipping_address=order.shipping_address,
+                payment_details=order.payment_details,
+                created_at=now,
+                updated_at=now
+            )
+            .returning(*[getattr(Order, name) for name in LIST_FIELDS])
+        ).one()
+        db.execute(order_products.insert(), [{"order_id": row.id, **line} for line in lines])
+        # Остаток списывается последним: блокировки строк остатка держатся
+        # только до COMMIT, и покупатели одного SKU меньше ждут друг друга
+        reserved_until = inventory_service.reserve(
+            db, row.id, {(line["product_id"], line["selected_size"]): line["quantity"] for line in lines}
         )
-    
-    db.commit()
-    return db_order
+        items = [_item(line["quantity"], line["selected_size"], products[line["product_id"]]) for line in lines]
+        result = {**row_item(row), "items": items, "reserved_until": reserved_until}
+        if idempotency_key:
+            idempotency_service.save(db, idempotency_key, result)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result
 
-def update_order(db: Session, order_id: int, order: OrderUpdate):
-    """Обновление заказа"""
-    db_order = get_order(db, order_id)
+def update_order(
+    db: Session, order_id: int, order: OrderUpdate, idempotency_key: Optional[str] = None, user_id: Optional[int] = None
+) -> Optional[dict]:
+    """
+    Обновление заказа; возвращает заказ с товарами (order_response) или None.
+
+    Оплата снимает резерв (товар продан), отмена ставит в очередь возврат
+    резерва на остаток. Статус меняется только по ALLOWED_TRANSITIONS, иначе
+    InvalidOrderError (например, оплата заказа, отмененного в том числе по
+    истечении резерва); поэтому отмена и возврат резерва ставятся в очередь
+    не больше одного раза на заказ. С idempotency_key повтор запроса того же
+    пользователя user_id возвращает ответ первого, не меняя заказ и резерв
+    еще раз; тот же ключ от другого пользователя - IdempotencyKeyReusedError.
+    """
+    update_data = order.dict(exclude_unset=True)
+    if idempotency_key:
+        stored = idempotency_service.claim(
+            db, idempotency_key, idempotency_service.fingerprint("update_order", user_id, order_id, update_data)
+        )
+        if stored is not None:
+            db.rollback()
+            return stored
+
+    status = update_data.get("status")
+    # Резерв снимается до чтения заказа, как и в release_expired: если очистка
+    # успела вернуть резерв, заказ ниже читается уже отмененным
+    if status == "paid":
+        inventory_service.confirm(db, order_id)
+
+    # Строка заказа блокируется до COMMIT: параллельные смены статуса
+    # проверяются по очереди и не ставят задачи отмены дважды
+    db_order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
     if not db_order:
+        db.rollback()
         return None
-    
-    update_data = order.dict(exclude_unset=True)
-    
+    if status is not None and status != db_order.status:
+        if status not in ALLOWED_TRANSITIONS.get(db_order.status, ()):
+            db.rollback()
+            raise InvalidOrderError(f"Нельзя перевести заказ из статуса {db_order.status} в {status}")
+        # Возврат товара на остаток и уведомления выполняет обработчик
+        # очереди (worker.py), запрос их не ждет
+        if status == "cancelled":
+            job_queue.enqueue(db, RELEASE_STOCK_JOB, {"order_id": order_id})
+        job_queue.enqueue(db, STATUS_CHANGED_JOB, {"order_id": order_id, "status": status})
+
     # Обновляем поля объекта
     for key, value in update_data.items():
         setattr(db_order, key, value)
@@ -71,9 +310,24 @@ def update_order(db: Session, order_id: int, order: OrderUpdate):
     # Обновляем дату изменения
     db_order.updated_at = datetime.utcnow()
     
+    # Ответ читается до COMMIT, чтобы сохранить его вместе с изменениями
+    db.flush()
+    result = order_response(get_order_with_items(db, order_id))
+    if idempotency_key:
+        idempotency_service.save(db, idempotency_key, result)
     db.commit()
-    db.refresh(db_order)
-    return db_order
+    return result
+
+@job_queue.handler(RELEASE_STOCK_JOB)
+def release_stock_job(db: Session, payload: dict):
+    """Возврат на остаток резерва отмененного заказа"""
+    inventory_service.release(db, payload["order_id"])
+
+@job_queue.handler(STATUS_CHANGED_JOB)
+def status_changed_job(db: Session, payload: dict):
+    """Уведомление покупателя о смене статуса заказа"""
+    # Здесь должна быть отправка письма или SMS покупателю
+    print(f"Заказ {payload['order_id']}: статус {payload['status']}")
 
 def delete_order(db: Session, order_id: int):
     """Удаление заказа"""
@@ -81,6 +335,8 @@ def delete_order(db: Session, order_id: int):
     if not db_order:
         return False
     
+    # Зарезервированный товар возвращается на остаток
+    inventory_service.release(db, order_id)
     # Удаляем записи из таблицы связей
     db.execute(order_products.delete().where(order_products.c.order_id == order_id))
     
@@ -89,27 +345,91 @@ def delete_order(db: Session, order_id: int):
     db.commit()
     return True
 
-def get_order_with_items(db: Session, order_id: int):
-    """Получение заказа вместе с товарами"""
-    db_order = get_order(db, order_id)
-    if not db_order:
-        return None
-    
-    # Получаем товары из заказа
-    items = []
-    for product_id, quantity, selected_size in db.execute(
-        db.query(
-            order_products.c.product_id,
+def _product_columns() -> list:
+    return [getattr(Product, name) for name in PRODUCT_FIELDS]
+
+def _item(quantity: int, selected_size: str, product_row) -> dict:
+    """Позиция заказа с данными товара (поля как в списке товаров)"""
+    return {
+        "product": dict(zip(PRODUCT_FIELDS, product_row)),
+        "quantity": quantity,
+        "selected_size": selected_size,
+    }
+
+def _items_statement(order_ids: List[int]):
+    """Позиции заказов вместе с товарами одним JOIN"""
+    return (
+        select(
+            order_products.c.order_id,
             order_products.c.quantity,
-            order_products.c.selected_size
-        ).filter(order_products.c.order_id == order_id)
-    ):
-        product = db.query(Product).filter(Product.id == product_id).first()
-        if product:
-            items.append({
-                "product": product,
-                "quantity": quantity,
-                "selected_size": selected_size
-            })
-    
-    return {"order": db_order, "items": items}
\ No newline at end of file
+            order_products.c.selected_size,
+            *_product_columns()
+        )
+        .join(Product, Product.id == order_products.c.product_id)
+        .where(order_products.c.order_id.in_(order_ids))
+        .order_by(order_products.c.order_id, order_products.c.product_id)
+    )
+
+def _group_items(rows) -> Dict[int, List[dict]]:
+    """Позиции по id заказа"""
+    items = defaultdict(list)
+    for order_id, quantity, selected_size, *product in rows:
+        items[order_id].append(_item(quantity, selected_size, product))
+    return items
+
+def get_items(db: Session, order_ids: List[int]) -> Dict[int, List[dict]]:
+    """Позиции заказов с товарами одним запросом: id заказа -> позиции"""
+    if not order_ids:
+        return {}
+    return _group_items(db.execute(_items_statement(order_ids)))
+
+async def get_items_async(db: AsyncSession, order_ids: List[int]) -> Dict[int, List[dict]]:
+    """Асинхронный вариант get_items"""
+    if not order_ids:
+        return {}
+    return _group_items(await db.execute(_items_statement(order_ids)))
+
+def _details_statement(order_ids: List[int]):
+    return select(*[getattr(Order, name) for name in LIST_FIELDS]).where(Order.id.in_(order_ids))
+
+def _details(order_ids: List[int], orders, items: Dict[int, List[dict]]) -> List[dict]:
+    """Заказы в порядке order_ids, без несуществующих и повторов"""
+    by_id = {order.id: order for order in orders}
+    return [
+        {"order": row_item(by_id[order_id]), "items": items.get(order_id, [])}
+        for order_id in dict.fromkeys(order_ids)
+        if order_id in by_id
+    ]
+
+def get_orders_with_items(db: Session, order_ids: List[int]) -> List[dict]:
+    """
+    Заказы вместе с товарами: {"order": ..., "items": [...]} на каждый заказ.
+
+    Два запроса при любом числе заказов и позиций: заказы по IN и позиции
+    с товарами одним JOIN.
+    """
+    if not order_ids:
+        return []
+    orders = db.execute(_details_statement(order_ids)).all()
+    return _details(order_ids, orders, get_items(db, [order.id for order in orders]))
+
+async def get_orders_with_items_async(db: AsyncSession, order_ids: List[int]) -> List[dict]:
+    """Асинхронный вариант get_orders_with_items"""
+    if not order_ids:
+        return []
+    orders = (await db.execute(_details_statement(order_ids))).all()
+    return _details(order_ids, orders, await get_items_async(db, [order.id for order in orders]))
+
+def get_order_with_items(db: Session, order_id: int) -> Optional[dict]:
+    """Получение заказа вместе с товарами"""
+    details = get_orders_with_items(db, [order_id])
+    return details[0] if details else None
+
+async def get_order_with_items_async(db: AsyncSession, order_id: int) -> Optional[dict]:
+    """Асинхронный вариант get_order_with_items"""
+    details = await get_orders_with_items_async(db, [order_id])
+    return details[0] if details else None
+
+def order_response(details: dict) -> dict:
+    """Заказ по схеме Order: поля заказа и items"""
+    return {**details["order"], "items": details["items"]}
\ No newline at end of file
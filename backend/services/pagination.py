@@ -0,0 +1,74 @@
+"""
+Курсорная (keyset) пагинация.
+
+Вместо offset(skip) клиент передает непрозрачный курсор с ключом последней
+полученной строки, и следующая страница выбирается условием по индексу.
+Поэтому страница 10 000 стоит столько же, сколько первая.
+"""
+import base64
+import json
+import math
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence
+
+# Заголовок, в котором роутеры возвращают курсор следующей страницы
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursorError(ValueError):
+    """Курсор поврежден или относится к другому списку"""
+
+
+def _encode_value(value: Any):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any):
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(*values) -> str:
+    """Упаковка значений ключа сортировки в непрозрачную строку"""
+    raw = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _valid_value(value: Any, value_type: type) -> bool:
+    # bool - подкласс int, но в ключе сортировки его не бывает
+    if isinstance(value, bool):
+        return False
+    if value_type is float:
+        return isinstance(value, (int, float)) and math.isfinite(value)
+    return isinstance(value, value_type)
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> List[Any]:
+    """
+    Распаковка курсора с ключом сортировки из значений типов types
+    (int, float или datetime); InvalidCursorError, если курсор поврежден.
+
+    Типы проверяются до SQL: иначе подделанный курсор со строкой или
+    объектом на месте числа дошел бы до сравнения в базе.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise InvalidCursorError("Некорректный курсор")
+        values = [_decode_value(value) for value in values]
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursorError("Некорректный курсор") from e
+    if not all(_valid_value(value, value_type) for value, value_type in zip(values, types)):
+        raise InvalidCursorError("Некорректный курсор")
+    return values
+
+
+def next_cursor(items: Sequence[Any], limit: int, key: Callable[[Any], Sequence[Any]]) -> Optional[str]:
+    """Курсор следующей страницы или None, если страница была последней"""
+    if not items or len(items) < limit:
+        return None
+    return encode_cursor(*key(items[-1]))
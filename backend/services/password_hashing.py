@@ -0,0 +1,142 @@
+"""
+Хеширование и проверка паролей (bcrypt) в отдельном ограниченном пуле потоков.
+
+bcrypt специально медленный: проверка пароля занимает сотни миллисекунд
+процессора. Вызванный в async-обработчике, он останавливает цикл событий
+и все запросы процесса; вызванный в синхронных обработчиках, он при
+всплеске входов занимает все ядра. Поэтому все операции с паролями
+выполняются в пуле из PASSWORD_HASH_WORKERS потоков: bcrypt отпускает
+GIL, цикл событий работает во время хеширования, а bcrypt занимает не
+больше ядер, чем потоков в пуле.
+
+Очередь к пулу ограничена PASSWORD_HASH_QUEUE операциями: сверх нее
+вызов сразу получает PasswordHashingBusyError (503), а не ждет в очереди
+дольше, чем клиент готов ждать ответ.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from passlib.context import CryptContext
+
+from config import PASSWORD_HASH_QUEUE, PASSWORD_HASH_WORKERS
+from pool_metrics import WAIT_BUCKETS_MS
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_QUEUE)
+
+
+class PasswordHashingBusyError(RuntimeError):
+    """Очередь операций с паролями заполнена"""
+
+
+class Latency:
+    """Число, среднее, максимум и накопительная гистограмма длительностей, мс"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def observe(self, ms: float):
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.buckets[next((i for i, edge in enumerate(WAIT_BUCKETS_MS) if ms <= edge), len(WAIT_BUCKETS_MS))] += 1
+
+    def snapshot(self) -> dict:
+        cumulative, total = {}, 0
+        for edge, count in zip([*WAIT_BUCKETS_MS, "+Inf"], self.buckets):
+            total += count
+            cumulative[str(edge)] = total
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "buckets_ms": cumulative,
+        }
+
+
+class HashingMetrics:
+    """Очередь и длительности операций пула"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.running = 0
+        self.rejected = 0
+        self.wait = Latency()
+        # операция (hash, verify) -> время выполнения bcrypt
+        self.durations = {"hash": Latency(), "verify": Latency()}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "workers": PASSWORD_HASH_WORKERS,
+                "max_queue": PASSWORD_HASH_QUEUE,
+                # Глубина очереди: операции, которые ждут свободного потока
+                "waiting": self.waiting,
+                "running": self.running,
+                "rejected": self.rejected,
+                "wait": self.wait.snapshot(),
+                **{operation: latency.snapshot() for operation, latency in self.durations.items()},
+            }
+
+
+metrics = HashingMetrics()
+
+
+def _submit(operation: str, func: Callable, *args) -> Future:
+    if not _slots.acquire(blocking=False):
+        with metrics._lock:
+            metrics.rejected += 1
+        raise PasswordHashingBusyError("Сервер перегружен, попробуйте позже")
+    queued_at = time.perf_counter()
+    with metrics._lock:
+        metrics.waiting += 1
+
+    def run():
+        started = time.perf_counter()
+        with metrics._lock:
+            metrics.waiting -= 1
+            metrics.running += 1
+            metrics.wait.observe((started - queued_at) * 1000)
+        try:
+            return func(*args)
+        finally:
+            with metrics._lock:
+                metrics.running -= 1
+                metrics.durations[operation].observe((time.perf_counter() - started) * 1000)
+            _slots.release()
+
+    return _executor.submit(run)
+
+
+def hash_password(password: str) -> str:
+    """Хеш пароля (вызывающий поток ждет пул)"""
+    return _submit("hash", pwd_context.hash, password).result()
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Проверка пароля (вызывающий поток ждет пул)"""
+    return _submit("verify", pwd_context.verify, plain_password, hashed_password).result()
+
+
+async def hash_password_async(password: str) -> str:
+    """Хеш пароля без блокировки цикла событий"""
+    return await asyncio.wrap_future(_submit("hash", pwd_context.hash, password))
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Проверка пароля без блокировки цикла событий"""
+    return await asyncio.wrap_future(_submit("verify", pwd_context.verify, plain_password, hashed_password))
+
+
+def stats() -> dict:
+    """Метрики пула для /api/metrics"""
+    return metrics.snapshot()
@@ -1,21 +1,324 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
+import time
+from datetime import datetime
+
+from pydantic import ValidationError
+from sqlalchemy import Numeric, cast, func, literal, select, text, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from config import CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL
 from models.product import Product
-from schemas.product import ProductCreate, ProductUpdate
+from models.review import Review
+from models.revision import Revision
+from replicas import READ_SOURCE, SOURCE_PINNED, SOURCE_REPLICA
+from schemas.product import (
+    Product as ProductSchema, LeaderboardProduct, ProductBulkChanges, ProductCreate, ProductFields,
+    ProductFilter, ProductInDB, ProductUpdate, ProductUpsert, ReviewInDB
+)
+from services.cache import LRUCache, VersionCounter
+from services.dialects import dialect_insert, dialect_name
+from services.pagination import decode_cursor, next_cursor
+import services.events as events
+import services.facet_service as facet_service
+import services.rating_service as rating_service
+import services.search_service as search_service
+
+# Версия каталога: увеличивается после каждой записи, и записи кеша,
+# прочитанные при старой версии, больше не выдаются
+catalog_version = VersionCounter()
+# Наибольшая ревизия каталога в базе, известная процессу (по своим записям,
+# событиям других процессов и прочитанным данным); ниже нее данные реплики
+# считаются отставшими
+known_catalog_revision = VersionCounter()
+product_cache = LRUCache("products", maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+listing_cache = LRUCache("listings", maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+search_cache = LRUCache("search", maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+
+# Сколько последних отзывов отдается вместе с карточкой товара
+PRODUCT_PAGE_REVIEWS = 20
+# Предел строк в одном запросе массовой загрузки
+BULK_MAX_ITEMS = 10000
+# Колонки, которые массовая загрузка перезаписывает у существующих товаров;
+# оценка не перезаписывается: она считается по отзывам
+UPSERT_COLUMNS = ("name", "price", "actual_price", "img", "category", "sizes", "description")
+# Сколько строк за раз читается из серверного курсора при потоковой выдаче
+STREAM_BATCH_ROWS = 500
+# Поля товара в списках без выборки полей
+LIST_FIELDS = tuple(ProductInDB.model_fields)
+# Поля карточки товара в сетке каталога (fields=summary)
+SUMMARY_FIELDS = ("id", "name", "price", "actual_price", "img", "category", "rating", "review_count")
+
+class InvalidFieldsError(ValueError):
+    """В параметре fields указаны неизвестные поля"""
+
+class EmptyBulkFilterError(ValueError):
+    """Фильтр массового изменения не ограничивает отбор: изменился бы весь каталог"""
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Разбор параметра fields: "summary" или список полей через запятую.
+
+    None - нужны все поля. id включается всегда: по нему строится курсор
+    и ссылка на карточку товара.
+    """
+    if not fields:
+        return None
+    if fields.strip() == "summary":
+        return SUMMARY_FIELDS
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names - set(ProductFields.model_fields)
+    if unknown:
+        raise InvalidFieldsError(f"Неизвестные поля: {', '.join(sorted(unknown))}")
+    return tuple(sorted(names | {"id"}))
+
+def _load_options(fields: Optional[Tuple[str, ...]], *required) -> list:
+    """
+    Загрузка из базы только выбранных колонок.
+
+    Остальные колонки не попадают в SELECT, а обращение к ним вызывает
+    ошибку вместо скрытого запроса на каждую строку.
+    """
+    if fields is None:
+        return []
+    columns = {getattr(Product, name) for name in fields} | set(required)
+    return [load_only(*columns, raiseload=True)]
+
+def _row_columns(fields: Optional[Tuple[str, ...]], *required) -> list:
+    """
+    Колонки строки списка: поля ответа, затем недостающие колонки курсора.
+
+    Список читается кортежами колонок, без создания ORM-объектов; колонки
+    курсора стоят в конце и в ответ не попадают (см. row_item).
+    """
+    names = fields or LIST_FIELDS
+    columns = [getattr(Product, name) for name in names]
+    return columns + [column for column in required if column.key not in names]
+
+def row_item(row, fields: Optional[Tuple[str, ...]] = None) -> dict:
+    """
+    Элемент ответа списка из строки запроса по колонкам _row_columns.
+
+    Строки из базы уже прошли проверку схемой при записи, поэтому словарь
+    собирается напрямую, без повторной валидации pydantic.
+    """
+    return dict(zip(fields or LIST_FIELDS, row))
+
+def list_item(product: Product, fields: Optional[Tuple[str, ...]] = None) -> dict:
+    """Элемент ответа списка из ORM-объекта товара (как row_item)"""
+    return {name: getattr(product, name) for name in fields or LIST_FIELDS}
+
+def _on_product_changed(product_id: Optional[int], version: Optional[int]):
+    """Сброс локального кеша по событию об изменении товара в другом процессе"""
+    if product_id is not None:
+        product_cache.invalidate(product_id)
+    # Списки и результаты поиска могут содержать товар: сбрасываем версию каталога
+    catalog_version.bump()
+
+def _on_catalog_changed(_: Optional[int], revision: Optional[int]):
+    """Ревизия каталога после записи в другом процессе"""
+    if revision is not None:
+        known_catalog_revision.advance_to(revision)
+
+events.subscribe("product", _on_product_changed)
+events.subscribe("catalog", _on_catalog_changed)
+
+# Ревизия каталога в базе, общая для всех процессов; из нее строятся ETag списков
+CATALOG_REVISION = "catalog"
+_catalog_revision = select(Revision.value).where(Revision.name == CATALOG_REVISION)
+
+def bump_catalog_revision(db: Session) -> int:
+    """
+    Увеличение ревизии каталога в текущей транзакции; возвращает новую ревизию.
+
+    Ревизия сразу становится известной процессу (known_catalog_revision) и
+    публикуется событием для других процессов. Событие публикуется раньше
+    события товара, поэтому процесс узнает новую ревизию до того, как
+    сбросит версию каталога. Если транзакция откатится, известная ревизия
+    окажется выше настоящей: чтения с реплики перестанут кешироваться до
+    следующей записи, но устаревшие данные в кеш не попадут.
+    """
+    result = db.execute(
+        update(Revision).where(Revision.name == CATALOG_REVISION).values(value=Revision.value + 1)
+    )
+    if result.rowcount == 0:
+        db.add(Revision(name=CATALOG_REVISION, value=1))
+        db.flush()
+        revision = 1
+    else:
+        revision = db.scalar(_catalog_revision)
+    known_catalog_revision.advance_to(revision)
+    events.publish(db, "catalog", None, revision)
+    return revision
+
+def get_catalog_revision(db: Session) -> int:
+    """Текущая ревизия каталога"""
+    return db.scalar(_catalog_revision) or 0
+
+async def get_catalog_revision_async(db: AsyncSession) -> int:
+    """Асинхронный вариант get_catalog_revision"""
+    return (await db.scalar(_catalog_revision)) or 0
+
+def _bump_version(db: Session, db_product: Product):
+    """Увеличение версии строки товара"""
+    db_product.version = Product.version + 1
+    db.flush()
 
-def get_products(db: Session, skip: int = 0, limit: int = 100, category: Optional[str] = None):
-    """Получение списка товаров с возможностью фильтрации по категории"""
-    query = db.query(Product)
-    if category and category != "All":
-        query = query.filter(Product.category == category)
-    return query.offset(skip).limit(limit).all()
+def _record_change(db: Session, product_id: int, version: Optional[int] = None):
+    """Ревизия каталога и событие об изменении товара в текущей транзакции"""
+    bump_catalog_revision(db)
+    events.publish(db, "product", product_id, version)
+
+def _record_bulk_change(db: Session):
+    """Одна ревизия каталога и одно событие на весь пакет изменений"""
+    bump_catalog_revision(db)
+    events.publish(db, "product", None)
+
+def _after_bulk_change():
+    # Версия каталога сбрасывает сразу все записи кеша, а не по одному товару
+    search_service.reset_index()
+    catalog_version.bump()
+
+def _products_statement(
+    dialect: str,
+    skip: int = 0,
+    limit: int = 100,
+    category: Optional[str] = None,
+    after: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sizes: Optional[List[str]] = None,
+    min_rating: Optional[float] = None,
+    sort: str = facet_service.DEFAULT_SORT,
+    fields: Optional[Tuple[str, ...]] = None,
+    rows: bool = False
+):
+    """
+    SELECT страницы товаров с фильтрами, сортировкой и условием курсора.
+
+    Общий для синхронных и асинхронных функций. rows=True - строки из
+    колонок _row_columns вместо ORM-объектов.
+    """
+    conditions = facet_service.filter_conditions(
+        dialect, category=category, min_price=min_price, max_price=max_price,
+        sizes=sizes, min_rating=min_rating
+    )
+    column, descending = facet_service.SORT_OPTIONS[sort]
+    if rows:
+        statement = select(*_row_columns(fields, Product.id, column))
+    else:
+        statement = select(Product).options(*_load_options(fields, Product.id, column))
+    statement = statement.where(*conditions.values())
+
+    if column is Product.id:
+        statement = statement.order_by(Product.id.desc() if descending else Product.id)
+        # С курсором страница выбирается по индексу, без пропуска строк
+        if after:
+            (last_id,) = decode_cursor(after, (int,))
+            statement = statement.where(Product.id < last_id if descending else Product.id > last_id)
+    else:
+        # Сортировка по значению с id для однозначного порядка; ключ курсора - пара (значение, id)
+        if descending:
+            statement = statement.order_by(column.desc(), Product.id.desc())
+        else:
+            statement = statement.order_by(column, Product.id)
+        if after:
+            last_value, last_id = decode_cursor(after, (float, int))
+            key = tuple_(column, Product.id)
+            statement = statement.where(
+                key < tuple_(last_value, last_id) if descending else key > tuple_(last_value, last_id)
+            )
+
+    # skip учитывается только без курсора
+    if not after:
+        statement = statement.offset(skip)
+    return statement.limit(limit)
+
+def _page_end_statement(dialect: str, skip: int = 0, limit: int = 100, after: Optional[str] = None, **filters):
+    """SELECT ключа последней строки страницы (для курсора потокового ответа)"""
+    statement = _products_statement(dialect, after=after, fields=("id",), rows=True, **filters)
+    # skip учитывается только без курсора, как и в самой странице
+    return statement.offset((0 if after else skip) + limit - 1).limit(1)
+
+def _stream_statement(statement):
+    # Серверный курсор: строки читаются пачками, а не загружаются все сразу
+    return statement.execution_options(yield_per=STREAM_BATCH_ROWS)
+
+def get_products(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    category: Optional[str] = None,
+    after: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sizes: Optional[List[str]] = None,
+    min_rating: Optional[float] = None,
+    sort: str = facet_service.DEFAULT_SORT,
+    fields: Optional[Tuple[str, ...]] = None
+):
+    """
+    Получение списка товаров с фильтрами по фасетам и сортировкой.
+
+    fields - колонки для загрузки (см. parse_fields); колонка сортировки
+    загружается всегда, она нужна для курсора.
+    """
+    return db.scalars(_products_statement(
+        dialect_name(db), skip=skip, limit=limit, category=category, after=after, min_price=min_price,
+        max_price=max_price, sizes=sizes, min_rating=min_rating, sort=sort, fields=fields
+    )).all()
+
+async def iter_product_batches_async(
+    db: AsyncSession,
+    fields: Optional[Tuple[str, ...]] = None,
+    **filters
+) -> AsyncIterator[List[dict]]:
+    """
+    Страница товаров пачками словарей по мере чтения из серверного курсора.
+
+    filters - как у get_products. Для больших страниц: в памяти одновременно
+    не больше STREAM_BATCH_ROWS строк.
+    """
+    statement = _products_statement(dialect_name(db), fields=fields, rows=True, **filters)
+    result = await db.stream(_stream_statement(statement))
+    # Пачками, а не по строке: каждая итерация async for проходит через цикл событий
+    async for rows in result.partitions(STREAM_BATCH_ROWS):
+        yield [row_item(row, fields) for row in rows]
+
+async def products_page_cursor_async(db: AsyncSession, sort: str = facet_service.DEFAULT_SORT, **filters) -> Optional[str]:
+    """
+    Курсор следующей страницы без загрузки самой страницы.
+
+    Потоковый ответ отдает заголовки до строк, поэтому ключ последней
+    строки страницы читается заранее отдельным запросом по индексу.
+    """
+    last = (await db.execute(_page_end_statement(dialect_name(db), sort=sort, **filters))).first()
+    return products_next_cursor([last], 1, sort=sort) if last else None
+
+def products_next_cursor(products: List[Product], limit: int, sort: str = facet_service.DEFAULT_SORT) -> Optional[str]:
+    """Курсор следующей страницы списка товаров"""
+    column, _ = facet_service.SORT_OPTIONS[sort]
+    if column is Product.id:
+        return next_cursor(products, limit, key=lambda product: (product.id,))
+    return next_cursor(products, limit, key=lambda product: (getattr(product, column.key), product.id))
 
 def get_product(db: Session, product_id: int):
     """Получение товара по ID"""
     return db.query(Product).filter(Product.id == product_id).first()
 
+def get_product_version(db: Session, product_id: int) -> Optional[int]:
+    """Версия строки товара без загрузки самого товара"""
+    return db.scalar(select(Product.version).where(Product.id == product_id))
+
+async def get_product_version_async(db: AsyncSession, product_id: int) -> Optional[int]:
+    """Асинхронный вариант get_product_version"""
+    return await db.scalar(select(Product.version).where(Product.id == product_id))
+
 def create_product(db: Session, product: ProductCreate):
     """Создание нового товара"""
+    values = rating_service.aggregate_values(review.rating for review in product.reviews)
+    # Средняя оценка начальных отзывов важнее переданной, если она есть
+    values.setdefault("rating", product.rating)
     db_product = Product(
         name=product.name,
         price=product.price,
@@ -23,13 +326,24 @@ def create_product(db: Session, product: ProductCreate):
         img=product.img,
         category=product.category,
         sizes=product.sizes,
-        rating=product.rating,
-        reviews=[review.dict() for review in product.reviews],
-        description=product.description
+        reviews=[
+            Review(user=review.user, review=review.review, rating=review.rating)
+            for review in product.reviews
+        ],
+        description=product.description,
+        **values
     )
     db.add(db_product)
+    db.flush()
+    rating_service.refresh_product(
+        db, db_product.id, db_product.category,
+        db_product.review_count, db_product.rating_count, db_product.rating_sum
+    )
+    _record_change(db, db_product.id, db_product.version)
     db.commit()
     db.refresh(db_product)
+    search_service.index_product(db_product, [review.review for review in product.reviews])
+    catalog_version.bump()
     return db_product
 
 def update_product(db: Session, product_id: int, product: ProductUpdate):
@@ -42,12 +356,16 @@ def update_product(db: Session, product_id: int, product: ProductUpdate):
     
     # Обновляем поля объекта
     for key, value in update_data.items():
-        if key == "reviews" and value is not None:
-            value = [review.dict() for review in value]
         setattr(db_product, key, value)
     
+    _bump_version(db, db_product)
+    if "category" in update_data:
+        rating_service.move_product(db, db_product)
+    _record_change(db, db_product.id, db_product.version)
     db.commit()
     db.refresh(db_product)
+    search_service.index_product(db_product)
+    catalog_version.bump()
     return db_product
 
 def delete_product(db: Session, product_id: int):
@@ -56,29 +374,432 @@ def delete_product(db: Session, product_id: int):
     if not db_product:
         return False
     
+    rating_service.remove_product(db, product_id)
     db.delete(db_product)
+    _record_change(db, product_id)
     db.commit()
+    search_service.remove_product(product_id)
+    catalog_version.bump()
     return True
 
-def search_products(db: Session, query: str, skip: int = 0, limit: int = 100):
-    """Поиск товаров по названию"""
-    search = f"%{query}%"
-    return db.query(Product).filter(Product.name.ilike(search)).offset(skip).limit(limit).all()
+def _row_errors(error: ValidationError) -> List[Dict[str, Any]]:
+    return [{"loc": list(item["loc"]), "msg": item["msg"], "type": item["type"]} for item in error.errors()]
+
+def sync_id_sequence(db: Session, at_least: int = 1):
+    """
+    Сдвиг последовательности id после вставки строк с явными id.
+
+    at_least - наибольший явный id, который еще будет вставлен (например,
+    в пачке импорта): nextval не выдаст его другому товару.
+    """
+    db.execute(text(
+        "SELECT setval(pg_get_serial_sequence('products', 'id'), GREATEST("
+        "(SELECT COALESCE(MAX(id), 1) FROM products), "
+        "COALESCE(pg_sequence_last_value(pg_get_serial_sequence('products', 'id')::regclass), 1), "
+        ":at_least))"
+    ), {"at_least": at_least})
+
+def bulk_upsert_products(db: Session, items: List[Dict[str, Any]]) -> dict:
+    """
+    Массовая загрузка товаров: строки с id вставляются или обновляются
+    (INSERT ... ON CONFLICT), строки без id добавляются как новые товары.
+    Некорректные строки пропускаются и возвращаются в errors с номером.
+    """
+    started = time.perf_counter()
+    errors = []
+    keyed_rows: Dict[int, dict] = {}
+    new_rows = []
+    for index, item in enumerate(items):
+        try:
+            product = ProductUpsert.model_validate(item)
+        except ValidationError as e:
+            errors.append({"index": index, "errors": _row_errors(e)})
+            continue
+        values = product.model_dump(exclude={"id"})
+        if values["rating"] is None:
+            values["rating"] = 0.0
+        if product.id is None:
+            new_rows.append(values)
+        elif product.id in keyed_rows:
+            errors.append({
+                "index": index,
+                "errors": [{"loc": ["id"], "msg": "Товар с этим id уже есть в пакете", "type": "duplicate"}],
+            })
+        else:
+            keyed_rows[product.id] = {"id": product.id, **values}
+
+    inserted = updated = 0
+    if keyed_rows or new_rows:
+        insert = dialect_insert(db)
+        if keyed_rows:
+            ids = list(keyed_rows)
+            existing = {product_id for (product_id,) in db.query(Product.id).filter(Product.id.in_(ids))}
+            statement = insert(Product)
+            statement = statement.on_conflict_do_update(
+                index_elements=[Product.id],
+                set_={
+                    **{column: statement.excluded[column] for column in UPSERT_COLUMNS},
+                    "version": Product.version + 1,
+                }
+            )
+            # executemany: SQLAlchemy собирает строки в многострочные INSERT
+            db.execute(statement, list(keyed_rows.values()))
+            updated = len(existing)
+            inserted += len(ids) - updated
+            if existing:
+                rating_service.sync_categories(db, list(existing))
+            if inserted and db.get_bind().dialect.name == "postgresql":
+                sync_id_sequence(db)
+        if new_rows:
+            db.execute(insert(Product), new_rows)
+            inserted += len(new_rows)
+        _record_bulk_change(db)
+        db.commit()
+        _after_bulk_change()
+
+    return {
+        "affected": inserted + updated,
+        "inserted": inserted,
+        "updated": updated,
+        "errors": errors,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+def _price_label(db: Session, value):
+    """Строковая цена вида $79.20 из числовой"""
+    if db.get_bind().dialect.name == "postgresql":
+        return literal("$") + func.to_char(value, "FM999999990.00")
+    return func.printf("$%.2f", value)
 
-def add_review(db: Session, product_id: int, user: str, review_text: str):
-    """Добавление отзыва к товару"""
+def bulk_update_products(db: Session, product_filter: ProductFilter, changes: ProductBulkChanges) -> dict:
+    """
+    Изменение цены и атрибутов всех отобранных товаров одним UPDATE.
+
+    Фильтр без действующих условий (пустой, category="All", sizes=[]) -
+    EmptyBulkFilterError: проверяются условия после разбора фильтра, а не
+    переданные поля.
+    """
+    started = time.perf_counter()
+    filters = product_filter.model_dump(exclude={"ids"})
+    conditions = list(facet_service.filter_conditions(db.get_bind().dialect.name, **filters).values())
+    if product_filter.ids is not None:
+        conditions.append(Product.id.in_(product_filter.ids))
+    if not conditions:
+        raise EmptyBulkFilterError("Укажите условие отбора товаров")
+
+    values = {"version": Product.version + 1}
+    if changes.price_multiplier is not None:
+        new_price = func.round(cast(Product.actual_price * changes.price_multiplier, Numeric), 2)
+        values["actual_price"] = new_price
+        values["price"] = _price_label(db, new_price)
+    for column in ("category", "sizes", "description"):
+        value = getattr(changes, column)
+        if value is not None:
+            values[column] = value
+
+    product_ids = db.execute(
+        update(Product)
+        .where(*conditions)
+        .values(**values)
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    if product_ids:
+        if changes.category is not None:
+            rating_service.sync_categories(db, product_ids)
+        _record_bulk_change(db)
+    db.commit()
+    if product_ids:
+        _after_bulk_change()
+
+    return {
+        "affected": len(product_ids),
+        "updated": len(product_ids),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+def search_products(
+    db: Session,
+    query: str,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    fields: Optional[Tuple[str, ...]] = None
+) -> Tuple[List[Product], Optional[str]]:
+    """Поиск товаров по названию, категории, описанию и отзывам с ранжированием"""
+    results = search_service.search(
+        db,
+        query,
+        skip=skip,
+        limit=limit,
+        after=tuple(decode_cursor(after, (float, int))) if after else None,
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        options=_load_options(fields, Product.id)
+    )
+    # Курсор поиска - пара (релевантность, id) последнего товара
+    cursor = next_cursor(results, limit, key=lambda result: (result[1], result[0].id))
+    return [product for product, _ in results], cursor
+
+def add_review(
+    db: Session,
+    product_id: int,
+    user: str,
+    review_text: str,
+    rating: Optional[int] = None
+) -> Optional[Review]:
+    """Добавление отзыва к товару: одна вставка, без перезаписи товара"""
+    # Версия товара растет вместе с отзывом (в карточке есть последние отзывы),
+    # тем же UPDATE обновляются агрегаты оценок; заодно он проверяет, что товар существует
+    version = rating_service.record_review(db, product_id, rating)
+    if version is None:
+        db.rollback()
+        return None
+
+    db_review = Review(product_id=product_id, user=user, review=review_text, rating=rating)
+    db.add(db_review)
+    db.flush()
+    _record_change(db, product_id, version)
+    db.commit()
+    db.refresh(db_review)
+    search_service.index_review(product_id, review_text)
+    catalog_version.bump()
+    return db_review
+
+def _reviews_statement(product_id: int, limit: int, after: Optional[str]):
+    statement = (
+        select(Review)
+        .where(Review.product_id == product_id)
+        .order_by(Review.created_at.desc(), Review.id.desc())
+    )
+    if after:
+        last_created_at, last_id = decode_cursor(after, (datetime, int))
+        statement = statement.where(tuple_(Review.created_at, Review.id) < tuple_(last_created_at, last_id))
+    return statement.limit(limit)
+
+def get_reviews(db: Session, product_id: int, limit: int = 20, after: Optional[str] = None) -> List[Review]:
+    """Страница отзывов товара от новых к старым"""
+    return db.scalars(_reviews_statement(product_id, limit, after)).all()
+
+def reviews_next_cursor(reviews: List[Review], limit: int) -> Optional[str]:
+    """Курсор следующей страницы отзывов"""
+    return next_cursor(reviews, limit, key=lambda review: (review.created_at, review.id))
+
+def _product_detail(db_product: Product, reviews: List[Review]) -> ProductSchema:
+    return ProductSchema(
+        **ProductInDB.model_validate(db_product, from_attributes=True).model_dump(),
+        rating_distribution=rating_service.rating_distribution(db_product),
+        reviews=[ReviewInDB.model_validate(review, from_attributes=True) for review in reviews]
+    )
+
+def get_product_detail(db: Session, product_id: int) -> Optional[ProductSchema]:
+    """Карточка товара с последними отзывами"""
     db_product = get_product(db, product_id)
     if not db_product:
         return None
-    
-    new_review = {"user": user, "review": review_text}
-    
-    # Добавляем новый отзыв и обновляем товар
-    if db_product.reviews:
-        db_product.reviews.append(new_review)
-    else:
-        db_product.reviews = [new_review]
-    
-    db.commit()
-    db.refresh(db_product)
-    return db_product
\ No newline at end of file
+    return _product_detail(db_product, get_reviews(db, product_id, limit=PRODUCT_PAGE_REVIEWS))
+
+async def get_product_detail_async(db: AsyncSession, product_id: int) -> Optional[ProductSchema]:
+    """Асинхронный вариант get_product_detail"""
+    db_product = await db.get(Product, product_id)
+    if not db_product:
+        return None
+    reviews = (await db.scalars(_reviews_statement(product_id, PRODUCT_PAGE_REVIEWS, None))).all()
+    return _product_detail(db_product, reviews)
+
+def _cached(cache: LRUCache, key: Hashable, db: Session, load: Callable[[], Tuple[Any, int]]) -> Any:
+    """
+    Значение из кеша каталога или load() -> (значение, ревизия каталога, прочитанная до данных).
+
+    Клиент, закрепленный за основной базой после записи, читает мимо кеша:
+    событие о его записи могло еще не дойти до этого процесса. Прочитанное
+    с реплики сохраняется, только если ее ревизия не старше известной
+    процессу ревизии (known_catalog_revision): иначе данные до записи
+    попали бы в кеш под версией каталога после записи. Запроса к основной
+    базе при промахе нет.
+    """
+    source = db.info.get(READ_SOURCE)
+    if source == SOURCE_PINNED:
+        return load()[0]
+
+    def loader():
+        # Граница берется после версии каталога (ее читает get_or_load)
+        floor = known_catalog_revision.current if source == SOURCE_REPLICA else 0
+        value, revision = load()
+        known_catalog_revision.advance_to(revision)
+        return value, revision >= floor
+
+    return cache.get_or_load(key, catalog_version.current, loader, keep=lambda entry: entry[1])[0]
+
+async def _cached_async(
+    cache: LRUCache, key: Hashable, db: AsyncSession, load: Callable[[], Awaitable[Tuple[Any, int]]]
+) -> Any:
+    """Асинхронный вариант _cached (общие записи кеша с синхронным)"""
+    source = db.info.get(READ_SOURCE)
+    if source == SOURCE_PINNED:
+        return (await load())[0]
+
+    async def loader():
+        floor = known_catalog_revision.current if source == SOURCE_REPLICA else 0
+        value, revision = await load()
+        known_catalog_revision.advance_to(revision)
+        return value, revision >= floor
+
+    return (await cache.get_or_load_async(key, catalog_version.current, loader, keep=lambda entry: entry[1]))[0]
+
+def get_product_cached(db: Session, product_id: int) -> Optional[ProductSchema]:
+    """Получение карточки товара по ID через кеш каталога"""
+    def load():
+        revision = get_catalog_revision(db)
+        return get_product_detail(db, product_id), revision
+
+    return _cached(product_cache, product_id, db, load)
+
+async def get_product_cached_async(db: AsyncSession, product_id: int) -> Optional[ProductSchema]:
+    """Асинхронный вариант get_product_cached (общий кеш с синхронным)"""
+    async def load():
+        revision = await get_catalog_revision_async(db)
+        return await get_product_detail_async(db, product_id), revision
+
+    return await _cached_async(product_cache, product_id, db, load)
+
+def _listing_key(
+    skip: int = 0,
+    limit: int = 100,
+    category: Optional[str] = None,
+    after: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sizes: Optional[List[str]] = None,
+    min_rating: Optional[float] = None,
+    sort: str = facet_service.DEFAULT_SORT,
+    fields: Optional[Tuple[str, ...]] = None
+) -> tuple:
+    return (
+        category or "All", skip, limit, after, min_price, max_price,
+        tuple(sorted(sizes)) if sizes else None, min_rating, sort, fields
+    )
+
+def _listing(rows: list, limit: int, sort: str, fields: Optional[Tuple[str, ...]], revision: int):
+    cursor = products_next_cursor(rows, limit, sort=sort)
+    return [row_item(row, fields) for row in rows], cursor, revision
+
+def get_products_cached(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    category: Optional[str] = None,
+    after: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sizes: Optional[List[str]] = None,
+    min_rating: Optional[float] = None,
+    sort: str = facet_service.DEFAULT_SORT,
+    fields: Optional[Tuple[str, ...]] = None
+) -> Tuple[List[dict], Optional[str], int]:
+    """Страница товаров, курсор следующей страницы и ревизия каталога через кеш"""
+    filters = dict(
+        skip=skip, limit=limit, category=category, after=after, min_price=min_price,
+        max_price=max_price, sizes=sizes, min_rating=min_rating, sort=sort
+    )
+
+    def load():
+        # Ревизию читаем до данных: данные не могут оказаться старше ревизии
+        revision = get_catalog_revision(db)
+        rows = db.execute(_products_statement(dialect_name(db), fields=fields, rows=True, **filters)).all()
+        return _listing(rows, limit, sort, fields, revision), revision
+
+    return _cached(listing_cache, _listing_key(fields=fields, **filters), db, load)
+
+async def get_products_cached_async(
+    db: AsyncSession,
+    limit: int = 100,
+    sort: str = facet_service.DEFAULT_SORT,
+    fields: Optional[Tuple[str, ...]] = None,
+    **filters
+) -> Tuple[List[dict], Optional[str], int]:
+    """Асинхронный вариант get_products_cached (filters - как у get_products)"""
+    async def load():
+        revision = await get_catalog_revision_async(db)
+        statement = _products_statement(
+            dialect_name(db), limit=limit, sort=sort, fields=fields, rows=True, **filters
+        )
+        rows = (await db.execute(statement)).all()
+        return _listing(rows, limit, sort, fields, revision), revision
+
+    key = _listing_key(limit=limit, sort=sort, fields=fields, **filters)
+    return await _cached_async(listing_cache, key, db, load)
+
+def get_facets_cached(
+    db: Session,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sizes: Optional[List[str]] = None,
+    min_rating: Optional[float] = None
+) -> Tuple[dict, int]:
+    """Счетчики фасетов и ревизия каталога через кеш"""
+    def load():
+        revision = get_catalog_revision(db)
+        facets = facet_service.get_facets(
+            db, category=category, min_price=min_price, max_price=max_price,
+            sizes=sizes, min_rating=min_rating
+        )
+        return (facets, revision), revision
+
+    key = ("facets", category or "All", min_price, max_price, tuple(sorted(sizes)) if sizes else None, min_rating)
+    return _cached(listing_cache, key, db, load)
+
+def search_products_cached(
+    db: Session,
+    query: str,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    fields: Optional[Tuple[str, ...]] = None
+) -> Tuple[List[dict], Optional[str], int]:
+    """Поиск товаров через кеш каталога; возвращает также ревизию каталога"""
+    def load():
+        revision = get_catalog_revision(db)
+        products, cursor = search_products(
+            db, query, skip=skip, limit=limit, after=after,
+            category=category, min_price=min_price, max_price=max_price, fields=fields
+        )
+        return ([list_item(product, fields) for product in products], cursor, revision), revision
+
+    key = (query.strip().lower(), skip, limit, after, category or "All", min_price, max_price, fields)
+    return _cached(search_cache, key, db, load)
+
+def get_leaderboard_cached(
+    db: Session,
+    board: str,
+    category: Optional[str] = None,
+    limit: int = rating_service.LEADERBOARD_SIZE
+) -> Tuple[List[LeaderboardProduct], int]:
+    """Рейтинг товаров и ревизия каталога через кеш"""
+    def load():
+        revision = get_catalog_revision(db)
+        items = [
+            LeaderboardProduct(**ProductInDB.model_validate(product, from_attributes=True).model_dump(), score=score)
+            for product, score in rating_service.get_leaderboard(db, board, category=category, limit=limit)
+        ]
+        return (items, revision), revision
+
+    key = ("leaderboard", board, category or "All", limit)
+    return _cached(listing_cache, key, db, load)
+
+def cache_stats() -> dict:
+    """Статистика кеша каталога"""
+    return {
+        "version": catalog_version.current,
+        "products": product_cache.stats(),
+        "listings": listing_cache.stats(),
+        "search": search_cache.stats(),
+    }
\ No newline at end of file
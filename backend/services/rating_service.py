@@ -0,0 +1,373 @@
+"""
+Агрегаты оценок товаров и предрасчитанные рейтинги ("лучшие оценки",
+"больше всего отзывов").
+
+Счетчики отзывов и распределение оценок хранятся в строке товара и
+меняются тем же UPDATE, что и версия товара, при добавлении отзыва.
+Рейтинги хранятся в таблице leaderboard_entries, не больше
+LEADERBOARD_CAPACITY лучших записей на рейтинг. Отзыв пишет в рейтинг, только
+если счет товара меняется и товар уже в рейтинге или проходит в него, так что
+отзывы к товарам вне верхушки не блокируют записи общего рейтинга каталога.
+Все товары вне таблицы имеют счет не выше худшей записи; если товар из таблицы
+опускается ниже нее или удаляется, освободившиеся места добираются из
+агрегатов в строках товаров. Ни чтение рейтинга, ни добавление отзыва не
+сканируют таблицу reviews.
+"""
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.orm import Session
+
+from models.leaderboard import LeaderboardEntry
+from models.product import Product
+from models.review import Review
+from services.dialects import dialect_insert
+
+TOP_RATED = "top_rated"
+MOST_REVIEWED = "most_reviewed"
+LEADERBOARDS = (TOP_RATED, MOST_REVIEWED)
+# Категория записей рейтинга по всему каталогу
+ALL_CATEGORIES = ""
+
+# Сколько товаров отдается в рейтинге
+LEADERBOARD_SIZE = 50
+# Сколько хранится: запас на случай, когда оценка товара из верхней части падает
+LEADERBOARD_CAPACITY = LEADERBOARD_SIZE * 2
+
+# Байесовское среднее: товар с одной оценкой 5 не обгоняет товар с сотней оценок 4.8
+PRIOR_MEAN = 3.0
+PRIOR_WEIGHT = 5
+
+STAR_COLUMNS = {
+    1: Product.stars_1,
+    2: Product.stars_2,
+    3: Product.stars_3,
+    4: Product.stars_4,
+    5: Product.stars_5,
+}
+
+# Счет рейтинга в SQL по агрегатам товара и условие попадания в рейтинг
+SCORE_COLUMNS = {
+    MOST_REVIEWED: (Product.review_count, Product.review_count > 0),
+    TOP_RATED: (
+        (Product.rating_sum + PRIOR_MEAN * PRIOR_WEIGHT) * 1.0 / (Product.rating_count + PRIOR_WEIGHT),
+        Product.rating_count > 0
+    ),
+}
+
+
+def bayesian_score(rating_count: int, rating_sum: int) -> float:
+    """Сглаженная средняя оценка для сортировки рейтинга"""
+    return round((rating_sum + PRIOR_MEAN * PRIOR_WEIGHT) / (rating_count + PRIOR_WEIGHT), 6)
+
+
+def aggregate_values(ratings: Iterable[Optional[int]]) -> Dict[str, float]:
+    """Значения колонок агрегатов для нового товара с начальными отзывами"""
+    ratings = list(ratings)
+    rated = [rating for rating in ratings if rating is not None]
+    values = {
+        "review_count": len(ratings),
+        "rating_count": len(rated),
+        "rating_sum": sum(rated),
+    }
+    for star in STAR_COLUMNS:
+        values[f"stars_{star}"] = rated.count(star)
+    if rated:
+        values["rating"] = round(sum(rated) / len(rated), 2)
+    return values
+
+
+def rating_distribution(db_product) -> Dict[int, int]:
+    """Количество оценок по звездам"""
+    return {star: getattr(db_product, f"stars_{star}") for star in STAR_COLUMNS}
+
+
+def record_review(db: Session, product_id: int, rating: Optional[int] = None):
+    """
+    Учет нового отзыва в агрегатах товара и рейтингах (в текущей транзакции).
+
+    Возвращает новую версию товара или None, если товара нет.
+    """
+    values = {
+        "version": Product.version + 1,
+        "review_count": Product.review_count + 1,
+    }
+    if rating is not None:
+        # В SET используются значения строки до обновления
+        values["rating_count"] = Product.rating_count + 1
+        values["rating_sum"] = Product.rating_sum + rating
+        values["rating"] = func.round((Product.rating_sum + rating) * 1.0 / (Product.rating_count + 1), 2)
+        values[f"stars_{rating}"] = STAR_COLUMNS[rating] + 1
+
+    # UPDATE блокирует строку товара: параллельные отзывы к одному товару
+    # применяются по очереди и не теряют приращения
+    row = db.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(**values)
+        .returning(
+            Product.version, Product.category,
+            Product.review_count, Product.rating_count, Product.rating_sum
+        )
+    ).first()
+    if row is None:
+        return None
+
+    refresh_product(db, product_id, row.category, row.review_count, row.rating_count, row.rating_sum)
+    return row.version
+
+
+def _board(board: str, category: str):
+    return (LeaderboardEntry.board == board, LeaderboardEntry.category == category)
+
+
+def _ranks_above(score: float, product_id: int, other_score: float, other_id: int) -> bool:
+    """Порядок рейтинга: счет по убыванию, при равенстве - id по возрастанию"""
+    return score > other_score or (score == other_score and product_id < other_id)
+
+
+def _upsert_entry(db: Session, board: str, category: str, product_id: int, score: float):
+    insert = dialect_insert(db)
+    statement = insert(LeaderboardEntry).values(
+        board=board, category=category, product_id=product_id, score=score
+    )
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[LeaderboardEntry.board, LeaderboardEntry.category, LeaderboardEntry.product_id],
+        set_={"score": statement.excluded.score}
+    ))
+
+
+def _trim(db: Session, board: str, category: str):
+    """Удаление записей за пределами LEADERBOARD_CAPACITY лучших"""
+    keep = (
+        select(LeaderboardEntry.product_id)
+        .where(*_board(board, category))
+        .order_by(LeaderboardEntry.score.desc(), LeaderboardEntry.product_id)
+        .limit(LEADERBOARD_CAPACITY)
+    )
+    db.execute(
+        delete(LeaderboardEntry)
+        .where(*_board(board, category), LeaderboardEntry.product_id.not_in(keep.scalar_subquery()))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _top_products(db: Session, board: str, category: str, limit: int, exclude=None) -> List[dict]:
+    """Лучшие по агрегатам товары рейтинга в виде строк leaderboard_entries"""
+    score, condition = SCORE_COLUMNS[board]
+    query = db.query(Product.id, Product.review_count, Product.rating_count, Product.rating_sum).filter(condition)
+    if category != ALL_CATEGORIES:
+        query = query.filter(Product.category == category)
+    if exclude is not None:
+        query = query.filter(Product.id.not_in(exclude))
+    top = query.order_by(score.desc(), Product.id).limit(limit).all()
+    return [
+        {
+            "board": board,
+            "category": category,
+            "product_id": product_id,
+            "score": _scores(review_count, rating_count, rating_sum)[board],
+        }
+        for product_id, review_count, rating_count, rating_sum in top
+    ]
+
+
+def _refill(db: Session, board: str, category: str):
+    """Дополнение рейтинга до LEADERBOARD_CAPACITY записей из агрегатов товаров"""
+    stored = db.execute(select(func.count()).where(*_board(board, category))).scalar()
+    missing = LEADERBOARD_CAPACITY - stored
+    if missing <= 0:
+        return
+    present = select(LeaderboardEntry.product_id).where(*_board(board, category)).scalar_subquery()
+    entries = _top_products(db, board, category, missing, exclude=present)
+    if entries:
+        # Место мог уже занять параллельный отзыв
+        insert = dialect_insert(db)
+        db.execute(insert(LeaderboardEntry).values(entries).on_conflict_do_nothing())
+
+
+def _place(db: Session, board: str, category: str, product_id: int, score: float):
+    """Запись нового счета товара в один рейтинг"""
+    current = db.execute(
+        select(LeaderboardEntry.score)
+        .where(*_board(board, category), LeaderboardEntry.product_id == product_id)
+    ).scalar()
+    if current == score:
+        return
+    # Худшая запись и заполненность рейтинга: чтение не более LEADERBOARD_CAPACITY
+    # строк по индексу (board, category, score)
+    stored, worst_score = db.execute(
+        select(func.count(), func.min(LeaderboardEntry.score)).where(*_board(board, category))
+    ).one()
+    worst_id = None
+    if worst_score is not None:
+        worst_id = db.execute(
+            select(func.max(LeaderboardEntry.product_id))
+            .where(*_board(board, category), LeaderboardEntry.score == worst_score)
+        ).scalar()
+    full = stored >= LEADERBOARD_CAPACITY
+
+    if current is None:
+        if full and not _ranks_above(score, product_id, worst_score, worst_id):
+            # Товар не проходит в рейтинг - запись не нужна
+            return
+        _upsert_entry(db, board, category, product_id, score)
+        if full:
+            _trim(db, board, category)
+        return
+
+    if full and not _ranks_above(score, product_id, worst_score, worst_id):
+        # Товар опустился ниже худшей записи: его место может занять товар
+        # вне таблицы, поэтому запись удаляется и место добирается из агрегатов
+        db.execute(
+            delete(LeaderboardEntry)
+            .where(*_board(board, category), LeaderboardEntry.product_id == product_id)
+            .execution_options(synchronize_session=False)
+        )
+        _refill(db, board, category)
+        return
+
+    db.execute(
+        update(LeaderboardEntry)
+        .where(*_board(board, category), LeaderboardEntry.product_id == product_id)
+        .values(score=score)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _scores(review_count: int, rating_count: int, rating_sum: int) -> Dict[str, float]:
+    scores = {}
+    if review_count:
+        scores[MOST_REVIEWED] = float(review_count)
+    if rating_count:
+        scores[TOP_RATED] = bayesian_score(rating_count, rating_sum)
+    return scores
+
+
+def refresh_product(
+    db: Session,
+    product_id: int,
+    category: str,
+    review_count: int,
+    rating_count: int,
+    rating_sum: int
+):
+    """Обновление записей товара в рейтингах его категории и всего каталога"""
+    for board, score in _scores(review_count, rating_count, rating_sum).items():
+        for board_category in (category, ALL_CATEGORIES):
+            _place(db, board, board_category, product_id, score)
+
+
+def move_product(db: Session, db_product: Product):
+    """Перенос записей товара в рейтинг новой категории"""
+    remove_product(db, db_product.id)
+    refresh_product(
+        db, db_product.id, db_product.category,
+        db_product.review_count, db_product.rating_count, db_product.rating_sum
+    )
+
+
+def sync_categories(db: Session, product_ids: List[int]):
+    """Перенос в новые категории записей рейтингов после массового изменения товаров"""
+    moved = (
+        db.query(Product)
+        .join(LeaderboardEntry, LeaderboardEntry.product_id == Product.id)
+        .filter(
+            LeaderboardEntry.product_id.in_(product_ids),
+            LeaderboardEntry.category != ALL_CATEGORIES,
+            LeaderboardEntry.category != Product.category
+        )
+        .distinct()
+        .all()
+    )
+    for db_product in moved:
+        move_product(db, db_product)
+
+
+def remove_product(db: Session, product_id: int):
+    """Удаление товара из всех рейтингов с дополнением освободившихся мест"""
+    boards = db.execute(
+        delete(LeaderboardEntry)
+        .where(LeaderboardEntry.product_id == product_id)
+        .returning(LeaderboardEntry.board, LeaderboardEntry.category)
+        .execution_options(synchronize_session=False)
+    ).all()
+    for board, category in boards:
+        _refill(db, board, category)
+
+
+def get_leaderboard(
+    db: Session,
+    board: str,
+    category: Optional[str] = None,
+    limit: int = LEADERBOARD_SIZE
+) -> List[tuple]:
+    """Товары рейтинга с их счетом: пары (товар, счет)"""
+    board_category = ALL_CATEGORIES if not category or category == "All" else category
+    return (
+        db.query(Product, LeaderboardEntry.score)
+        .join(LeaderboardEntry, LeaderboardEntry.product_id == Product.id)
+        .filter(LeaderboardEntry.board == board, LeaderboardEntry.category == board_category)
+        .order_by(LeaderboardEntry.score.desc(), LeaderboardEntry.product_id)
+        .limit(min(limit, LEADERBOARD_SIZE))
+        .all()
+    )
+
+
+def rebuild(db: Session):
+    """
+    Полный пересчет агрегатов и рейтингов по таблице reviews.
+
+    Нужен после переноса отзывов и для исправления расхождений; в обычной
+    работе агрегаты поддерживаются инкрементально.
+    """
+    zero = {column: 0 for column in ("review_count", "rating_count", "rating_sum")}
+    zero.update({f"stars_{star}": 0 for star in STAR_COLUMNS})
+    db.query(Product).filter(Product.review_count > 0).update(zero, synchronize_session=False)
+
+    rows = (
+        db.query(
+            Review.product_id,
+            func.count(Review.id),
+            func.count(Review.rating),
+            func.coalesce(func.sum(Review.rating), 0),
+            *[func.count(case((Review.rating == star, 1))) for star in STAR_COLUMNS]
+        )
+        .group_by(Review.product_id)
+        .all()
+    )
+    if rows:
+        updates = []
+        for product_id, review_count, rating_count, rating_sum, *stars in rows:
+            values = {
+                "id": product_id,
+                "review_count": review_count,
+                "rating_count": rating_count,
+                "rating_sum": rating_sum,
+            }
+            values.update({f"stars_{star}": count for star, count in zip(STAR_COLUMNS, stars)})
+            updates.append(values)
+        db.execute(update(Product), updates)
+        db.query(Product).filter(Product.rating_count > 0).update(
+            {"rating": func.round(Product.rating_sum * 1.0 / Product.rating_count, 2)},
+            synchronize_session=False
+        )
+
+    rebuild_leaderboards(db)
+    db.commit()
+
+
+def rebuild_leaderboards(db: Session):
+    """
+    Пересчет таблицы рейтингов по агрегатам в строках товаров (без commit).
+
+    Читается только верхушка каждого рейтинга: после массовой загрузки
+    товаров с готовыми агрегатами пересчитывать отзывы не нужно.
+    """
+    db.execute(delete(LeaderboardEntry))
+    categories = [category for (category,) in db.query(Product.category).distinct()]
+    for board in LEADERBOARDS:
+        for board_category in categories + [ALL_CATEGORIES]:
+            entries = _top_products(db, board, board_category, LEADERBOARD_CAPACITY)
+            if entries:
+                db.bulk_insert_mappings(LeaderboardEntry, entries)
@@ -0,0 +1,481 @@
+"""
+Поисковый движок каталога.
+
+В PostgreSQL поиск идет по колонке products.search_vector (tsvector по
+названию, категории и описанию с весами A-C), которую поддерживает
+триггер, и по reviews.search_vector (генерируемая колонка по тексту
+отзыва), плюс триграммный индекс по названию для поиска с опечатками
+(расширение pg_trgm). Схему создает install_search_schema, ее вызывает
+init_db.py.
+
+Для SQLite и тестов используется инвертированный индекс в памяти процесса
+с теми же правилами: все слова запроса должны совпасть как префиксы слов
+товара или слов одного его отзыва, либо название должно быть похоже на
+запрос по триграммам. Релевантность складывается так же: вес совпадения
+по полям товара, похожесть названия и фиксированный вес совпадения по
+отзыву. Отличается только первое слагаемое: ts_rank_cd учитывает
+расстояние между словами в тексте, а индекс берет сумму весов лучших
+полей (A-C) по словам запроса, поэтому при равном наборе найденных
+товаров порядок товаров с близкой релевантностью может различаться.
+"""
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import Float, and_, cast, func, literal, literal_column, or_, select, text, union_all
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from models.product import Product
+from models.review import Review
+
+# Конфигурация полнотекстового поиска: без стемминга, т.к. каталог на нескольких языках
+TS_CONFIG = "simple"
+# Порог похожести названий, совпадает со значением pg_trgm.similarity_threshold по умолчанию
+SIMILARITY_THRESHOLD = 0.3
+# Веса полей, как у ts_rank для весов A, B, C, D
+FIELD_WEIGHTS = {"name": 1.0, "category": 0.4, "description": 0.2, "reviews": 0.1}
+
+# Слова отзывов хранятся в индексе с этим префиксом, отдельно от слов товара;
+# их списки ссылаются на отдельные отзывы, а не на товар
+REVIEW_TERM_PREFIX = "\x00"
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+SEARCH_SCHEMA_DDL = [
+    "ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    f"""
+    CREATE OR REPLACE FUNCTION products_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('{TS_CONFIG}', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('{TS_CONFIG}', coalesce(NEW.category, '')), 'B') ||
+            setweight(to_tsvector('{TS_CONFIG}', coalesce(NEW.description, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS products_search_vector_trigger ON products",
+    """
+    CREATE TRIGGER products_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, category, description ON products
+    FOR EACH ROW EXECUTE FUNCTION products_search_vector_update()
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING gin (search_vector)",
+    # Вектор отзыва считается при вставке и не требует пересчета товара
+    f"""
+    ALTER TABLE reviews ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('{TS_CONFIG}', coalesce(review, ''))) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_reviews_search_vector ON reviews USING gin (search_vector)",
+    # Заполняем вектор для товаров, добавленных до установки триггера
+    "UPDATE products SET name = name WHERE search_vector IS NULL",
+]
+
+TRIGRAM_SCHEMA_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (lower(name) gin_trgm_ops)",
+]
+
+_trigram_support: Dict[str, bool] = {}
+
+
+def install_search_schema(engine: Engine):
+    """Создание колонки, триггера и индексов для поиска в PostgreSQL"""
+    if engine.dialect.name != "postgresql":
+        return
+
+    with engine.begin() as connection:
+        for statement in SEARCH_SCHEMA_DDL:
+            connection.execute(text(statement))
+
+    # pg_trgm есть не во всех сборках PostgreSQL; без него поиск работает без опечаток
+    try:
+        with engine.begin() as connection:
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for statement in TRIGRAM_SCHEMA_DDL:
+                connection.execute(text(statement))
+    except Exception as e:
+        print(f"Триграммный поиск недоступен: {e}")
+
+
+def _has_trigram_support(db: Session) -> bool:
+    """Установлено ли расширение pg_trgm (результат кешируется на процесс)"""
+    url = str(db.get_bind().url)
+    if url not in _trigram_support:
+        _trigram_support[url] = db.execute(
+            text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+        ).scalar()
+    return _trigram_support[url]
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    """Разбиение текста на слова в нижнем регистре"""
+    if not value:
+        return []
+    return _WORD_RE.findall(value.lower())
+
+
+def trigrams(value: Optional[str]) -> Set[str]:
+    """Множество триграмм строки по правилам pg_trgm"""
+    result = set()
+    for word in tokenize(value):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(left: Set[str], right: Set[str]) -> float:
+    """Похожесть двух множеств триграмм, как similarity() в pg_trgm"""
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def _filters(category: Optional[str], min_price: Optional[float], max_price: Optional[float]):
+    conditions = []
+    if category and category != "All":
+        conditions.append(Product.category == category)
+    if min_price is not None:
+        conditions.append(Product.actual_price >= min_price)
+    if max_price is not None:
+        conditions.append(Product.actual_price <= max_price)
+    return conditions
+
+
+def _search_postgres(
+    db: Session,
+    query: str,
+    skip: int,
+    limit: int,
+    after: Optional[Tuple[float, int]],
+    category: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    options: Sequence
+) -> List[Tuple[Product, float]]:
+    words = tokenize(query)
+    search_vector = literal_column("products.search_vector")
+    review_vector = literal_column("reviews.search_vector")
+    # Каждое слово запроса ищем как префикс: "hood" находит "Hoodies"
+    ts_query = func.to_tsquery(TS_CONFIG, " & ".join(f"{word}:*" for word in words))
+
+    match = search_vector.op("@@")(ts_query)
+    rank = cast(func.ts_rank_cd(search_vector, ts_query), Float)
+    if _has_trigram_support(db):
+        name = func.lower(Product.name)
+        match = or_(match, name.op("%")(query.lower()))
+        rank = rank + cast(func.similarity(name, query.lower()), Float)
+
+    # Кандидаты собираются из двух GIN-индексов: по товарам и по отзывам
+    hits = union_all(
+        select(Product.id.label("id"), literal(0).label("review_hit")).where(match),
+        select(Review.product_id.label("id"), literal(1).label("review_hit"))
+        .where(review_vector.op("@@")(ts_query)),
+    ).subquery()
+    candidates = (
+        select(hits.c.id, func.max(hits.c.review_hit).label("review_hit"))
+        .group_by(hits.c.id)
+        .subquery()
+    )
+    rank = rank + cast(candidates.c.review_hit, Float) * FIELD_WEIGHTS["reviews"]
+
+    ranked = (
+        select(Product.id.label("id"), rank.label("rank"))
+        .join(candidates, Product.id == candidates.c.id)
+        .where(*_filters(category, min_price, max_price))
+        .subquery()
+    )
+    db_query = (
+        db.query(Product, ranked.c.rank)
+        .options(*options)
+        .join(ranked, Product.id == ranked.c.id)
+        .order_by(ranked.c.rank.desc(), ranked.c.id)
+    )
+    if after:
+        last_rank, last_id = after
+        db_query = db_query.filter(or_(
+            ranked.c.rank < last_rank,
+            and_(ranked.c.rank == last_rank, ranked.c.id > last_id)
+        ))
+    else:
+        db_query = db_query.offset(skip)
+    return [(product, rank) for product, rank in db_query.limit(limit).all()]
+
+
+class InvertedIndex:
+    """Инвертированный индекс каталога в памяти процесса"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.loaded = False
+        self._documents: Dict[int, dict] = {}
+        # слово -> {id товара: вес лучшего поля, где встречается слово};
+        # слово отзыва (с REVIEW_TERM_PREFIX) -> {ключ отзыва: вес отзывов}
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        # ключ отзыва в индексе -> id товара
+        self._review_products: Dict[int, int] = {}
+        self._next_review_key = 0
+        # триграмма названия -> id товаров
+        self._name_trigrams: Dict[str, Set[int]] = defaultdict(set)
+        self._sorted_terms: List[str] = []
+
+    def reset(self):
+        """Сброс индекса: он будет перестроен из базы при следующем поиске"""
+        with self._lock:
+            self._reset()
+
+    def _remove(self, product_id: int) -> Optional[dict]:
+        document = self._documents.pop(product_id, None)
+        if document is None:
+            return None
+        for term in document["terms"]:
+            self._unpost(term, product_id)
+        for key, review_terms in document["review_keys"]:
+            del self._review_products[key]
+            for term in review_terms:
+                self._unpost(REVIEW_TERM_PREFIX + term, key)
+        for trigram in document["name_trigrams"]:
+            self._name_trigrams[trigram].discard(product_id)
+        self._sorted_terms = []
+        return document
+
+    def _unpost(self, term: str, key: int):
+        postings = self._postings.get(term)
+        if postings is not None:
+            postings.pop(key, None)
+            if not postings:
+                del self._postings[term]
+
+    def _add(self, product_id: int, fields: dict, reviews: List[List[str]]):
+        """Индексация товара; reviews - слова каждого отзыва отдельно"""
+        self._remove(product_id)
+        terms: Dict[str, float] = {}
+        for field in ("name", "category", "description"):
+            for word in tokenize(fields[field]):
+                terms[word] = max(terms.get(word, 0.0), FIELD_WEIGHTS[field])
+        for term in terms:
+            self._postings[term][product_id] = terms[term]
+        # Каждый отзыв индексируется отдельно, как reviews.search_vector в
+        # PostgreSQL: все слова запроса должны найтись в одном отзыве
+        review_keys = []
+        for review_words in reviews:
+            key = self._next_review_key
+            self._next_review_key += 1
+            self._review_products[key] = product_id
+            review_terms = set(review_words)
+            for term in review_terms:
+                self._postings[REVIEW_TERM_PREFIX + term][key] = FIELD_WEIGHTS["reviews"]
+            review_keys.append((key, review_terms))
+        name_trigrams = trigrams(fields["name"])
+        for trigram in name_trigrams:
+            self._name_trigrams[trigram].add(product_id)
+        self._documents[product_id] = {
+            "terms": list(terms),
+            "fields": fields,
+            "reviews": reviews,
+            "review_keys": review_keys,
+            "name_trigrams": name_trigrams,
+        }
+        self._sorted_terms = []
+
+    @staticmethod
+    def _product_fields(product) -> dict:
+        return {
+            "name": product.name,
+            "category": product.category,
+            "description": product.description,
+            "actual_price": product.actual_price,
+        }
+
+    def rebuild(self, products: Iterable, reviews: Iterable[Tuple[int, str]]):
+        with self._lock:
+            self._reset()
+            review_words: Dict[int, List[List[str]]] = defaultdict(list)
+            for product_id, review_text in reviews:
+                review_words[product_id].append(tokenize(review_text))
+            for product in products:
+                self._add(product.id, self._product_fields(product), review_words.get(product.id, []))
+            self.loaded = True
+
+    def add(self, product, review_texts: Optional[List[str]] = None):
+        """Добавление или обновление товара; без review_texts отзывы сохраняются"""
+        with self._lock:
+            if not self.loaded:
+                return
+            if review_texts is None:
+                document = self._documents.get(product.id)
+                reviews = document["reviews"] if document else []
+            else:
+                reviews = [tokenize(review_text) for review_text in review_texts]
+            self._add(product.id, self._product_fields(product), reviews)
+
+    def add_review(self, product_id: int, review_text: str):
+        with self._lock:
+            document = self._documents.get(product_id)
+            if document is not None:
+                self._add(product_id, document["fields"], document["reviews"] + [tokenize(review_text)])
+
+    def remove(self, product_id: int):
+        with self._lock:
+            self._remove(product_id)
+
+    def _prefix_matches(self, word: str) -> Dict[int, float]:
+        """Товары, у которых есть слово с данным префиксом, и вес лучшего поля"""
+        if not self._sorted_terms:
+            self._sorted_terms = sorted(self._postings)
+
+        matches: Dict[int, float] = {}
+        position = bisect_left(self._sorted_terms, word)
+        while position < len(self._sorted_terms) and self._sorted_terms[position].startswith(word):
+            for product_id, weight in self._postings[self._sorted_terms[position]].items():
+                matches[product_id] = max(matches.get(product_id, 0.0), weight)
+            position += 1
+        return matches
+
+    def _match_all(self, words: List[str], prefix: str) -> Dict[int, float]:
+        """Товары (или ключи отзывов), где нашлись все слова, и сумма весов лучших полей"""
+        matched: Optional[Dict[int, float]] = None
+        for word in words:
+            hits = self._prefix_matches(prefix + word)
+            if matched is None:
+                matched = hits
+            else:
+                matched = {pid: matched[pid] + weight for pid, weight in hits.items() if pid in matched}
+            if not matched:
+                return {}
+        return matched or {}
+
+    def search(
+        self,
+        query: str,
+        category: Optional[str],
+        min_price: Optional[float],
+        max_price: Optional[float]
+    ) -> List[Tuple[int, float]]:
+        """Список (id, релевантность), отсортированный по убыванию релевантности"""
+        with self._lock:
+            scores: Dict[int, float] = {}
+
+            # Полнотекстовое совпадение: каждое слово запроса должно найтись
+            # среди слов товара либо среди слов одного из его отзывов
+            words = tokenize(query)
+            if words:
+                scores.update(self._match_all(words, prefix=""))
+                review_hits = {
+                    self._review_products[key] for key in self._match_all(words, prefix=REVIEW_TERM_PREFIX)
+                }
+                for product_id in review_hits:
+                    scores[product_id] = scores.get(product_id, 0.0) + FIELD_WEIGHTS["reviews"]
+
+            # Похожее по триграммам название тоже дает совпадение
+            query_trigrams = trigrams(query)
+            candidates: Set[int] = set()
+            for trigram in query_trigrams:
+                candidates |= self._name_trigrams.get(trigram, set())
+            for product_id in candidates:
+                if similarity(query_trigrams, self._documents[product_id]["name_trigrams"]) >= SIMILARITY_THRESHOLD:
+                    scores.setdefault(product_id, 0.0)
+            # Как в _search_postgres, похожесть названия входит в релевантность
+            # каждого найденного товара, а не только найденных по триграммам
+            for product_id in scores:
+                scores[product_id] += similarity(query_trigrams, self._documents[product_id]["name_trigrams"])
+
+            results = []
+            for product_id, score in scores.items():
+                fields = self._documents[product_id]["fields"]
+                if category and category != "All" and fields["category"] != category:
+                    continue
+                if min_price is not None and fields["actual_price"] < min_price:
+                    continue
+                if max_price is not None and fields["actual_price"] > max_price:
+                    continue
+                results.append((product_id, score))
+            results.sort(key=lambda item: (-item[1], item[0]))
+            return results
+
+
+_fallback_index = InvertedIndex()
+
+
+def _search_fallback(
+    db: Session,
+    query: str,
+    skip: int,
+    limit: int,
+    after: Optional[Tuple[float, int]],
+    category: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    options: Sequence
+) -> List[Tuple[Product, float]]:
+    if not _fallback_index.loaded:
+        _fallback_index.rebuild(db.query(Product).all(), db.query(Review.product_id, Review.review).all())
+
+    results = _fallback_index.search(query, category, min_price, max_price)
+    if after:
+        last_rank, last_id = after
+        results = [
+            (product_id, rank) for product_id, rank in results
+            if rank < last_rank or (rank == last_rank and product_id > last_id)
+        ]
+    else:
+        results = results[skip:]
+    results = results[:limit]
+
+    products = {
+        product.id: product
+        for product in (
+            db.query(Product)
+            .options(*options)
+            .filter(Product.id.in_([product_id for product_id, _ in results]))
+        )
+    }
+    return [(products[product_id], rank) for product_id, rank in results if product_id in products]
+
+
+def search(
+    db: Session,
+    query: str,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[Tuple[float, int]] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    options: Sequence = ()
+) -> List[Tuple[Product, float]]:
+    """
+    Поиск товаров с ранжированием; возвращает пары (товар, релевантность).
+
+    options - параметры загрузки товаров, например load_only для выборки полей.
+    """
+    if not tokenize(query):
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        return _search_postgres(db, query, skip, limit, after, category, min_price, max_price, options)
+    return _search_fallback(db, query, skip, limit, after, category, min_price, max_price, options)
+
+
+def index_product(product: Product, review_texts: Optional[List[str]] = None):
+    """Обновление товара в резервном индексе после записи"""
+    _fallback_index.add(product, review_texts)
+
+
+def index_review(product_id: int, review_text: str):
+    """Добавление текста нового отзыва в резервный индекс"""
+    _fallback_index.add_review(product_id, review_text)
+
+
+def remove_product(product_id: int):
+    """Удаление товара из резервного индекса"""
+    _fallback_index.remove(product_id)
+
+
+def reset_index():
+    """Сброс резервного индекса после массовых изменений каталога"""
+    _fallback_index.reset()
@@ -1,18 +1,69 @@
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 from jose import jwt
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional
 
+from config import PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL
 from models.user import User
-from schemas.user import UserCreate, UserUpdate
+from schemas.user import User as UserSchema, UserCreate, UserUpdate
+from services.cache import LRUCache, VersionCounter
+from services.pagination import decode_cursor, next_cursor
+import services.events as events
+from services.password_hashing import hash_password, hash_password_async, verify_password, verify_password_async
 
-# Настройки безопасности
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Настройки безопасности (bcrypt выполняется в пуле password_hashing)
 SECRET_KEY = "YOUR_SECRET_KEY"  # В реальном проекте нужно использовать переменные окружения
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Уникальные колонки users -> сообщение о конфликте при регистрации
+UNIQUE_FIELDS = {
+    "email": "Email уже зарегистрирован",
+    "username": "Имя пользователя уже занято",
+}
+
+class UserConflictError(ValueError):
+    """Email или имя пользователя уже заняты (нарушен уникальный индекс)"""
+
+    def __init__(self, field: str):
+        self.field = field
+        super().__init__(UNIQUE_FIELDS[field])
+
+def _conflict_error(error: IntegrityError) -> Optional[UserConflictError]:
+    """Конфликт по уникальной колонке из ошибки базы (None - другая ошибка)"""
+    # PostgreSQL сообщает имя индекса (ix_users_email), SQLite - колонку (users.email)
+    diag = getattr(error.orig, "diag", None)
+    source = getattr(diag, "constraint_name", None) or str(error.orig)
+    for field in UNIQUE_FIELDS:
+        if f"users_{field}" in source or f"users.{field}" in source:
+            return UserConflictError(field)
+    return None
+
+# Кеш пользователей для get_current_user: id -> снимок данных (схема User).
+# Версия увеличивается после каждой записи пользователя, поэтому снимок,
+# прочитанный до записи, в кеш уже не попадет
+principal_version = VersionCounter()
+principal_cache = LRUCache("principals", maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+def _on_user_changed(user_id: Optional[int], version: Optional[int] = None):
+    """Сброс кеша пользователя после записи (в этом или другом процессе)"""
+    if user_id is None:
+        principal_cache.clear()
+    else:
+        principal_cache.invalidate(user_id)
+    principal_version.bump()
+
+events.subscribe("user", _on_user_changed)
+
+def _publish_change(db: Session, db_user: User):
+    """Увеличение версии строки и публикация события в текущей транзакции"""
+    db_user.version = User.version + 1
+    db.flush()
+    events.publish(db, "user", db_user.id, db_user.version)
+
 def get_user(db: Session, user_id: int):
     """Получение пользователя по ID"""
     return db.query(User).filter(User.id == user_id).first()
@@ -25,21 +76,49 @@ def get_user_by_username(db: Session, username: str):
     """Получение пользователя по username"""
     return db.query(User).filter(User.username == username).first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
+async def get_user_async(db: AsyncSession, user_id: int):
+    """Асинхронный вариант get_user"""
+    return await db.get(User, user_id)
+
+async def get_user_by_username_async(db: AsyncSession, username: str):
+    """Асинхронный вариант get_user_by_username"""
+    return await db.scalar(select(User).where(User.username == username))
+
+async def _load_principal(db: AsyncSession, user_id: int) -> Optional[UserSchema]:
+    db_user = await get_user_async(db, user_id)
+    return UserSchema.model_validate(db_user, from_attributes=True) if db_user else None
+
+async def get_principal_async(db: AsyncSession, user_id: int) -> Optional[UserSchema]:
+    """Пользователь для проверки токена: из кеша или одним запросом по id"""
+    return await principal_cache.get_or_load_async(
+        user_id, principal_version.current, lambda: _load_principal(db, user_id)
+    )
+
+def principal_cache_stats() -> dict:
+    """Счетчики кеша пользователей для /api/metrics"""
+    return {"version": principal_version.current, **principal_cache.stats()}
+
+def get_users(db: Session, skip: int = 0, limit: int = 100, after: Optional[str] = None):
     """Получение списка пользователей"""
-    return db.query(User).offset(skip).limit(limit).all()
+    query = db.query(User).order_by(User.id)
+    if after:
+        (last_id,) = decode_cursor(after, (int,))
+        return query.filter(User.id > last_id).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
 
-def create_user(db: Session, user: UserCreate):
-    """Создание нового пользователя"""
-    # Проверяем, что пользователя с таким email или username нет
-    if get_user_by_email(db, user.email) or get_user_by_username(db, user.username):
-        return None
-    
-    # Хешируем пароль
-    hashed_password = pwd_context.hash(user.password)
-    
-    # Создаем пользователя
-    db_user = User(
+def users_next_cursor(users: List[User], limit: int) -> Optional[str]:
+    """Курсор следующей страницы списка пользователей"""
+    return next_cursor(users, limit, key=lambda user: (user.id,))
+
+def _insert_user(user: UserCreate, hashed_password: str):
+    """
+    INSERT пользователя с возвратом строки.
+
+    Уникальность email и username проверяют индексы базы, без SELECT
+    перед вставкой: проверка заранее не защищает от одновременной
+    регистрации, а конфликт все равно приходит от индекса.
+    """
+    return insert(User).values(
         username=user.username,
         email=user.email,
         hashed_password=hashed_password,
@@ -47,17 +126,34 @@ def create_user(db: Session, user: UserCreate):
         last_name=user.last_name,
         phone_number=user.phone_number,
         address=user.address,
-        city=user.city
-    )
-    
+        city=user.city,
+        is_active=True
+    ).returning(User)
+
+def create_user(db: Session, user: UserCreate):
+    """Создание нового пользователя; UserConflictError - email или имя заняты"""
+    # Пароль хешируется до запроса: соединение с базой не ждет bcrypt
+    hashed_password = hash_password(user.password)
     try:
-        db.add(db_user)
+        db_user = db.scalars(_insert_user(user, hashed_password)).one()
+        # Объект отдается без перечитывания после commit
+        db.expunge(db_user)
         db.commit()
-        db.refresh(db_user)
         return db_user
-    except Exception as e:
+    except IntegrityError as e:
         db.rollback()
-        raise e
+        raise _conflict_error(e) or e
+
+async def create_user_async(db: AsyncSession, user: UserCreate):
+    """Асинхронный вариант create_user: один INSERT и commit"""
+    hashed_password = await hash_password_async(user.password)
+    try:
+        db_user = (await db.scalars(_insert_user(user, hashed_password))).one()
+        await db.commit()
+        return db_user
+    except IntegrityError as e:
+        await db.rollback()
+        raise _conflict_error(e) or e
 
 def update_user(db: Session, user_id: int, user: UserUpdate):
     """Обновление данных пользователя"""
@@ -81,7 +177,7 @@ def update_user(db: Session, user_id: int, user: UserUpdate):
     
     # Хешируем пароль, если он был передан
     if "password" in update_data:
-        update_data["hashed_password"] = pwd_context.hash(update_data.pop("password"))
+        update_data["hashed_password"] = hash_password(update_data.pop("password"))
     
     try:
         # Обновляем поля объекта
@@ -89,7 +185,9 @@ def update_user(db: Session, user_id: int, user: UserUpdate):
             if hasattr(db_user, key):  # Проверяем, существует ли такое поле
                 setattr(db_user, key, value)
         
+        _publish_change(db, db_user)
         db.commit()
+        _on_user_changed(user_id)
         db.refresh(db_user)
         return db_user
     except Exception as e:
@@ -105,9 +203,14 @@ def authenticate_user(db: Session, username: str, password: str):
         return False
     return user
 
-def verify_password(plain_password, hashed_password):
-    """Проверка пароля"""
-    return pwd_context.verify(plain_password, hashed_password)
+async def authenticate_user_async(db: AsyncSession, username: str, password: str):
+    """Асинхронный вариант authenticate_user"""
+    user = await get_user_by_username_async(db, username)
+    if not user:
+        return False
+    if not await verify_password_async(password, user.hashed_password):
+        return False
+    return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Создание JWT токена"""
@@ -131,10 +234,12 @@ def change_password(db: Session, user_id: int, current_password: str, new_passwo
         return False
     
     # Хешируем новый пароль
-    db_user.hashed_password = pwd_context.hash(new_password)
+    db_user.hashed_password = hash_password(new_password)
     
     try:
+        _publish_change(db, db_user)
         db.commit()
+        _on_user_changed(user_id)
         return True
     except Exception as e:
         db.rollback()
@@ -0,0 +1,78 @@
+"""
+Общие настройки тестов: приложение работает с временной базой SQLite.
+
+Запуск из папки backend:
+    python -m pytest tests
+
+Тесты с отметкой postgres (COPY, SKIP LOCKED, блокировки строк) идут на
+отдельной базе PostgreSQL из TEST_POSTGRES_URL, без нее пропускаются.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+# URL базы читается при импорте config, поэтому задается до импорта приложения
+DB_DIR = tempfile.mkdtemp(prefix="fashion_store_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'test.db')}"
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from config import Base, SessionLocal, engine  # noqa: E402
+from main import app  # noqa: E402
+
+
+# Товар для POST /api/products/ (см. product_payload)
+PRODUCT = {
+    "name": "Шарф",
+    "price": "5 000 ₸",
+    "actual_price": 5000,
+    "img": "scarf.png",
+    "category": "Аксессуары",
+    "sizes": ["M"],
+    "description": "Кашемировый шарф",
+}
+
+
+@pytest.fixture(scope="session")
+def client():
+    Base.metadata.create_all(bind=engine)
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "postgres: тест на PostgreSQL из TEST_POSTGRES_URL")
+
+
+@pytest.fixture(scope="session")
+def postgres_sessions():
+    """Фабрика сессий тестовой базы PostgreSQL"""
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL не задан")
+    postgres_engine = create_engine(url)
+    Base.metadata.create_all(bind=postgres_engine)
+    yield sessionmaker(bind=postgres_engine, autoflush=False)
+    postgres_engine.dispose()
+
+
+@pytest.fixture(params=["sqlite", pytest.param("postgres", marks=pytest.mark.postgres)])
+def sessions(request, client):
+    """Фабрика сессий: тест идет на SQLite приложения и на PostgreSQL"""
+    if request.param == "postgres":
+        return request.getfixturevalue("postgres_sessions")
+    return SessionLocal
+
+
+@pytest.fixture(scope="session")
+def product_payload():
+    """Фабрика тела товара: PRODUCT с замененными полями"""
+    def make(**fields) -> dict:
+        return {**PRODUCT, **fields}
+    return make
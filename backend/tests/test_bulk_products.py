@@ -0,0 +1,71 @@
+import uuid
+
+import pytest
+
+
+def _category():
+    return f"bulk-{uuid.uuid4().hex[:8]}"
+
+
+def _listing(client, category):
+    response = client.get("/api/products/", params={"category": category})
+    assert response.status_code == 200, response.text
+    return sorted(response.json(), key=lambda product: product["id"])
+
+
+def test_bulk_upsert_reports_row_errors(client, product_payload):
+    category = _category()
+    existing = client.post("/api/products/", json=product_payload(category=category)).json()
+    explicit_id = existing["id"] + 100000
+    items = [
+        product_payload(name="Новый", category=category),
+        product_payload(id=explicit_id, name="С id", category=category),
+        {"name": "Без цены", "category": category},
+        product_payload(id=explicit_id, name="Повтор id", category=category),
+        product_payload(id=existing["id"], name="Обновлен", category=category, actual_price=7000),
+    ]
+    response = client.post("/api/products/bulk", json={"items": items})
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert (result["affected"], result["inserted"], result["updated"]) == (3, 2, 1)
+    assert [error["index"] for error in result["errors"]] == [2, 3]
+    assert result["errors"][1]["errors"][0]["type"] == "duplicate"
+
+    products = {product["id"]: product for product in _listing(client, category)}
+    assert len(products) == 3
+    assert products[explicit_id]["name"] == "С id"
+    assert (products[existing["id"]]["name"], products[existing["id"]]["actual_price"]) == ("Обновлен", 7000)
+
+
+def test_bulk_update_changes_only_filtered_products(client, product_payload):
+    category, other = _category(), _category()
+    for price in (100, 250):
+        client.post("/api/products/", json=product_payload(category=category, actual_price=price, sizes=["S"]))
+    untouched = client.post("/api/products/", json=product_payload(category=other, actual_price=100)).json()
+
+    body = {"filter": {"category": category, "max_price": 200}, "changes": {"price_multiplier": 0.5}}
+    response = client.patch("/api/products/bulk", json=body)
+    assert response.status_code == 200, response.text
+    assert response.json()["affected"] == 1
+    products = _listing(client, category)
+    assert [(product["actual_price"], product["price"]) for product in products] == [(50, "$50.00"), (250, "5 000 ₸")]
+
+    body = {"filter": {"category": category, "sizes": ["S"]}, "changes": {"category": other}}
+    assert client.patch("/api/products/bulk", json=body).json()["affected"] == 2
+    assert _listing(client, category) == []
+    assert len(_listing(client, other)) == 3
+    assert client.get(f"/api/products/{untouched['id']}").json()["actual_price"] == 100
+
+
+@pytest.mark.parametrize("product_filter", [
+    {},
+    {"sizes": []},
+    {"category": "All"},
+    {"category": "All", "sizes": []},
+])
+def test_bulk_update_without_effective_filter_is_rejected(client, product_payload, product_filter):
+    product = client.post("/api/products/", json=product_payload(category=_category(), actual_price=100)).json()
+    body = {"filter": product_filter, "changes": {"price_multiplier": 0.5}}
+    response = client.patch("/api/products/bulk", json=body)
+    assert response.status_code == 400, response.text
+    assert client.get(f"/api/products/{product['id']}").json()["actual_price"] == 100
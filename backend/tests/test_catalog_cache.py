@@ -0,0 +1,30 @@
+from config import SessionLocal
+from replicas import READ_SOURCE, SOURCE_REPLICA
+import services.product_service as product_service
+
+
+def _hits_after_two_reads(db, product_id):
+    product_service.product_cache.invalidate(product_id)
+    hits = product_service.product_cache.hits
+    product_service.get_product_cached(db, product_id)
+    product_service.get_product_cached(db, product_id)
+    return product_service.product_cache.hits - hits
+
+
+def test_write_advances_known_catalog_revision(client, product_payload):
+    client.post("/api/products/", json=product_payload())
+    with SessionLocal() as db:
+        assert product_service.known_catalog_revision.current == product_service.get_catalog_revision(db)
+
+
+def test_replica_read_is_cached_only_when_not_behind(client, product_payload):
+    product = client.post("/api/products/", json=product_payload()).json()
+    with SessionLocal(info={READ_SOURCE: SOURCE_REPLICA}) as db:
+        assert _hits_after_two_reads(db, product["id"]) == 1
+
+        # Запись, которую реплика еще не получила
+        revision = product_service.get_catalog_revision(db)
+        product_service.known_catalog_revision.advance_to(revision + 1)
+        assert _hits_after_two_reads(db, product["id"]) == 0
+        # Данные по-прежнему выдаются, только мимо кеша
+        assert product_service.get_product_cached(db, product["id"]).id == product["id"]
@@ -0,0 +1,115 @@
+import json
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+
+from models.product import Product
+from models.review import Review
+import services.catalog_import as catalog_import
+
+
+def _product(name, category, **fields):
+    return {"name": name, "price": "$10", "img": "item.png", "category": category, "sizes": ["M"], **fields}
+
+
+def _write_jsonl(path, records):
+    path.write_text("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records), encoding="utf-8")
+    return str(path)
+
+
+def _names(db, category):
+    return sorted(db.scalars(select(Product.name).where(Product.category == category)))
+
+
+def test_resume_after_crash_loads_each_record_once(client, tmp_path):
+    from config import SessionLocal
+
+    category = f"import-{uuid.uuid4().hex[:8]}"
+    names = [f"item {n}" for n in range(6)]
+    path = _write_jsonl(tmp_path / "catalog.jsonl", [_product(name, category) for name in names])
+
+    def crash(stats):
+        raise RuntimeError("Сбой после первой пачки")
+
+    with SessionLocal() as db:
+        with pytest.raises(RuntimeError):
+            catalog_import.run_import(db, path, chunk_size=2, parse_batch=1, on_progress=crash)
+        assert _names(db, category) == names[:2]
+        # Без --resume или --restart прерванный импорт не запускается заново
+        with pytest.raises(catalog_import.CatalogImportError):
+            catalog_import.run_import(db, path, chunk_size=2, parse_batch=1)
+
+        stats = catalog_import.run_import(db, path, chunk_size=2, parse_batch=1, resume=True)
+        assert (stats.skipped, stats.inserted) == (2, 4)
+        # Товары без id первой пачки не загружены второй раз
+        assert _names(db, category) == names
+    assert not (tmp_path / "catalog.jsonl.checkpoint").exists()
+
+
+@pytest.mark.postgres
+def test_new_ids_do_not_collide_with_explicit_ids(postgres_sessions, tmp_path):
+    category = f"import-{uuid.uuid4().hex[:8]}"
+    with postgres_sessions() as db:
+        base = (db.scalar(select(func.max(Product.id))) or 0) + 1
+    review = [{"user": "anna", "review": "Отлично", "rating": 5}]
+    records = [
+        # Явные id сразу за последним товаром: прежде их выдавал nextval товарам без id
+        _product("new 1", category, reviews=review),
+        _product("explicit 1", category, id=base),
+        _product("new 2", category),
+        _product("explicit 2", category, id=base + 1),
+        _product("new 3", category, reviews=review),
+        _product("new 4", category),
+    ]
+    path = _write_jsonl(tmp_path / "catalog.jsonl", records)
+
+    with postgres_sessions() as db:
+        stats = catalog_import.run_import(db, path, chunk_size=2, parse_batch=1)
+        assert (stats.inserted, stats.updated, stats.duplicates) == (6, 0, 0)
+        assert _names(db, category) == sorted(record["name"] for record in records)
+        assert db.scalar(select(Product.name).where(Product.id == base)) == "explicit 1"
+        reviewed = db.scalars(
+            select(Product.name).join(Review, Review.product_id == Product.id).where(Product.category == category)
+        ).all()
+        assert sorted(reviewed) == ["new 1", "new 3"]
+
+
+JSX = """import React from 'react';
+
+const products = [
+  { "id": %(a)d, "name": "Jsx coat", "price": "$120", "img": "coat.png", "category": "%(category)s",
+    "sizes": ["S", "M"], "rating": 4.5, "reviews": [{ "user": "anna", "review": "Warm, {really}" }] },
+  { "id": %(b)d, "name": "Jsx skirt", "price": "$40", "img": "skirt.png", "category": "%(category)s",
+    "sizes": [S, M] },
+  { "name": "No id", "price": "$10", "img": "x.png", "category": "%(category)s" },
+  { "id": %(c)d, "name": "Jsx hat", "price": "$15", "img": "hat.png", "category": "%(category)s" },
+];
+
+export default function ProductPage() { return null; }
+"""
+
+
+def test_malformed_jsx_records_go_to_rejects_file(client, tmp_path, monkeypatch):
+    from config import SessionLocal
+
+    # Маленькие блоки: товары и начало массива попадают на границы блоков
+    monkeypatch.setattr(catalog_import, "JSX_READ_SIZE", 7)
+    category = f"jsx-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as db:
+        base = (db.scalar(select(func.max(Product.id))) or 0) + 1
+    path = tmp_path / "ProductPage.jsx"
+    path.write_text(JSX % {"a": base, "b": base + 1, "c": base + 2, "category": category}, encoding="utf-8")
+    rejects_path = tmp_path / "rejects.jsonl"
+
+    with SessionLocal() as db:
+        stats = catalog_import.run_import(db, str(path), parse_batch=2, rejects_path=str(rejects_path))
+        assert (stats.read, stats.inserted, stats.rejected) == (4, 2, 2)
+        assert _names(db, category) == ["Jsx coat", "Jsx hat"]
+        coat = db.get(Product, base)
+        assert (coat.sizes, coat.rating, coat.review_count) == (["S", "M"], 4.5, 1)
+
+    rejects = [json.loads(line) for line in rejects_path.read_text(encoding="utf-8").splitlines()]
+    assert [reject["seq"] for reject in rejects] == [2, 3]
+    assert "sizes" in rejects[0]["error"]
+    assert rejects[1]["record"].startswith('{ "name": "No id"')
@@ -0,0 +1,90 @@
+import uuid
+from collections import Counter
+
+import pytest
+from sqlalchemy import select
+
+from models.product import Product
+from services.facet_service import PRICE_BUCKETS, RATING_THRESHOLDS
+
+CATEGORY = f"facets-{uuid.uuid4().hex[:8]}"
+SIZE = f"size-{uuid.uuid4().hex[:4]}"
+PRODUCTS = [
+    # (цена, размеры, оценка)
+    (30, [SIZE, "M"], 4.5),
+    (80, [SIZE], 3.2),
+    (150, ["M"], 4.9),
+    (600, ["L", SIZE], 1.5),
+]
+
+
+@pytest.fixture(scope="module")
+def catalog(client, product_payload):
+    for price, sizes, rating in PRODUCTS:
+        payload = product_payload(category=CATEGORY, actual_price=price, sizes=sizes, rating=rating)
+        assert client.post("/api/products/", json=payload).status_code == 200
+
+
+def _expected(category=None, min_price=None, max_price=None, sizes=None, min_rating=None):
+    """Фасеты, посчитанные перебором всех товаров каталога"""
+    from config import SessionLocal
+
+    with SessionLocal() as db:
+        rows = db.execute(select(Product.category, Product.actual_price, Product.sizes, Product.rating)).all()
+    checks = {
+        "category": lambda row: category is None or row.category == category,
+        "price": lambda row: (min_price is None or row.actual_price >= min_price)
+        and (max_price is None or row.actual_price <= max_price),
+        "sizes": lambda row: not sizes or bool(set(sizes) & set(row.sizes or [])),
+        "rating": lambda row: min_rating is None or row.rating >= min_rating,
+    }
+
+    def matching(facet=None):
+        return [row for row in rows if all(check(row) for name, check in checks.items() if name != facet)]
+
+    def values(counts):
+        return [{"value": value, "count": count} for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))]
+
+    def bucket(price):
+        return sum(1 for edge in PRICE_BUCKETS[1:] if price >= edge)
+
+    prices = Counter(bucket(row.actual_price) for row in matching("price"))
+    return {
+        "total": len(matching()),
+        "categories": values(Counter(row.category for row in matching("category"))),
+        "sizes": values(Counter(size for row in matching("sizes") for size in set(row.sizes or []))),
+        "price_ranges": [
+            {"min": low, "max": PRICE_BUCKETS[index + 1] if index + 1 < len(PRICE_BUCKETS) else None,
+             "count": prices.get(index, 0)}
+            for index, low in enumerate(PRICE_BUCKETS)
+        ],
+        "ratings": [
+            {"min_rating": threshold, "count": sum(1 for row in matching("rating") if row.rating >= threshold)}
+            for threshold in RATING_THRESHOLDS
+        ],
+    }
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"category": CATEGORY},
+    {"min_price": 50},
+    {"max_price": 200},
+    {"sizes": [SIZE]},
+    {"min_rating": 3},
+    {"category": CATEGORY, "min_price": 50, "max_price": 700, "sizes": [SIZE, "L"], "min_rating": 1},
+])
+def test_facets_match_brute_force_counts(client, catalog, filters):
+    response = client.get("/api/products/facets", params=filters)
+    assert response.status_code == 200, response.text
+    facets = response.json()
+    for price_range in facets["price_ranges"]:
+        price_range["min"] = int(price_range["min"])
+        if price_range["max"] is not None:
+            price_range["max"] = int(price_range["max"])
+    assert facets == _expected(**filters)
+
+
+def test_facets_of_seeded_category_with_size(client, catalog):
+    response = client.get("/api/products/facets", params={"category": CATEGORY, "sizes": SIZE})
+    assert response.json()["total"] == 3
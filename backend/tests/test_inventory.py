@@ -0,0 +1,105 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from models.inventory import Reservation
+from models.job import Job
+from models.order import Order
+from models.user import User
+from schemas.order import OrderCreate, OrderUpdate
+from schemas.product import ProductCreate
+import services.inventory_service as inventory_service
+import services.order_service as order_service
+import services.product_service as product_service
+
+
+def _seed(sessions, product_payload, stock):
+    name = f"buyer_{uuid.uuid4().hex[:8]}"
+    with sessions() as db:
+        user = User(username=name, email=f"{name}@example.com", hashed_password="-")
+        db.add(user)
+        db.commit()
+        product = product_service.create_product(db, ProductCreate(**product_payload()))
+        inventory_service.set_stock(db, product.id, {"M": stock})
+        return user.id, product.id
+
+
+def _order(user_id, product_id):
+    return OrderCreate(shipping_address="Алматы", items=[{"product_id": product_id, "selected_size": "M"}])
+
+
+def test_concurrent_orders_do_not_oversell(sessions, product_payload):
+    user_id, product_id = _seed(sessions, product_payload, stock=3)
+
+    def buy(_):
+        with sessions() as db:
+            try:
+                return order_service.create_order(db, _order(user_id, product_id), user_id)["id"]
+            except inventory_service.OutOfStockError:
+                return None
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        orders = [order_id for order_id in pool.map(buy, range(8)) if order_id is not None]
+
+    assert len(orders) == 3
+    with sessions() as db:
+        assert inventory_service.get_stock(db, product_id) == {"M": 0}
+        reserved = db.query(Reservation).filter(Reservation.product_id == product_id).count()
+        assert reserved == 3
+
+
+def test_release_returns_stock_once(sessions, product_payload):
+    user_id, product_id = _seed(sessions, product_payload, stock=2)
+    with sessions() as db:
+        order_id = order_service.create_order(db, _order(user_id, product_id), user_id)["id"]
+
+    # Повтор задачи очереди после сбоя не возвращает резерв второй раз
+    for _ in range(2):
+        with sessions() as db:
+            order_service.release_stock_job(db, {"order_id": order_id})
+            db.commit()
+    with sessions() as db:
+        assert inventory_service.get_stock(db, product_id) == {"M": 2}
+
+
+def test_expired_reservation_cancels_order_and_queues_notification(sessions, product_payload):
+    user_id, product_id = _seed(sessions, product_payload, stock=2)
+    with sessions() as db:
+        pending = order_service.create_order(db, _order(user_id, product_id), user_id)["id"]
+        paid = order_service.create_order(db, _order(user_id, product_id), user_id)["id"]
+        order_service.update_order(db, paid, OrderUpdate(status="paid"))
+
+    def notifications(db):
+        jobs = db.scalars(select(Job).where(Job.kind == order_service.STATUS_CHANGED_JOB)).all()
+        return [job.payload for job in jobs if job.payload["order_id"] in (pending, paid)]
+
+    with sessions() as db:
+        before = notifications(db)
+        # Резервы всех тестов уже просрочены к этому моменту
+        while inventory_service.release_expired(db, now=datetime.utcnow() + timedelta(days=1)):
+            pass
+        assert db.get(Order, pending).status == "cancelled"
+        assert db.get(Order, paid).status == "paid"
+        assert inventory_service.get_stock(db, product_id) == {"M": 1}
+        assert notifications(db)[len(before):] == [{"order_id": pending, "status": "cancelled"}]
+
+
+def test_concurrent_duplicate_idempotency_key_returns_stored_order(sessions, product_payload):
+    user_id, product_id = _seed(sessions, product_payload, stock=5)
+    key = f"order-{uuid.uuid4().hex}"
+
+    def submit(_):
+        with sessions() as db:
+            return order_service.create_order(db, _order(user_id, product_id), user_id, idempotency_key=key)
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        responses = list(pool.map(submit, range(6)))
+
+    # Повторы ждут первый запрос и получают его сохраненный ответ
+    assert len({response["id"] for response in responses}) == 1
+    assert len({response["total_price"] for response in responses}) == 1
+    with sessions() as db:
+        assert len(order_service.get_orders(db, user_id=user_id)) == 1
+        assert inventory_service.get_stock(db, product_id) == {"M": 4}
@@ -0,0 +1,118 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, select, update
+
+from config import JOB_RETRY_DELAY
+from models.job import Job
+import services.job_queue as job_queue
+
+FLAKY_JOB = "test.flaky"
+NOOP_JOB = "test.noop"
+failures = {"left": 0}
+
+
+@job_queue.handler(FLAKY_JOB)
+def flaky_job(db, payload):
+    if failures["left"] > 0:
+        failures["left"] -= 1
+        raise RuntimeError("Сбой задачи")
+
+
+@job_queue.handler(NOOP_JOB)
+def noop_job(db, payload):
+    pass
+
+
+@pytest.fixture
+def queue(sessions):
+    """Пустая очередь: задачи других тестов не попадают в выборку"""
+    with sessions() as db:
+        db.execute(delete(Job))
+        db.commit()
+    return sessions
+
+
+def _job(db, job_id) -> Job:
+    return db.execute(select(Job).where(Job.id == job_id)).scalar_one()
+
+
+def _make_ready(db, job_id):
+    # Вместо ожидания задержки повтора
+    db.execute(update(Job).where(Job.id == job_id).values(run_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.commit()
+
+
+def test_failed_job_backs_off_then_goes_dead_and_can_be_requeued(queue):
+    failures["left"] = 2
+    with queue() as db:
+        job_queue.enqueue(db, FLAKY_JOB, {"n": 1}, max_attempts=2)
+        db.commit()
+
+        [job] = job_queue.fetch(db, "w1", 10)
+        assert not job_queue.run(db, job)
+        failed = _job(db, job.id)
+        assert (failed.status, failed.attempts, failed.locked_by) == ("queued", 1, None)
+        assert "Сбой задачи" in failed.last_error
+        delay = (failed.run_at - datetime.utcnow()).total_seconds()
+        assert JOB_RETRY_DELAY * 0.5 - 1 <= delay <= JOB_RETRY_DELAY
+        # До истечения задержки задача не выдается
+        assert job_queue.fetch(db, "w1", 10) == []
+
+        _make_ready(db, job.id)
+        [job] = job_queue.fetch(db, "w1", 10)
+        assert job.attempts == 2
+        assert not job_queue.run(db, job)
+        db.expire_all()
+        assert _job(db, job.id).status == "dead"
+        _make_ready(db, job.id)
+        assert job_queue.fetch(db, "w1", 10) == []
+
+        assert job_queue.requeue_dead(db, [job.id]) == 1
+        [job] = job_queue.fetch(db, "w1", 10)
+        assert job.attempts == 1
+        assert job_queue.run(db, job)
+        db.expire_all()
+        done = _job(db, job.id)
+        assert (done.status, done.last_error) == ("done", None)
+
+
+def test_retry_delay_doubles_up_to_limit(monkeypatch):
+    monkeypatch.setattr(job_queue.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(job_queue, "JOB_RETRY_DELAY", 2.0)
+    monkeypatch.setattr(job_queue, "JOB_RETRY_MAX_DELAY", 10.0)
+    assert [job_queue.retry_delay(attempt) for attempt in range(1, 6)] == [2.0, 4.0, 8.0, 10.0, 10.0]
+
+
+def test_concurrent_workers_claim_each_job_once(queue):
+    with queue() as db:
+        job_queue.enqueue_many(db, NOOP_JOB, [{"n": n} for n in range(20)])
+        db.commit()
+
+    def claim(worker):
+        with queue() as db:
+            return [job.id for job in job_queue.fetch(db, f"w{worker}", 4)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        claimed = [job_id for batch in pool.map(claim, range(8)) for job_id in batch]
+    assert len(claimed) == len(set(claimed)) == 20
+
+
+@pytest.mark.postgres
+def test_fetch_skips_jobs_locked_by_another_worker(postgres_sessions):
+    with postgres_sessions() as db:
+        db.execute(delete(Job))
+        job_queue.enqueue_many(db, NOOP_JOB, [{"n": n} for n in range(3)])
+        db.commit()
+        ids = sorted(db.scalars(select(Job.id)))
+
+    with postgres_sessions() as holder, postgres_sessions() as db:
+        # Другой обработчик держит блокировку первой задачи до конца транзакции
+        holder.execute(select(Job.id).where(Job.id == ids[0]).with_for_update())
+        # Без SKIP LOCKED выборка ждала бы блокировку и падала по таймауту
+        db.connection().exec_driver_sql("SET lock_timeout = '2s'")
+        claimed = sorted(job.id for job in job_queue.fetch(db, "w2", 10))
+        assert claimed == ids[1:]
+        holder.rollback()
+        assert [job.id for job in job_queue.fetch(db, "w2", 10)] == ids[:1]
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from services.login_admission import TokenBucketLimiter
+import services.login_admission as login_admission
+
+
+def test_acquire_is_atomic_under_concurrency():
+    limiter = TokenBucketLimiter("test", rate_per_minute=0.001, burst=5)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda _: limiter.acquire("alice"), range(200)))
+    assert results.count(0.0) == 5
+    assert limiter.stats()["rejected"] == 195
+
+
+def test_refund_returns_token_up_to_burst():
+    limiter = TokenBucketLimiter("test", rate_per_minute=0.001, burst=1)
+    assert limiter.acquire("alice") == 0.0
+    assert limiter.acquire("alice") > 0
+    limiter.refund("alice")
+    limiter.refund("alice")
+    assert limiter.acquire("alice") == 0.0
+    assert limiter.acquire("alice") > 0
+
+
+def test_failed_guesses_do_not_lock_out_owner_on_other_ip(monkeypatch):
+    monkeypatch.setattr(login_admission, "username_limiter", TokenBucketLimiter("username", 0.001, 3))
+    monkeypatch.setattr(login_admission, "ip_limiter", TokenBucketLimiter("ip", 0.001, 100))
+    monkeypatch.setattr(login_admission, "account_limiter", TokenBucketLimiter("account", 0.001, 100))
+    for _ in range(3):
+        assert login_admission.admit("10.0.0.1", "Alice") == 0.0
+    # Параллельные попытки зарезервированы до проверки пароля
+    assert login_admission.admit("10.0.0.1", "alice") > 0
+    assert login_admission.admit("10.0.0.2", "alice") == 0.0
+    # Успешный вход возвращает попытку
+    login_admission.release("10.0.0.1", "alice")
+    assert login_admission.admit("10.0.0.1", "alice") == 0.0
+
+
+def test_guesses_from_many_ips_hit_account_limit(monkeypatch):
+    monkeypatch.setattr(login_admission, "username_limiter", TokenBucketLimiter("username", 0.001, 3))
+    monkeypatch.setattr(login_admission, "ip_limiter", TokenBucketLimiter("ip", 0.001, 100))
+    monkeypatch.setattr(login_admission, "account_limiter", TokenBucketLimiter("account", 0.001, 10))
+    admitted = [login_admission.admit(f"10.0.1.{n}", "Bob") == 0.0 for n in range(50)]
+    # Каждый IP в пределе своей пары (IP, имя), но учетная запись - нет
+    assert admitted.count(True) == 10
+    assert login_admission.admit("10.0.2.1", "bob") > 0
+    # Отказ по учетной записи не расходует предел IP и пары (IP, имя)
+    assert login_admission.ip_limiter.stats()["allowed"] == 10
+    assert login_admission.admit("10.0.1.0", "carol") == 0.0
+
+
+def test_login_rejected_with_429_after_account_limit(client, monkeypatch):
+    monkeypatch.setattr(login_admission, "account_limiter", TokenBucketLimiter("account", 0.001, 2))
+    form = {"username": "nobody_here", "password": "wrong"}
+    assert [client.post("/api/users/token", data=form).status_code for _ in range(2)] == [401, 401]
+    response = client.post("/api/users/token", data=form)
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) > 0
@@ -0,0 +1,66 @@
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+
+def _create_order(client, product_payload, username):
+    user = client.post(
+        "/api/users/", json={"username": username, "email": f"{username}@example.com", "password": "secret123"}
+    ).json()
+    product = client.post("/api/products/", json=product_payload()).json()
+    client.put(f"/api/products/{product['id']}/inventory", json={"stock": 10})
+    order = {"shipping_address": "Алматы", "items": [{"product_id": product["id"], "selected_size": "M"}]}
+    response = client.post("/api/orders/", params={"user_id": user["id"]}, json=order)
+    assert response.status_code == 200, response.text
+    return response.json()["id"], product["id"]
+
+
+def test_order_details_revalidate_by_etag_only(client, product_payload):
+    order_id, product_id = _create_order(client, product_payload, "details_owner")
+    response = client.get(f"/api/orders/{order_id}/details")
+    assert response.status_code == 200
+    assert "last-modified" not in response.headers
+    etag = response.headers["etag"]
+    assert client.get(f"/api/orders/{order_id}/details", headers={"If-None-Match": etag}).status_code == 304
+
+    client.put(f"/api/products/{product_id}", json={"name": "Шарф (новый)"})
+    # Заказ не менялся, но данные товара в ответе изменились
+    future = format_datetime(datetime.now(timezone.utc) + timedelta(days=1), usegmt=True)
+    response = client.get(
+        f"/api/orders/{order_id}/details", headers={"If-None-Match": etag, "If-Modified-Since": future}
+    )
+    assert response.status_code == 200
+    response = client.get(f"/api/orders/{order_id}/details", headers={"If-Modified-Since": future})
+    assert response.status_code == 200
+
+
+def _token(client, username):
+    client.post("/api/users/", json={"username": username, "email": f"{username}@example.com", "password": "secret123"})
+    response = client.post("/api/users/token", data={"username": username, "password": "secret123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_update_order_idempotency_key_is_scoped_to_user(client, product_payload):
+    order_id, _ = _create_order(client, product_payload, "update_owner")
+    owner = {**_token(client, "key_owner"), "Idempotency-Key": "update-1"}
+    other = {**_token(client, "key_stranger"), "Idempotency-Key": "update-1"}
+    body = {"shipping_address": "Астана"}
+
+    first = client.put(f"/api/orders/{order_id}", json=body, headers=owner)
+    assert first.status_code == 200, first.text
+    assert client.put(f"/api/orders/{order_id}", json=body, headers=owner).json() == first.json()
+    # Тот же ключ и то же тело от другого пользователя не получают чужой ответ
+    assert client.put(f"/api/orders/{order_id}", json=body, headers=other).status_code == 422
+    assert client.put(f"/api/orders/{order_id}", json=body, headers={"Idempotency-Key": "update-1"}).status_code == 401
+    # Без ключа обновление по-прежнему не требует токена
+    assert client.put(f"/api/orders/{order_id}", json=body).status_code == 200
+
+
+def test_order_status_follows_allowed_transitions(client, product_payload):
+    order_id, product_id = _create_order(client, product_payload, "status_owner")
+    assert client.put(f"/api/orders/{order_id}", json={"status": "shipped"}).status_code == 409
+    assert client.put(f"/api/orders/{order_id}", json={"status": "cancelled"}).status_code == 200
+    # Отмененный заказ не возвращается в работу: резерв не ставится в очередь повторно
+    for status in ("pending", "paid", "cancelled"):
+        response = client.put(f"/api/orders/{order_id}", json={"status": status})
+        assert response.status_code == (200 if status == "cancelled" else 409), response.text
+    assert client.get(f"/api/orders/{order_id}").json()["status"] == "cancelled"
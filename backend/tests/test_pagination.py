@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import pytest
+
+from services.pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+
+def test_decode_cursor_round_trip():
+    created_at = datetime(2026, 1, 2, 3, 4, 5)
+    assert decode_cursor(encode_cursor(created_at, 7), (datetime, int)) == [created_at, 7]
+    assert decode_cursor(encode_cursor(99.5, 3), (float, int)) == [99.5, 3]
+    # Целая цена в JSON - тоже допустимое значение float
+    assert decode_cursor(encode_cursor(100, 3), (float, int)) == [100, 3]
+
+
+@pytest.mark.parametrize("values, types", [
+    (({"price": 1}, 3), (float, int)),
+    (("100", 3), (float, int)),
+    ((1.5, "3"), (float, int)),
+    ((True,), (int,)),
+    ((1.5,), (int,)),
+    (("2026-01-02", 7), (datetime, int)),
+    ((1, 2), (int,)),
+])
+def test_decode_cursor_rejects_wrong_types(values, types):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(encode_cursor(*values), types)
+
+
+def test_decode_cursor_rejects_garbage():
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("not a cursor!", (int,))
+
+
+@pytest.mark.parametrize("path, params", [
+    ("/api/products/", {"after": encode_cursor({"id": 1})}),
+    ("/api/products/", {"sort": "price_asc", "after": encode_cursor("cheap", 1)}),
+    ("/api/products/search", {"query": "пальто", "after": encode_cursor([1], 1)}),
+    ("/api/products/1/reviews", {"after": encode_cursor("yesterday", 1)}),
+])
+def test_listing_with_forged_cursor_is_rejected(client, path, params):
+    response = client.get(path, params=params)
+    assert response.status_code == 400, response.text
+
+
+def test_streamed_pages_follow_next_cursor(client, product_payload, monkeypatch):
+    import routers.products
+
+    monkeypatch.setattr(routers.products, "STREAMING_MIN_LIMIT", 2)
+    for _ in range(5):
+        assert client.post("/api/products/", json=product_payload(category="Поток")).status_code == 200
+
+    seen, after = [], None
+    while True:
+        params = {"category": "Поток", "limit": 2, **({"after": after} if after else {})}
+        response = client.get("/api/products/", params=params)
+        assert response.status_code == 200, response.text
+        seen += [item["id"] for item in response.json()]
+        after = response.headers.get("x-next-cursor")
+        if not after:
+            break
+    assert len(seen) == 5 and len(set(seen)) == 5
+
+
+def test_stream_session_is_closed_without_waiting_for_gc(client):
+    import asyncio
+
+    import services.product_service as product_service
+    from routers.serialization import snapshot_stream, streaming_list_response
+
+    async def open_stream():
+        _, batches = await snapshot_stream(
+            product_service.get_catalog_revision_async,
+            lambda db: product_service.iter_product_batches_async(db, limit=10)
+        )
+        assert batches._db.in_transaction()
+        return batches, streaming_list_response(batches)
+
+    async def never_started():
+        # Клиент отключился до начала потока: сессию закрывает фоновая задача ответа
+        batches, response = await open_stream()
+        await response.background()
+        return batches._db.in_transaction()
+
+    async def aborted():
+        batches, response = await open_stream()
+        body = response.body_iterator
+        assert await body.__anext__() == b"["
+        await body.aclose()
+        return batches._db.in_transaction()
+
+    assert asyncio.run(never_started()) is False
+    assert asyncio.run(aborted()) is False
@@ -0,0 +1,64 @@
+def test_create_product_with_rated_reviews(client, product_payload):
+    reviews = [
+        {"user": "anna", "review": "Отличное", "rating": 5},
+        {"user": "dana", "review": "Хорошее", "rating": 4},
+        {"user": "ivan", "review": "Без оценки"},
+    ]
+    response = client.post("/api/products/", json=product_payload(rating=1.0, reviews=reviews))
+    assert response.status_code == 200, response.text
+    product = response.json()
+    # Средняя по оценкам отзывов, а не переданная
+    assert product["rating"] == 4.5
+    assert product["review_count"] == 3
+    assert product["rating_count"] == 2
+
+    response = client.get(f"/api/products/{product['id']}")
+    assert response.status_code == 200
+    assert response.json()["rating"] == 4.5
+    assert len(response.json()["reviews"]) == 3
+
+
+def test_create_product_without_rated_reviews(client, product_payload):
+    reviews = [{"user": "ivan", "review": "Без оценки"}]
+    response = client.post("/api/products/", json=product_payload(rating=3.5, reviews=reviews))
+    assert response.status_code == 200, response.text
+    assert response.json()["rating"] == 3.5
+
+
+def test_leaderboard_refills_slot_of_dropped_product(client, product_payload, monkeypatch):
+    from config import SessionLocal
+    from services import rating_service
+
+    monkeypatch.setattr(rating_service, "LEADERBOARD_CAPACITY", 2)
+    category = "Рейтинг"
+    ids = {}
+    for name, ratings in (("a", [5, 5]), ("b", [4, 4]), ("c", [3])):
+        reviews = [{"user": name, "review": "Оценка", "rating": rating} for rating in ratings]
+        response = client.post("/api/products/", json=product_payload(name=name, category=category, reviews=reviews))
+        assert response.status_code == 200, response.text
+        ids[name] = response.json()["id"]
+
+    def board():
+        with SessionLocal() as db:
+            return [product.id for product, _ in rating_service.get_leaderboard(db, rating_service.TOP_RATED, category)]
+
+    # В таблице только две лучшие записи, "c" вытеснен
+    assert board() == [ids["a"], ids["b"]]
+
+    # "a" опускается ниже вытесненного "c": место добирается из агрегатов
+    for _ in range(3):
+        response = client.post(f"/api/products/{ids['a']}/reviews", json={"user": "z", "review": "Плохо", "rating": 1})
+        assert response.status_code == 200, response.text
+    assert board() == [ids["b"], ids["c"]]
+    with SessionLocal() as db:
+        expected = rating_service._top_products(db, rating_service.TOP_RATED, category, 2)
+    assert [entry["product_id"] for entry in expected] == [ids["b"], ids["c"]]
+
+
+def test_update_product_does_not_override_review_rating(client, product_payload):
+    reviews = [{"user": "anna", "review": "Отличное", "rating": 5}]
+    product = client.post("/api/products/", json=product_payload(reviews=reviews)).json()
+    response = client.put(f"/api/products/{product['id']}", json={"rating": 1.0, "description": "Новое"})
+    assert response.status_code == 200, response.text
+    assert response.json()["rating"] == 5.0
+    assert response.json()["description"] == "Новое"
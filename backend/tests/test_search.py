@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+import pytest
+
+from services.search_service import FIELD_WEIGHTS, InvertedIndex, similarity, trigrams
+
+
+def _product(product_id, name, category="Платья", description=""):
+    return SimpleNamespace(
+        id=product_id, name=name, category=category, description=description, actual_price=1000.0
+    )
+
+
+@pytest.fixture
+def index():
+    index = InvertedIndex()
+    index.rebuild(
+        [_product(1, "Платье миди"), _product(2, "Платье макси"), _product(3, "Юбка")],
+        [(1, "теплое"), (1, "мягкое"), (2, "теплое и мягкое")],
+    )
+    return index
+
+
+def _ids(results):
+    return [product_id for product_id, _ in results]
+
+
+def test_all_query_words_must_match_one_review(index):
+    # Как reviews.search_vector в PostgreSQL: слова из разных отзывов не складываются
+    assert _ids(index.search("теплое мягкое", None, None, None)) == [2]
+    assert sorted(_ids(index.search("теплое", None, None, None))) == [1, 2]
+
+
+def test_new_review_is_matched_on_its_own(index):
+    index.add_review(1, "теплое мягкое")
+    assert sorted(_ids(index.search("теплое мягкое", None, None, None))) == [1, 2]
+
+
+def test_rank_adds_name_similarity_to_every_hit(index):
+    # Как в _search_postgres: вес полей + похожесть названия + вес отзывов
+    (product_id, rank), = index.search("теплое мягкое", None, None, None)
+    expected = FIELD_WEIGHTS["reviews"] + similarity(trigrams("теплое мягкое"), trigrams("Платье макси"))
+    assert product_id == 2
+    assert rank == pytest.approx(expected)
+
+    (product_id, rank), = index.search("юбка", None, None, None)
+    assert rank == pytest.approx(FIELD_WEIGHTS["name"] + 1.0)
+
+
+def test_reindexing_product_drops_old_reviews(index):
+    index.add(_product(2, "Платье макси"), review_texts=["летнее"])
+    assert _ids(index.search("теплое мягкое", None, None, None)) == []
+    assert _ids(index.search("летнее", None, None, None)) == [2]
@@ -0,0 +1,82 @@
+"""
+Обработчик фоновых задач очереди jobs (см. services/job_queue.py).
+
+Процессы обработчика независимы: их можно запускать сколько угодно и на
+разных машинах с одной базой. SIGINT/SIGTERM дают процессам доделать
+взятые задачи и выйти.
+
+Запуск из папки backend:
+    python worker.py
+    python worker.py --processes 4 --batch 20
+    python worker.py --requeue-dead        # вернуть задачи dead в очередь
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from config import SessionLocal, engine
+import services.job_queue as job_queue
+# Регистрация обработчиков задач заказов
+import services.order_service  # noqa: F401
+
+
+def report(name: str):
+    def print_stats(stats: job_queue.WorkerStats):
+        snapshot = stats.snapshot()
+        print(
+            f"[{name}] выполнено {snapshot['done']}, упало {snapshot['failed']}, "
+            f"{snapshot['jobs_per_second']} задач/с, занятость {snapshot['utilization']:.0%}",
+            flush=True
+        )
+    return print_stats
+
+
+def work(index: int, args):
+    # Соединения пула, унаследованные от родительского процесса, не используются
+    engine.dispose(close=False)
+    name = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    job_queue.run_worker(
+        name, stop,
+        batch=args.batch,
+        poll_interval=args.poll_interval,
+        on_report=report(name),
+        report_interval=args.report_interval
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--batch", type=int, default=10, help="задач за одну выборку")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="опрос пустой очереди, секунд")
+    parser.add_argument("--report-interval", type=float, default=60.0, help="вывод счетчиков, секунд")
+    parser.add_argument("--requeue-dead", action="store_true", help="вернуть задачи dead в очередь и выйти")
+    args = parser.parse_args()
+
+    if args.requeue_dead:
+        with SessionLocal() as db:
+            print(f"Возвращено в очередь: {job_queue.requeue_dead(db)}")
+        return
+
+    if args.processes == 1:
+        work(0, args)
+        return
+    processes = [multiprocessing.Process(target=work, args=(index, args)) for index in range(args.processes)]
+    for process in processes:
+        process.start()
+    # Сигнал передается дочерним процессам, родитель ждет их завершения
+    forward = lambda *_: [process.terminate() for process in processes]
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ import { Link } from 'react-router-dom';
 import { orderService } from '../services/api';
 import '../styles/OrderHistory.css';
 
-const OrderHistory = ({ orders = [] }) => {
+const OrderHistory = ({ orders = [], hasMore = false, onLoadMore }) => {
   const [activeOrder, setActiveOrder] = useState(null);
   const [orderDetails, setOrderDetails] = useState({});
   const [isLoading, setIsLoading] = useState(false);
@@ -24,9 +24,8 @@ const OrderHistory = ({ orders = [] }) => {
         return null;
       }
       
-      // Проверка и форматирование дат
+      // Проверка и форматирование даты
       const created_at = order.created_at ? new Date(order.created_at) : new Date();
-      const updated_at = order.updated_at ? new Date(order.updated_at) : created_at;
       
       // Проверка статуса
       const status = order.status || 'pending';
@@ -34,7 +33,6 @@ const OrderHistory = ({ orders = [] }) => {
       return {
         ...order,
         created_at: created_at.toISOString(),
-        updated_at: updated_at.toISOString(),
         status
       };
     }).filter(Boolean); // Удаляем null значения
@@ -48,6 +46,40 @@ const OrderHistory = ({ orders = [] }) => {
     console.log('Обработанные заказы:', cleanedOrders);
   }, [orders]);
 
+  // Детали новой страницы истории загружаются одним запросом, а не при раскрытии каждого заказа
+  useEffect(() => {
+    const missingIds = processedOrders
+      .map(order => order.id)
+      .filter(id => !orderDetails[id])
+      .slice(0, 100);
+    if (missingIds.length === 0) {
+      return;
+    }
+    
+    let cancelled = false;
+    orderService.getOrdersDetails(missingIds)
+      .then(detailsList => {
+        if (cancelled) {
+          return;
+        }
+        setOrderDetails(prev => {
+          const next = { ...prev };
+          detailsList.forEach(details => {
+            next[details.order.id] = details;
+          });
+          return next;
+        });
+      })
+      .catch(err => {
+        // При раскрытии заказа детали будут запрошены по одному
+        console.warn('Не удалось загрузить детали заказов:', err);
+      });
+    
+    return () => {
+      cancelled = true;
+    };
+  }, [processedOrders]);
+
   // Обработчик для переключения активного заказа
   const toggleOrderDetails = async (orderId) => {
     if (activeOrder === orderId) {
@@ -62,7 +94,7 @@ const OrderHistory = ({ orders = [] }) => {
       return;
     }
     
-    // Если детали не загружены, загружаем их
+    // Если пакетная загрузка не удалась, загружаем детали заказа отдельно
     try {
       setIsLoading(true);
       setError(null);
@@ -113,6 +145,10 @@ const OrderHistory = ({ orders = [] }) => {
     }
   };
 
+  // Список заказов содержит только сводку; адрес и дата изменения есть в деталях,
+  // которые загружаются постранично вместе с историей
+  const getUpdatedAt = (order) => orderDetails[order.id]?.order?.updated_at || order.created_at;
+
   // Функция для получения статуса заказа на русском
   const getStatusText = (status) => {
     const statusMap = {
@@ -178,11 +214,15 @@ const OrderHistory = ({ orders = [] }) => {
               className="order-header" 
               onClick={() => toggleOrderDetails(order.id)}
             >
+              {order.thumbnail && (
+                <img className="order-thumbnail" src={order.thumbnail} alt="" />
+              )}
               <div className="order-basic-info">
                 <span className="order-number">Заказ #{order.id}</span>
                 <span className="order-date">
                   {formatDate(order.created_at)}
                 </span>
+                <span className="order-item-count">Товаров: {order.item_count || 0}</span>
               </div>
               
               <div className="order-summary">
@@ -231,7 +271,7 @@ const OrderHistory = ({ orders = [] }) => {
                         </div>
                         <div className="order-info-row">
                           <span className="info-label">Адрес доставки:</span>
-                          <span className="info-value">{order.shipping_address || "Не указан"}</span>
+                          <span className="info-value">{orderDetails[order.id]?.order?.shipping_address || "Не указан"}</span>
                         </div>
                       </div>
                     </div>
@@ -286,7 +326,7 @@ const OrderHistory = ({ orders = [] }) => {
                             <span className="tracking-title">Оплачен</span>
                             <span className="tracking-date">
                               {['paid', 'processing', 'shipped', 'delivered'].includes(order.status) 
-                                ? formatDate(order.updated_at || order.created_at)
+                                ? formatDate(getUpdatedAt(order))
                                 : '-'}
                             </span>
                           </div>
@@ -298,7 +338,7 @@ const OrderHistory = ({ orders = [] }) => {
                             <span className="tracking-title">В обработке</span>
                             <span className="tracking-date">
                               {['processing', 'shipped', 'delivered'].includes(order.status) 
-                                ? formatDate(order.updated_at || order.created_at)
+                                ? formatDate(getUpdatedAt(order))
                                 : '-'}
                             </span>
                           </div>
@@ -310,7 +350,7 @@ const OrderHistory = ({ orders = [] }) => {
                             <span className="tracking-title">Отправлен</span>
                             <span className="tracking-date">
                               {['shipped', 'delivered'].includes(order.status) 
-                                ? formatDate(order.updated_at || order.created_at)
+                                ? formatDate(getUpdatedAt(order))
                                 : '-'}
                             </span>
                           </div>
@@ -322,7 +362,7 @@ const OrderHistory = ({ orders = [] }) => {
                             <span className="tracking-title">Доставлен</span>
                             <span className="tracking-date">
                               {order.status === 'delivered' 
-                                ? formatDate(order.updated_at || order.created_at)
+                                ? formatDate(getUpdatedAt(order))
                                 : '-'}
                             </span>
                           </div>
@@ -355,6 +395,12 @@ const OrderHistory = ({ orders = [] }) => {
           </div>
         ))}
       </div>
+      
+      {hasMore && (
+        <button className="load-more-orders-button" onClick={onLoadMore}>
+          Показать еще
+        </button>
+      )}
     </div>
   );
 };
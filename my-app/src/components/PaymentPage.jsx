@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import { useLocation, useNavigate } from "react-router-dom";
 import QRCodePayment from "../../src/components/QRCodePayment";
 import { orderService } from "../services/api";
@@ -24,6 +24,12 @@ export default function PaymentPage({ refreshAuth }) {
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState("");
   const [orderNumber, setOrderNumber] = useState("");
+  // Созданный заказ, товар которого зарезервирован на время оплаты
+  const [reservedOrder, setReservedOrder] = useState(null);
+  // Ключи идемпотентности: повторная отправка той же попытки (например,
+  // после обрыва сети) не создаст второй заказ и не оплатит его дважды
+  const checkoutKey = useRef(null);
+  const paymentKey = useRef(null);
 
   const navigate = useNavigate();
 
@@ -39,8 +45,29 @@ export default function PaymentPage({ refreshAuth }) {
     }
   }, [user]);
 
-  // Обработчик отправки формы
-  const handleSubmit = (e) => {
+  // Данные заказа в формате, который ожидает бэкенд
+  const buildOrderData = (userId) => ({
+    "user_id": userId,
+    "shipping_address": `${city}, ${address}`,
+    "payment_details": {
+      "payment_method": "qr_code",
+      "first_name": firstName,
+      "last_name": lastName,
+      "email": email,
+      "phone_number": phoneNumber
+    },
+    "items": [
+      {
+        "product_id": product.id,
+        "quantity": 1,
+        "selected_size": selectedSize
+      }
+    ]
+  });
+
+  // Обработчик отправки формы: заказ создается до оплаты, чтобы
+  // зарезервировать товар на время оплаты по QR-коду
+  const handleSubmit = async (e) => {
     e.preventDefault();
     // Проверяем форму на валидность
     if (!firstName || !lastName || !email || !phoneNumber || !address || !city) {
@@ -48,23 +75,15 @@ export default function PaymentPage({ refreshAuth }) {
       return;
     }
     
-    // Показываем QR-код для оплаты
-    setShowQRCode(true);
-  };
-
-  // Обработчик успешной оплаты
-// Обработчик успешной оплаты
-const handlePaymentSuccess = async (success = true) => {
-  const user = useUserStore.getState().user; // Получаем пользователя из хранилища
-  if (!user || !user.id) {
-    throw new Error("Информация о пользователе недоступна. Пожалуйста, войдите снова.");
-  }
-  const userId = user.id;
-  if (success) {
     setIsLoading(true);
     setError("");
     
     try {
+      const user = useUserStore.getState().user; // Получаем пользователя из хранилища
+      if (!user || !user.id) {
+        throw new Error("Информация о пользователе недоступна. Пожалуйста, войдите снова.");
+      }
+      
       // Перед созданием заказа обновляем данные аутентификации
       if (refreshAuth) {
         const isAuthenticated = await refreshAuth();
@@ -73,71 +92,32 @@ const handlePaymentSuccess = async (success = true) => {
         }
       }
       
-      // Формируем данные заказа в соответствии с ожиданиями бэкенда
-      const orderData = {
-        "user_id": userId,
-        "shipping_address": `${city}, ${address}`,
-        "payment_details": {
-          "payment_method": "qr_code",
-          "first_name": firstName,
-          "last_name": lastName,
-          "email": email,
-          "phone_number": phoneNumber
-        },
-        "items": [
-          {
-            "product_id": product.id,
-            "quantity": 1,
-            "selected_size": selectedSize
-          }
-        ]
-      };
-      
+      const orderData = buildOrderData(user.id);
       console.log("Отправка заказа с данными:", orderData);
       
-      // Проверка валидности токена перед отправкой заказа
-      const token = localStorage.getItem("token");
-      if (!token) {
-        throw new Error("Отсутствует токен авторизации. Пожалуйста, войдите снова.");
+      // Отправляем заказ на сервер: товар резервируется до оплаты
+      if (!checkoutKey.current) {
+        checkoutKey.current = crypto.randomUUID();
       }
+      const response = await orderService.createOrder(orderData, checkoutKey.current);
+      console.log("Заказ создан, товар зарезервирован:", response);
+      // Следующее оформление - новая попытка с новым ключом
+      checkoutKey.current = null;
+      paymentKey.current = crypto.randomUUID();
       
-      try {
-        // Отправляем заказ на сервер
-        const response = await orderService.createOrder(orderData);
-        console.log("Заказ успешно создан:", response);
-        
-        // Сохраняем номер заказа для отображения
-        setOrderNumber(response.id || "Новый");
-        
-        // Устанавливаем состояние успешной оплаты
-        setPaymentSuccess(true);
-        setShowQRCode(false);
-      } catch (orderError) {
-        console.error("Ошибка при создании заказа:", orderError);
-        
-        // Более детальное логирование ошибки
-        if (orderError.name === 'TypeError' && orderError.message.includes('Failed to fetch')) {
-          console.error("Проблема сетевого соединения. Проверьте, запущен ли сервер бэкенда.");
-          setError("Ошибка соединения с сервером. Пожалуйста, проверьте подключение к интернету и убедитесь, что сервер запущен.");
-        } else {
-          setError("Произошла ошибка при создании заказа: " + (orderError.message || "Неизвестная ошибка"));
-        }
-        
-        // Все равно показываем успешную оплату,
-        // но с информацией о проблеме с созданием заказа
-        setPaymentSuccess(true);
-        setShowQRCode(false);
-        setOrderNumber("Обрабатывается");
-      }
-    } catch (authError) {
-      console.error("Ошибка авторизации:", authError);
-      setError("Ошибка авторизации: " + (authError.message || "Необходимо войти в систему"));
+      setReservedOrder(response);
+      setOrderNumber(response.id || "Новый");
+      
+      // Показываем QR-код для оплаты
+      setShowQRCode(true);
+    } catch (orderError) {
+      console.error("Ошибка при создании заказа:", orderError);
       
       // В случае ошибки аутентификации, предлагаем пользователю войти снова
-      if (authError.message && (authError.message.includes("аутентифицирован") || 
-          authError.message.includes("Unauthorized") ||
-          authError.message.includes("токен") ||
-          authError.message.includes("войти"))) {
+      if (orderError.message && (orderError.message.includes("аутентифицирован") || 
+          orderError.message.includes("Unauthorized") ||
+          orderError.message.includes("токен") ||
+          orderError.message.includes("войти"))) {
         // Сохраняем данные для возврата после авторизации
         const paymentData = {
           product,
@@ -158,18 +138,55 @@ const handlePaymentSuccess = async (success = true) => {
         return;
       }
       
-      // Показываем успешную оплату несмотря на ошибку с созданием заказа
-      setPaymentSuccess(true);
-      setShowQRCode(false);
-      setOrderNumber("Обрабатывается");
+      // Например, товар в этом размере закончился
+      setError("Не удалось оформить заказ: " + (orderError.message || "Неизвестная ошибка"));
     } finally {
       setIsLoading(false);
     }
-  } else {
-    // Пользователь отменил платеж
+  };
+
+  // Отмена оплаты: резерв снимается, товар возвращается в продажу
+  const handlePaymentCancel = async () => {
     setShowQRCode(false);
-  }
-};
+    if (!reservedOrder) {
+      return;
+    }
+    
+    try {
+      await orderService.cancelOrder(reservedOrder.id);
+    } catch (cancelError) {
+      // Резерв все равно будет снят по истечении срока
+      console.error("Ошибка при отмене заказа:", cancelError);
+    }
+    setReservedOrder(null);
+    setOrderNumber("");
+  };
+
+  // Обработчик успешной оплаты
+  const handlePaymentSuccess = async (success = true) => {
+    if (!success) {
+      // Пользователь отменил платеж
+      await handlePaymentCancel();
+      return;
+    }
+    
+    setIsLoading(true);
+    setError("");
+    
+    try {
+      // Подтверждение оплаты снимает резерв: товар продан
+      await orderService.updateOrderStatus(reservedOrder.id, "paid", paymentKey.current);
+      setPaymentSuccess(true);
+    } catch (paymentError) {
+      console.error("Ошибка при подтверждении оплаты:", paymentError);
+      // Например, резерв истек и заказ был отменен
+      setError("Не удалось подтвердить оплату: " + (paymentError.message || "Неизвестная ошибка"));
+      setReservedOrder(null);
+    } finally {
+      setShowQRCode(false);
+      setIsLoading(false);
+    }
+  };
 
   // Возврат на главную страницу
   const handleGoHome = () => {
@@ -370,11 +387,13 @@ const handlePaymentSuccess = async (success = true) => {
         {/* Модальное окно с QR-кодом для оплаты */}
         {showQRCode && (
           <div className="modal-overlay">
-            <button className="modal-close" onClick={() => setShowQRCode(false)}>×</button>
+            <button className="modal-close" onClick={handlePaymentCancel}>×</button>
             <QRCodePayment 
               product={product}
+              orderNumber={orderNumber}
+              reservedUntil={reservedOrder?.reserved_until}
               onSuccess={handlePaymentSuccess}
-              onCancel={() => setShowQRCode(false)}
+              onCancel={handlePaymentCancel}
             />
           </div>
         )}
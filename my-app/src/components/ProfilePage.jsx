@@ -36,6 +36,8 @@ const ProfilePage = () => {
   const [isLoading, setIsLoading] = useState(true);
   const [activeTab, setActiveTab] = useState(initialTab); // profile, orders, settings
   const [orders, setOrders] = useState([]);
+  // Курсор следующей страницы истории заказов (null - страниц больше нет)
+  const [ordersCursor, setOrdersCursor] = useState(null);
   const [refreshOrders, setRefreshOrders] = useState(false); // Состояние для обновления списка заказов
   
   // Загрузка данных пользователя при монтировании компонента или при изменении user
@@ -61,14 +63,16 @@ const ProfilePage = () => {
           city: user.city || ""
         });
         
-        // Получаем заказы пользователя
+        // Получаем первую страницу истории заказов пользователя
         try {
-          const userOrders = await orderService.getUserOrders();
-          setOrders(userOrders);
+          const page = await orderService.getOrderHistory(user.id);
+          setOrders(page.orders);
+          setOrdersCursor(page.nextCursor);
         } catch (ordersError) {
           console.error("Error fetching orders:", ordersError);
           // Используем пустой массив заказов для отображения
           setOrders([]);
+          setOrdersCursor(null);
         }
       } catch (err) {
         console.error("Error in fetchUserData:", err);
@@ -81,6 +85,20 @@ const ProfilePage = () => {
     fetchUserData();
   }, [user, navigate, refreshOrders]); // Добавляем refreshOrders в зависимости
 
+  // Загрузка следующей страницы истории заказов
+  const handleLoadMoreOrders = async () => {
+    if (!ordersCursor) {
+      return;
+    }
+    try {
+      const page = await orderService.getOrderHistory(user.id, ordersCursor);
+      setOrders(prev => [...prev, ...page.orders]);
+      setOrdersCursor(page.nextCursor);
+    } catch (ordersError) {
+      console.error("Error fetching orders:", ordersError);
+    }
+  };
+
   // Обработчик для обновления списка заказов
   const handleRefreshOrders = () => {
     setRefreshOrders(prev => !prev);
@@ -396,7 +414,11 @@ const ProfilePage = () => {
               {isLoading ? "Обновление..." : "Обновить заказы"}
             </button>
           </div>
-          <OrderHistory orders={orders} />
+          <OrderHistory
+            orders={orders}
+            hasMore={Boolean(ordersCursor)}
+            onLoadMore={handleLoadMoreOrders}
+          />
         </div>
       )}
 
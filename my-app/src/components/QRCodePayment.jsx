@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import '../styles/QRCodePayment.css';
 
-const QRCodePayment = ({ onSuccess, product, onCancel }) => {
+const QRCodePayment = ({ onSuccess, product, onCancel, orderNumber, reservedUntil }) => {
   const [timeLeft, setTimeLeft] = useState(20); // 20 секунд на оплату
   const [isExpired, setIsExpired] = useState(false);
   const [isProcessing, setIsProcessing] = useState(false);
@@ -127,8 +127,17 @@ const QRCodePayment = ({ onSuccess, product, onCancel }) => {
             </div>
             <div className="payment-row">
               <span className="label">Номер заказа:</span>
-              <span className="value">#{Math.floor(Math.random() * 10000)}</span>
+              <span className="value">#{orderNumber || Math.floor(Math.random() * 10000)}</span>
             </div>
+            {reservedUntil && (
+              <div className="payment-row">
+                <span className="label">Товар зарезервирован до:</span>
+                {/* Бэкенд отдает время резерва в UTC без указания зоны */}
+                <span className="value">
+                  {new Date(`${reservedUntil}Z`).toLocaleTimeString('ru-RU', { hour: '2-digit', minute: '2-digit' })}
+                </span>
+              </div>
+            )}
           </div>
           
           <div className="payment-actions">
@@ -63,7 +63,9 @@ const fetchWithAuth = async (url, options = {}) => {
   try {
     const response = await fetch(url, {
       ...options,
-      headers
+      headers,
+      // Cookie закрепления за основной базой после записи (чтение своих изменений)
+      credentials: 'include'
     });
     
     // Если получаем 401 Unauthorized, очищаем токен и перенаправляем на страницу входа
@@ -90,13 +92,13 @@ const productService = {
   /**
    * Получение списка всех товаров с возможностью фильтрации по категории
    * @param {string} category - категория товаров (опционально)
-   * @returns {Promise<Array>} - список товаров
+   * @returns {Promise<Array>} - список товаров (только поля карточки в сетке)
    */
   getProducts: async (category = null) => {
     try {
       const url = category 
-        ? `${API_URL}/products?category=${encodeURIComponent(category)}` 
-        : `${API_URL}/products`;
+        ? `${API_URL}/products?fields=summary&category=${encodeURIComponent(category)}` 
+        : `${API_URL}/products?fields=summary`;
       
       const response = await fetchWithAuth(url);
       return handleResponse(response);
@@ -128,7 +130,7 @@ const productService = {
    */
   searchProducts: async (query) => {
     try {
-      const response = await fetchWithAuth(`${API_URL}/products/search?query=${encodeURIComponent(query)}`);
+      const response = await fetchWithAuth(`${API_URL}/products/search?fields=summary&query=${encodeURIComponent(query)}`);
       return handleResponse(response);
     } catch (error) {
       console.error('Ошибка при поиске товаров:', error);
@@ -141,7 +143,7 @@ const productService = {
    * @param {number} productId - ID товара
    * @param {string} user - имя пользователя
    * @param {string} review - текст отзыва
-   * @returns {Promise<Object>} - обновленные данные о товаре
+   * @returns {Promise<Object>} - созданный отзыв
    */
   addReview: async (productId, user, review) => {
     try {
@@ -314,9 +316,10 @@ const orderService = {
 /**
  * Создание нового заказа
  * @param {Object} orderData - данные заказа
+ * @param {string} [idempotencyKey] - ключ идемпотентности попытки оформления
  * @returns {Promise<Object>} - созданный заказ
  */
-createOrder: async (orderData) => {
+createOrder: async (orderData, idempotencyKey) => {
   try {
     console.log("Создание заказа с данными:", orderData);
     
@@ -354,9 +357,12 @@ createOrder: async (orderData) => {
       // Затем создаем заказ
       const response = await fetch(`${API_URL}/orders`, {
         method: 'POST',
+        credentials: 'include',
         headers: {
           'Content-Type': 'application/json',
-          'Authorization': `Bearer ${token}`
+          'Authorization': `Bearer ${token}`,
+          // Повтор с тем же ключом вернет уже созданный заказ, а не создаст второй
+          ...(idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {})
         },
         body: JSON.stringify({
           ...orderData,
@@ -418,6 +424,31 @@ createOrder: async (orderData) => {
       // Возвращаем пустой массив вместо ошибки для лучшего UX
       return [];
     }
+  },
+  /**
+   * История заказов пользователя для профиля: новые первыми, страницами
+   * @param {number} userId - ID пользователя
+   * @param {string|null} after - курсор следующей страницы (из предыдущего ответа)
+   * @param {number} limit - заказов на странице
+   * @returns {Promise<{orders: Array, nextCursor: string|null}>} - страница истории
+   */
+  getOrderHistory: async (userId, after = null, limit = 20) => {
+    const params = new URLSearchParams({ user_id: userId, limit });
+    if (after) {
+      params.set('after', after);
+    }
+    const response = await fetchWithAuth(`${API_URL}/orders/history?${params}`);
+    
+    if (!response.ok) {
+      const errorText = await response.text();
+      console.error('Ошибка при получении истории заказов:', errorText);
+      throw new Error('Не удалось получить историю заказов');
+    }
+    
+    return {
+      orders: await response.json(),
+      nextCursor: response.headers.get('X-Next-Cursor')
+    };
   },
     /**
    * Получение информации о конкретном заказе
@@ -463,18 +494,45 @@ createOrder: async (orderData) => {
       throw error;
     }
   },
+  /**
+   * Детали нескольких заказов одним запросом (заказ и товары)
+   * @param {Array<number>} orderIds - ID заказов (не больше 100)
+   * @returns {Promise<Array>} - список объектов { order, items }
+   */
+  getOrdersDetails: async (orderIds) => {
+    if (!orderIds || orderIds.length === 0) {
+      return [];
+    }
+    try {
+      const query = orderIds.map(id => `ids=${encodeURIComponent(id)}`).join('&');
+      const response = await fetchWithAuth(`${API_URL}/orders/details?${query}`);
+      
+      if (!response.ok) {
+        const errorText = await response.text();
+        console.error('Ошибка при получении деталей заказов:', errorText);
+        throw new Error('Не удалось получить детали заказов');
+      }
+      
+      return await response.json();
+    } catch (error) {
+      console.error('Ошибка при получении деталей заказов:', error);
+      throw error;
+    }
+  },
   /**
    * Обновление статуса заказа
    * @param {number} orderId - ID заказа
    * @param {string} status - новый статус
+   * @param {string} [idempotencyKey] - ключ идемпотентности изменения
    * @returns {Promise<Object>} - обновленные данные заказа
    */
-  updateOrderStatus: async (orderId, status) => {
+  updateOrderStatus: async (orderId, status, idempotencyKey) => {
     try {
       const response = await fetchWithAuth(`${API_URL}/orders/${orderId}`, {
         method: 'PUT',
         headers: {
           'Content-Type': 'application/json',
+          ...(idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {})
         },
         body: JSON.stringify({ status }),
       });